@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.analytics'
+
+    def ready(self):
+        from apps.email_management.signals import draft_status_changed
+        from .signals import update_draft_rollups
+
+        draft_status_changed.connect(update_draft_rollups, dispatch_uid='analytics_draft_rollups')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.analytics.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the draft status rollups from the drafts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campaign', type=int, action='append', dest='campaigns',
+                            help='Only rebuild this campaign (can be repeated)')
+
+    def handle(self, *args, **options):
+        written = backfill(campaign_ids=options['campaigns'])
+        self.stdout.write(f"Wrote {written} rollup rows")
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('email_management', '0007_draft_campaign_recipient_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DraftStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_rollups', to='email_management.emailcampaign')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='draft_status_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'day'], name='rollup_user_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='draftstatusrollup',
+            constraint=models.UniqueConstraint(fields=('campaign', 'day', 'status'), name='rollup_campaign_day_status_uniq'),
+        ),
+    ]
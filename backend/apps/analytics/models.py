@@ -1,3 +1,61 @@
 from django.db import models
+from django.contrib.auth import get_user_model
 
-# Create your models here.
+from apps.email_management.models import EmailCampaign
+
+User = get_user_model()
+
+class DraftStatusRollup(models.Model):
+    """
+    Number of drafts of a campaign counted under ``status`` for ``day``
+    (see ``rollups`` for what each status counts). Maintained incrementally
+    from ``draft_status_changed``; rebuilt by ``backfill_draft_rollups``.
+    The ``opened`` and ``clicked`` buckets count tracking hits.
+    """
+    campaign = models.ForeignKey(EmailCampaign, on_delete=models.CASCADE, related_name='status_rollups')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='draft_status_rollups')
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'day', 'status'], name='rollup_campaign_day_status_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day'], name='rollup_user_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign_id} {self.day} {self.status}: {self.count}"
+
+class TrackingEvent(models.Model):
+    """
+    An open (tracking pixel load) or click of a sent draft. Rows are written
+    in batches from the tracking buffer; the references are not enforced by
+    the database so a batch never fails on a since-deleted draft.
+    """
+    KIND_CHOICES = [
+        ('open', 'Open'),
+        ('click', 'Click')
+    ]
+
+    draft = models.ForeignKey('email_management.EmailDraft', on_delete=models.DO_NOTHING,
+                              db_constraint=False, related_name='tracking_events')
+    campaign = models.ForeignKey(EmailCampaign, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 related_name='tracking_events')
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False,
+                             related_name='tracking_events')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    url = models.TextField(blank=True)
+    user_agent = models.CharField(max_length=255, blank=True)
+    occurred_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['campaign', 'occurred_at'], name='tracking_campaign_time_idx'),
+            models.Index(fields=['draft', 'kind'], name='tracking_draft_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} of draft {self.draft_id}"
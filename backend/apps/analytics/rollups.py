@@ -0,0 +1,199 @@
+"""
+Incremental draft status rollups.
+
+A draft counts once towards each of these ``DraftStatusRollup`` buckets:
+``pending`` on the day it was created, ``generated`` on the day of its
+latest generation, ``sent`` on the day it was sent and, while it is failed,
+``failed`` on the day it was generated (or created, if it never was).
+``draft_buckets`` is that definition for one draft and ``BACKFILL_EVENTS``
+the same one in SQL.
+
+``draft_status_changed`` carries the state of each draft before and after a
+change, and ``status_changes`` turns it into the difference between the two
+sets of buckets: regenerating a draft moves it to another ``generated``
+day, and a failed draft that is generated again leaves ``failed``. The
+incremental rows therefore match what ``backfill`` rebuilds from the
+drafts, except for deleted drafts, which stay counted until the next
+backfill.
+
+Differences are handed to a per-process ``BufferedWriter`` once the
+transaction that produced them commits, and its thread adds them to the
+rows merged per bucket, so generation and delivery transactions never wait
+on the shared rollup rows. The tracking buffer adds its ``opened`` and
+``clicked`` counts with ``record_status_changes`` directly.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from apps.email_management.models import EmailCampaign, EmailDraft
+from core.buffers import BufferedWriter
+
+from .models import DraftStatusRollup, TrackingEvent
+
+# Status -> (timestamp the status was reached at, drafts that reached it);
+# see draft_buckets.
+BACKFILL_EVENTS = {
+    'pending': (F('created_at'), Q()),
+    'generated': (F('generated_at'), Q(generated_at__isnull=False)),
+    'sent': (F('sent_at'), Q(sent_at__isnull=False)),
+    'failed': (Coalesce('generated_at', 'created_at'), Q(status='failed')),
+}
+
+_buffer_lock = threading.Lock()
+_buffer = None
+
+
+def draft_buckets(state):
+    """
+    The ``(campaign_id, day, status)`` buckets a draft in ``state`` (a
+    ``DraftState``, or None for no draft) counts towards.
+    """
+    if state is None:
+        return []
+    moments = [('pending', state.created_at)]
+    if state.generated_at is not None:
+        moments.append(('generated', state.generated_at))
+    if state.sent_at is not None:
+        moments.append(('sent', state.sent_at))
+    if state.status == 'failed':
+        moments.append(('failed', state.generated_at or state.created_at))
+    return [(state.campaign_id, timezone.localdate(moment), status) for status, moment in moments]
+
+
+def status_changes(transitions):
+    """
+    ``{(campaign_id, day, status): count}`` for ``[(before, after)]`` draft
+    states, without the buckets that did not change.
+    """
+    changes = Counter()
+    for before, after in transitions:
+        changes.update(draft_buckets(after))
+        changes.subtract(draft_buckets(before))
+    return {bucket: count for bucket, count in changes.items() if count}
+
+
+def record_status_changes(changes):
+    """
+    Add ``changes`` (``{(campaign_id, day, status): count}``, counts may be
+    negative) to the rollup rows.
+    """
+    owners = dict(
+        EmailCampaign.objects.filter(
+            pk__in={campaign_id for campaign_id, _, _ in changes}
+        ).values_list('pk', 'created_by_id')
+    )
+
+    for (campaign_id, day, status), count in changes.items():
+        if campaign_id not in owners or not count:
+            continue
+        bucket = DraftStatusRollup.objects.filter(campaign_id=campaign_id, day=day, status=status)
+        if count < 0:
+            # Rows are kept from going negative (a bucket may have been
+            # rebuilt since the previous state was counted) and, like in
+            # backfill, empty buckets have no row.
+            bucket.update(count=Greatest(F('count') + count, 0))
+            bucket.filter(count=0).delete()
+            continue
+        with transaction.atomic():
+            if bucket.update(count=F('count') + count):
+                continue
+            _, created = DraftStatusRollup.objects.get_or_create(
+                campaign_id=campaign_id,
+                day=day,
+                status=status,
+                defaults={'user_id': owners[campaign_id], 'count': count}
+            )
+            if not created:
+                bucket.update(count=F('count') + count)
+
+
+def flush_status_changes(items):
+    close_old_connections()
+    changes = Counter()
+    for item in items:
+        changes.update(item)
+    with transaction.atomic():
+        record_status_changes(changes)
+
+
+def get_rollup_buffer():
+    global _buffer
+    if _buffer is not None:
+        return _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = BufferedWriter(
+                flush_status_changes,
+                flush_interval=settings.ANALYTICS_ROLLUP_FLUSH_INTERVAL,
+                flush_size=1000,
+                max_size=settings.ANALYTICS_ROLLUP_MAX_BUFFER,
+                name='rollups'
+            )
+    return _buffer
+
+
+def buffer_status_changes(transitions):
+    """
+    Queue the rollup changes of ``transitions`` for the buffer, once the
+    current transaction commits.
+    """
+    changes = status_changes(transitions)
+    if changes:
+        transaction.on_commit(lambda: get_rollup_buffer().add(changes))
+
+
+def backfill(campaign_ids=None):
+    """
+    Recompute the rollups of ``campaign_ids`` (all campaigns by default)
+    from their drafts and tracking events with one aggregate query per
+    status. Returns the number of rollup rows written.
+    """
+    drafts = EmailDraft.objects.order_by()
+    events = TrackingEvent.objects.order_by()
+    rollups = DraftStatusRollup.objects.all()
+    if campaign_ids is not None:
+        drafts = drafts.filter(campaign_id__in=campaign_ids)
+        events = events.filter(campaign_id__in=campaign_ids)
+        rollups = rollups.filter(campaign_id__in=campaign_ids)
+
+    rows = []
+    for status, (moment, condition) in BACKFILL_EVENTS.items():
+        buckets = drafts.filter(condition).annotate(day=TruncDate(moment)).values(
+            'campaign_id', 'campaign__created_by_id', 'day'
+        ).annotate(count=Count('id'))
+        rows.extend(
+            DraftStatusRollup(
+                campaign_id=bucket['campaign_id'],
+                user_id=bucket['campaign__created_by_id'],
+                day=bucket['day'],
+                status=status,
+                count=bucket['count']
+            )
+            for bucket in buckets
+        )
+
+    for kind, status in (('open', 'opened'), ('click', 'clicked')):
+        buckets = events.filter(kind=kind).annotate(day=TruncDate('occurred_at')).values(
+            'campaign_id', 'user_id', 'day'
+        ).annotate(count=Count('id'))
+        rows.extend(
+            DraftStatusRollup(
+                campaign_id=bucket['campaign_id'],
+                user_id=bucket['user_id'],
+                day=bucket['day'],
+                status=status,
+                count=bucket['count']
+            )
+            for bucket in buckets
+        )
+
+    with transaction.atomic():
+        rollups.delete()
+        DraftStatusRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,5 @@
+from .rollups import buffer_status_changes
+
+
+def update_draft_rollups(sender, transitions, **kwargs):
+    buffer_status_changes(transitions)
@@ -1,3 +1,168 @@
-from django.test import TestCase
+from datetime import date, datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.core.signing import BadSignature
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from apps.authentication.models import User
+from apps.email_management.generation import save_generated_draft
+from apps.email_management.models import EmailCampaign, EmailDraft, EmailTemplate
+from apps.email_management.sending import record_results
+from apps.email_management.signals import DraftState
+
+from .models import DraftStatusRollup
+from .rollups import backfill, buffer_status_changes, record_status_changes, status_changes
+from .tracking import PIXEL, click_token, open_token, read_click_token, read_open_token, tracked_html
+
+
+class DraftAnalyticsViewSetQueryTests(APITestCase):
+    """
+    Every analytics action is a single aggregate over the rollups,
+    whatever the number of campaigns and days.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner', email='owner@example.com')
+        campaigns = [EmailCampaign.objects.create(name=f'Campaign {index}', created_by=cls.user) for index in range(3)]
+        DraftStatusRollup.objects.bulk_create([
+            DraftStatusRollup(campaign=campaign, user=cls.user, day=date(2024, 1, day), status=status, count=day)
+            for campaign in campaigns
+            for day in range(1, 4)
+            for status in ('pending', 'generated', 'sent')
+        ])
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_summary(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/analytics/drafts/summary/')
+        self.assertEqual(response.data['sent'], 18)
+
+    def test_daily(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/analytics/drafts/daily/')
+        self.assertEqual(len(response.data), 3)
+
+    def test_campaigns(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/analytics/drafts/campaigns/')
+        self.assertEqual(len(response.data), 3)
+
+
+def moment(day):
+    return datetime(2024, 1, day, 12, tzinfo=dt_timezone.utc)
+
+
+class StatusChangesTests(TestCase):
+    def state(self, status, generated=None, sent=None):
+        return DraftState(1, status, moment(1), generated and moment(generated), sent and moment(sent))
+
+    def test_new_draft_counts_as_pending(self):
+        self.assertEqual(status_changes([(None, self.state('pending'))]), {(1, date(2024, 1, 1), 'pending'): 1})
+
+    def test_regeneration_moves_the_generated_day(self):
+        changes = status_changes([(self.state('generated', generated=2), self.state('generated', generated=3))])
+        self.assertEqual(changes, {(1, date(2024, 1, 2), 'generated'): -1, (1, date(2024, 1, 3), 'generated'): 1})
+
+    def test_generating_a_failed_draft_leaves_failed(self):
+        changes = status_changes([(self.state('failed'), self.state('generated', generated=2))])
+        self.assertEqual(changes, {(1, date(2024, 1, 1), 'failed'): -1, (1, date(2024, 1, 2), 'generated'): 1})
+
+    def test_repeated_failure_counts_once(self):
+        self.assertEqual(status_changes([(self.state('failed'), self.state('failed'))]), {})
+
+
+@mock.patch(
+    'apps.analytics.signals.buffer_status_changes',
+    lambda transitions: record_status_changes(status_changes(transitions))
+)
+class IncrementalRollupTests(TestCase):
+    """
+    The rollups maintained from ``draft_status_changed`` are the ones
+    ``backfill`` rebuilds from the drafts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner', email='owner@example.com')
+        template = EmailTemplate.objects.create(
+            name='Template', subject_template='Hello', body_template='Hi', created_by=cls.user
+        )
+        cls.campaign = EmailCampaign.objects.create(name='Campaign', template=template, created_by=cls.user)
+
+    def rollups(self):
+        return set(DraftStatusRollup.objects.values_list('campaign_id', 'day', 'status', 'count'))
+
+    def test_incremental_rollups_match_backfill(self):
+        for index in range(3):
+            save_generated_draft(self.campaign, {'email': f'r{index}@example.com', 'name': 'R'}, 'Hello', 'Hi')
+        save_generated_draft(self.campaign, {'email': 'r0@example.com', 'name': 'R'}, 'Hello', 'Again')
+
+        drafts = list(EmailDraft.objects.filter(campaign=self.campaign).order_by('pk'))
+        EmailDraft.objects.filter(pk__in=[draft.pk for draft in drafts]).update(status='sending')
+        for draft in drafts:
+            draft.status = 'sending'
+        record_results(drafts, [drafts[0].pk, drafts[2].pk], {'Mailbox unavailable': [drafts[1].pk]})
+        save_generated_draft(self.campaign, {'email': 'r1@example.com', 'name': 'R'}, 'Hello', 'Retry')
+
+        incremental = self.rollups()
+        backfill(campaign_ids=[self.campaign.pk])
+        self.assertEqual(incremental, self.rollups())
+
+    def test_rollups_are_buffered_after_commit(self):
+        with mock.patch('apps.analytics.rollups.get_rollup_buffer') as get_buffer:
+            with self.captureOnCommitCallbacks(execute=True):
+                buffer_status_changes([(None, DraftState(self.campaign.pk, 'pending', moment(1), None, None))])
+                get_buffer.assert_not_called()
+        get_buffer.return_value.add.assert_called_once_with({(self.campaign.pk, date(2024, 1, 1), 'pending'): 1})
+        self.assertFalse(DraftStatusRollup.objects.exists())
+
+
+@override_settings(EMAIL_TRACKING_BASE_URL='https://track.example.com')
+class TrackingTests(TestCase):
+    def setUp(self):
+        self.draft = EmailDraft(pk=7, campaign_id=3, body='See https://example.com/jobs?a=1 <b>now</b>')
+
+    def test_tokens_round_trip(self):
+        self.assertEqual(read_open_token(open_token(self.draft, 5)), (7, 3, 5))
+        url = 'https://example.com/jobs'
+        self.assertEqual(read_click_token(click_token(self.draft, 5, url)), (7, 3, 5, url))
+
+    def test_tampered_tokens_are_rejected(self):
+        token = open_token(self.draft, 5)
+        with self.assertRaises(BadSignature):
+            read_open_token(token.replace('7.3.5', '8.3.5'))
+        with self.assertRaises(BadSignature):
+            read_click_token(click_token(self.draft, 5, 'https://example.com')[:-1] + 'x')
+        with self.assertRaises(BadSignature):
+            read_open_token(click_token(self.draft, 5, 'https://example.com'))
+
+    def test_tracked_html(self):
+        html = tracked_html(self.draft, 5)
+        self.assertIn('https://track.example.com/', html)
+        self.assertIn('&lt;b&gt;now&lt;/b&gt;', html)
+        self.assertIn('>https://example.com/jobs?a=1</a>', html)
+        self.assertIn('<img src="https://track.example.com/', html)
+
+    @mock.patch('apps.analytics.views.record_hit')
+    def test_click_redirects_to_the_signed_url(self, record_hit):
+        token = click_token(self.draft, 5, 'https://example.com/jobs')
+        response = self.client.get(f'/api/analytics/t/c/{token}/')
+        self.assertEqual((response.status_code, response['Location']), (302, 'https://example.com/jobs'))
+        record_hit.assert_called_once_with('click', 7, 3, 5, url='https://example.com/jobs', user_agent='')
+
+    @mock.patch('apps.analytics.views.record_hit')
+    def test_unsafe_or_invalid_clicks_are_not_followed(self, record_hit):
+        token = click_token(self.draft, 5, 'javascript:alert(1)')
+        self.assertEqual(self.client.get(f'/api/analytics/t/c/{token}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/analytics/t/c/bogus/').status_code, 404)
+        record_hit.assert_not_called()
+
+    @mock.patch('apps.analytics.views.record_hit')
+    def test_invalid_open_still_gets_the_pixel(self, record_hit):
+        response = self.client.get('/api/analytics/t/o/bogus.gif')
+        self.assertEqual(response.content, PIXEL)
+        record_hit.assert_not_called()
@@ -0,0 +1,153 @@
+"""
+Open and click tracking for sent drafts.
+
+Tracking URLs carry a signed token with the draft, campaign and owner ids
+(and, for clicks, the target URL), so a hit is verified with an HMAC and no
+query. Hits are appended to a per-process ``BufferedWriter`` and written
+from its background thread in batches: one ``bulk_create`` of
+``TrackingEvent`` rows plus one rollup update per campaign and kind
+(counted as the ``opened``/``clicked`` buckets of ``DraftStatusRollup``).
+"""
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core import signing
+from django.db import close_old_connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+from core.buffers import BufferedWriter
+
+from .models import TrackingEvent
+from .rollups import record_status_changes
+
+OPEN_SALT = 'apps.analytics.tracking.open'
+CLICK_SALT = 'apps.analytics.tracking.click'
+ROLLUP_STATUSES = {'open': 'opened', 'click': 'clicked'}
+URL_RE = re.compile(r'https?://[^\s<>"\']+')
+
+# A transparent 1x1 GIF.
+PIXEL = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+    b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+_buffer_lock = threading.Lock()
+_buffer = None
+
+
+def tracking_enabled():
+    return bool(settings.EMAIL_TRACKING_BASE_URL)
+
+
+def open_token(draft, user_id):
+    return signing.Signer(salt=OPEN_SALT).sign(f'{draft.pk}.{draft.campaign_id}.{user_id}')
+
+
+def click_token(draft, user_id, url):
+    return signing.dumps([draft.pk, draft.campaign_id, user_id, url], salt=CLICK_SALT, compress=True)
+
+
+def read_open_token(token):
+    """
+    Return ``(draft_id, campaign_id, user_id)`` or raise ``BadSignature``.
+    """
+    value = signing.Signer(salt=OPEN_SALT).unsign(token)
+    try:
+        draft_id, campaign_id, user_id = (int(part) for part in value.split('.'))
+    except ValueError:
+        raise signing.BadSignature('Malformed tracking token')
+    return draft_id, campaign_id, user_id
+
+
+def read_click_token(token):
+    """
+    Return ``(draft_id, campaign_id, user_id, url)`` or raise ``BadSignature``.
+    """
+    try:
+        draft_id, campaign_id, user_id, url = signing.loads(token, salt=CLICK_SALT)
+    except (TypeError, ValueError):
+        raise signing.BadSignature('Malformed tracking token')
+    return draft_id, campaign_id, user_id, url
+
+
+def _absolute(path):
+    return settings.EMAIL_TRACKING_BASE_URL.rstrip('/') + path
+
+
+def pixel_url(draft, user_id):
+    return _absolute(reverse('analytics:track-open', args=[open_token(draft, user_id)]))
+
+
+def click_url(draft, user_id, url):
+    return _absolute(reverse('analytics:track-click', args=[click_token(draft, user_id, url)]))
+
+
+def tracked_html(draft, user_id):
+    """
+    HTML version of a plain-text draft body with its links routed through
+    the click endpoint and the open pixel appended. ``user_id`` is the
+    campaign owner.
+    """
+    parts = []
+    position = 0
+    for match in URL_RE.finditer(draft.body):
+        url = match.group(0)
+        parts.append(escape(draft.body[position:match.start()]))
+        parts.append(f'<a href="{escape(click_url(draft, user_id, url))}">{escape(url)}</a>')
+        position = match.end()
+    parts.append(escape(draft.body[position:]))
+    body = ''.join(parts).replace('\n', '<br>\n')
+    return f'{body}\n<img src="{escape(pixel_url(draft, user_id))}" width="1" height="1" alt="" style="display:none">'
+
+
+def is_safe_redirect(url):
+    parts = urlsplit(url)
+    return parts.scheme in ('http', 'https') and bool(parts.netloc)
+
+
+def record_hit(kind, draft_id, campaign_id, user_id, url='', user_agent=''):
+    return get_tracking_buffer().add(
+        (kind, draft_id, campaign_id, user_id, url, user_agent[:255], timezone.now())
+    )
+
+
+def flush_events(events):
+    close_old_connections()
+    rollups = Counter()
+    rows = []
+    for kind, draft_id, campaign_id, user_id, url, user_agent, occurred_at in events:
+        rows.append(TrackingEvent(
+            draft_id=draft_id,
+            campaign_id=campaign_id,
+            user_id=user_id,
+            kind=kind,
+            url=url,
+            user_agent=user_agent,
+            occurred_at=occurred_at
+        ))
+        rollups[(campaign_id, timezone.localdate(occurred_at), ROLLUP_STATUSES[kind])] += 1
+
+    with transaction.atomic():
+        TrackingEvent.objects.bulk_create(rows, batch_size=1000)
+        record_status_changes(rollups)
+
+
+def get_tracking_buffer():
+    global _buffer
+    if _buffer is not None:
+        return _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = BufferedWriter(
+                flush_events,
+                flush_interval=settings.EMAIL_TRACKING_FLUSH_INTERVAL,
+                flush_size=settings.EMAIL_TRACKING_FLUSH_SIZE,
+                max_size=settings.EMAIL_TRACKING_MAX_BUFFER,
+                name='tracking'
+            )
+    return _buffer
@@ -0,0 +1,14 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import DraftAnalyticsViewSet, track_click, track_open
+
+app_name = 'analytics'
+
+router = DefaultRouter()
+router.register(r'drafts', DraftAnalyticsViewSet, basename='draft-analytics')
+
+urlpatterns = [
+    path('t/o/<str:token>.gif', track_open, name='track-open'),
+    path('t/c/<str:token>/', track_click, name='track-click'),
+    path('', include(router.urls)),
+]
@@ -1,3 +1,128 @@
-from django.shortcuts import render
+from collections import OrderedDict
 
-# Create your views here.
+from django.core.signing import BadSignature
+from django.db.models import Sum
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_GET
+from rest_framework import viewsets, permissions, serializers
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from core.routers import ReplicaReadMixin
+from .models import DraftStatusRollup
+from .tracking import PIXEL, is_safe_redirect, read_click_token, read_open_token, record_hit
+import logging
+
+logger = logging.getLogger(__name__)
+
+class DraftAnalyticsViewSet(ReplicaReadMixin, viewsets.GenericViewSet):
+    """
+    Draft status counts read from the rollup table. Every action accepts
+    ``campaign``, ``status``, ``start`` and ``end`` (inclusive ISO dates).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+    filter_backends = []
+    replica_actions = ('summary', 'daily', 'campaigns')
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = DraftStatusRollup.objects.filter(user=self.request.user).order_by()
+
+        errors = {}
+        for param, lookup in (('start', 'day__gte'), ('end', 'day__lte')):
+            value = params.get(param)
+            if not value:
+                continue
+            try:
+                day = parse_date(value)
+            except ValueError:
+                day = None
+            if day is None:
+                errors[param] = 'Enter a valid ISO 8601 date.'
+            else:
+                queryset = queryset.filter(**{lookup: day})
+        campaign = params.get('campaign')
+        if campaign:
+            if not campaign.isdigit():
+                errors['campaign'] = 'A valid integer is required.'
+            else:
+                queryset = queryset.filter(campaign_id=campaign)
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        if params.get('status'):
+            queryset = queryset.filter(status=params['status'])
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Totals per status
+        """
+        totals = self.get_queryset().values('status').annotate(total=Sum('count'))
+        return Response({row['status']: row['total'] for row in totals})
+
+    @action(detail=False, methods=['get'])
+    def daily(self, request):
+        """
+        Totals per day and status, oldest day first
+        """
+        rows = self.get_queryset().values('day', 'status').annotate(total=Sum('count')).order_by('day')
+        days = OrderedDict()
+        for row in rows:
+            days.setdefault(row['day'], {})[row['status']] = row['total']
+        return Response([{'day': day, 'counts': counts} for day, counts in days.items()])
+
+    @action(detail=False, methods=['get'])
+    def campaigns(self, request):
+        """
+        Totals per campaign and status
+        """
+        rows = self.get_queryset().values('campaign_id', 'campaign__name', 'status').annotate(
+            total=Sum('count')
+        ).order_by('campaign_id')
+        campaigns = OrderedDict()
+        for row in rows:
+            entry = campaigns.setdefault(row['campaign_id'], {
+                'campaign': row['campaign_id'],
+                'name': row['campaign__name'],
+                'counts': {}
+            })
+            entry['counts'][row['status']] = row['total']
+        return Response(list(campaigns.values()))
+
+
+@require_GET
+def track_open(request, token):
+    """
+    Serve the tracking pixel and buffer an open. Invalid tokens still get
+    the pixel so broken links never show up in the recipient's client.
+    """
+    try:
+        draft_id, campaign_id, user_id = read_open_token(token)
+    except BadSignature:
+        pass
+    else:
+        record_hit('open', draft_id, campaign_id, user_id,
+                   user_agent=request.META.get('HTTP_USER_AGENT', ''))
+
+    response = HttpResponse(PIXEL, content_type='image/gif')
+    response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+    return response
+
+@require_GET
+def track_click(request, token):
+    """
+    Buffer a click and redirect to the link's original target
+    """
+    try:
+        draft_id, campaign_id, user_id, url = read_click_token(token)
+    except BadSignature:
+        raise Http404('Unknown link')
+    if not is_safe_redirect(url):
+        raise Http404('Unknown link')
+
+    record_hit('click', draft_id, campaign_id, user_id, url=url,
+               user_agent=request.META.get('HTTP_USER_AGENT', ''))
+    return HttpResponseRedirect(url)
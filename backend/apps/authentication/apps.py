@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.authentication'
+
+    def ready(self):
+        from .models import User
+        from .signals import invalidate_user_cache
+
+        post_save.connect(invalidate_user_cache, sender=User, dispatch_uid='auth_user_cache_save')
+        post_delete.connect(invalidate_user_cache, sender=User, dispatch_uid='auth_user_cache_delete')
@@ -0,0 +1,117 @@
+"""
+JWT authentication with a cached user lookup.
+
+``JWTAuthentication`` loads the user row on every request. Here users are
+kept in a short-lived per-process cache in front of the shared Django
+cache, so a burst of requests from the same user costs at most one query
+per process.
+
+Shared entries are stored with the user's cache version, a random stamp
+under its own key that ``invalidate_cached_users`` replaces whenever users
+are saved, deleted (see ``AuthenticationConfig.ready``) or bulk-updated
+(see ``UserQuerySet``). An entry whose version is not the current one is a
+miss, including one written by a request that read the user just before
+the change. Other processes pick a change up once their local entry
+expires after ``AUTH_USER_LOCAL_CACHE_TTL`` seconds.
+"""
+import copy
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+USER_CACHE_KEY = 'auth-user:{}'
+USER_VERSION_KEY = 'auth-user-version:{}'
+
+_local_lock = threading.Lock()
+_local_users = {}
+
+
+def user_cache_key(user_id):
+    return USER_CACHE_KEY.format(user_id)
+
+
+def user_version_key(user_id):
+    return USER_VERSION_KEY.format(user_id)
+
+
+def _new_versions(user_ids):
+    with _local_lock:
+        for user_id in user_ids:
+            _local_users.pop(str(user_id), None)
+    # Outlives every entry cached under the previous version.
+    cache.set_many(
+        {user_version_key(user_id): uuid.uuid4().hex for user_id in user_ids},
+        timeout=settings.AUTH_USER_CACHE_TTL
+    )
+
+
+def invalidate_cached_users(user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    _new_versions(user_ids)
+    if transaction.get_connection().in_atomic_block:
+        # Requests may cache the old row again until the change commits.
+        transaction.on_commit(lambda: _new_versions(user_ids))
+
+
+def invalidate_cached_user(user_id):
+    invalidate_cached_users([user_id])
+
+
+def _get_local(user_id):
+    with _local_lock:
+        entry = _local_users.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del _local_users[user_id]
+            return None
+    # Requests may modify request.user; never hand out the cached instance.
+    return copy.copy(user)
+
+
+def _set_local(user_id, user):
+    with _local_lock:
+        if len(_local_users) >= settings.AUTH_USER_LOCAL_CACHE_SIZE:
+            _local_users.clear()
+        _local_users[user_id] = (time.monotonic() + settings.AUTH_USER_LOCAL_CACHE_TTL, copy.copy(user))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = _get_local(user_id)
+        if user is None:
+            # The version is read before the user, so an entry written
+            # from a row older than the current version cannot match it.
+            cached = cache.get_many([user_cache_key(user_id), user_version_key(user_id)])
+            version = cached.get(user_version_key(user_id))
+            entry = cached.get(user_cache_key(user_id))
+            if entry is not None and entry[0] == version:
+                user = entry[1]
+            else:
+                try:
+                    user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+                except self.user_model.DoesNotExist:
+                    raise AuthenticationFailed(_("User not found"), code="user_not_found")
+                cache.set(user_cache_key(user_id), (version, user), timeout=settings.AUTH_USER_CACHE_TTL)
+            _set_local(user_id, user)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
@@ -0,0 +1,136 @@
+"""
+Google ID-token verification with cached signing certificates.
+
+``id_token.verify_oauth2_token`` fetches Google's certificates through a
+fresh transport on every call. ``GoogleTokenVerifier`` instead keeps one
+pooled ``requests.Session``, caches the certificates for as long as their
+``Cache-Control: max-age`` allows (refetching early only when a token is
+signed with an unknown key id) and remembers recently verified tokens, by
+hash, until they expire.
+"""
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+from google.auth import jwt
+from requests.adapters import HTTPAdapter
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+VALID_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+_verifier_lock = threading.Lock()
+_verifier = None
+
+
+def _unverified_key_id(token):
+    try:
+        header = token.split('.', 1)[0]
+        header += '=' * (-len(header) % 4)
+        return json.loads(base64.urlsafe_b64decode(header)).get('kid')
+    except (ValueError, AttributeError):
+        return None
+
+
+class GoogleTokenVerifier:
+    def __init__(self, client_id, certs_url=GOOGLE_CERTS_URL, session=None,
+                 token_cache_size=10000, clock_skew=10, timeout=5,
+                 default_max_age=300, min_refresh_interval=60):
+        self.client_id = client_id
+        self.certs_url = certs_url
+        self.token_cache_size = token_cache_size
+        self.clock_skew = clock_skew
+        self.timeout = timeout
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        self.session = session
+
+        self._certs = None
+        self._certs_expiry = 0
+        self._certs_fetched_at = 0
+        self._certs_lock = threading.Lock()
+        self._tokens = OrderedDict()
+        self._tokens_lock = threading.Lock()
+
+    def verify(self, token):
+        """
+        Return the claims of a valid Google ID token for this client, or
+        raise ``ValueError``.
+        """
+        token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        idinfo = self._cached_token(token_hash)
+        if idinfo is not None:
+            return idinfo
+
+        certs = self.get_certs()
+        key_id = _unverified_key_id(token)
+        if key_id and key_id not in certs:
+            # Google rotated its keys before our copy expired.
+            certs = self.get_certs(force=True)
+
+        idinfo = jwt.decode(
+            token,
+            certs=certs,
+            audience=self.client_id,
+            clock_skew_in_seconds=self.clock_skew
+        )
+        if idinfo.get('iss') not in VALID_ISSUERS:
+            raise ValueError(f"Wrong issuer: {idinfo.get('iss')}")
+
+        self._remember_token(token_hash, idinfo)
+        return idinfo
+
+    def get_certs(self, force=False):
+        with self._certs_lock:
+            now = time.monotonic()
+            if self._certs is not None:
+                fresh = now < self._certs_expiry
+                throttled = now - self._certs_fetched_at < self.min_refresh_interval
+                if (fresh and not force) or (force and throttled):
+                    return self._certs
+
+            response = self.session.get(self.certs_url, timeout=self.timeout)
+            response.raise_for_status()
+            match = MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+            max_age = int(match.group(1)) if match else self.default_max_age
+
+            self._certs = response.json()
+            self._certs_fetched_at = now
+            self._certs_expiry = now + max_age
+            return self._certs
+
+    def _cached_token(self, token_hash):
+        with self._tokens_lock:
+            entry = self._tokens.get(token_hash)
+            if entry is None:
+                return None
+            expires_at, idinfo = entry
+            if expires_at - self.clock_skew <= time.time():
+                del self._tokens[token_hash]
+                return None
+            self._tokens.move_to_end(token_hash)
+            return idinfo
+
+    def _remember_token(self, token_hash, idinfo):
+        with self._tokens_lock:
+            self._tokens[token_hash] = (idinfo['exp'], idinfo)
+            while len(self._tokens) > self.token_cache_size:
+                self._tokens.popitem(last=False)
+
+
+def get_google_verifier():
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None or _verifier.client_id != settings.GOOGLE_CLIENT_ID:
+            _verifier = GoogleTokenVerifier(settings.GOOGLE_CLIENT_ID)
+    return _verifier
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.authentication.revocation import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens that have expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of rows deleted per statement')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write(f"Purged {deleted} expired revoked tokens")
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:25
+
+import apps.authentication.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', apps.authentication.models.UserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,168 @@
+"""
+Refresh-token revocation.
+
+Revoked JTIs live in ``RevokedToken`` until the token would have expired
+anyway; ``purge_revoked_tokens`` deletes them after that. Revoking is a
+plain INSERT: the unique ``jti`` makes a concurrent or repeated use of the
+same refresh token fail instead of racing a lookup. With rotation on, every
+refresh revokes the token it was made with, so that INSERT is the check.
+
+Each process keeps a Bloom filter of the revoked JTIs, synced incrementally
+by ``revoked_at``. Without rotation, checking a token that was never revoked
+(nearly every refresh) needs no query. With rotation, a replayed token is
+recognised from the filter and confirmed with one indexed read instead of a
+failing INSERT.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+# Rows committed shortly after a sync can carry an earlier ``revoked_at``;
+# re-reading this window on every sync keeps them from being skipped. Rows
+# already added within the window are remembered so they are not counted
+# twice.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+_store_lock = threading.Lock()
+_store = None
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.sha256(value.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationStore:
+    def __init__(self, capacity, error_rate, sync_interval):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._synced_until = None
+        self._next_sync = 0
+        # pk -> revoked_at of rows added within the last SYNC_OVERLAP.
+        self._recent = {}
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self._bloom:
+            return False
+        return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+    def revoke(self, jti, expires_at, user_id=None):
+        """
+        Record ``jti`` as revoked. Returns ``False`` if it already was.
+        """
+        self.sync()
+        if jti in self._bloom and RevokedToken.objects.filter(jti=jti).exists():
+            return False
+        try:
+            with transaction.atomic():
+                revoked = RevokedToken.objects.create(jti=jti, user_id=user_id, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        with self._lock:
+            self._add(revoked.pk, jti, revoked.revoked_at)
+        return True
+
+    def _add(self, pk, jti, revoked_at, window=None):
+        if pk in self._recent:
+            return
+        self._bloom.add(jti)
+        if window is None or revoked_at >= window:
+            self._recent[pk] = revoked_at
+
+    def sync(self, force=False):
+        with self._lock:
+            if not force and self._bloom is not None and time.monotonic() < self._next_sync:
+                return
+            now = timezone.now()
+            window = now - SYNC_OVERLAP
+            revoked = RevokedToken.objects.filter(expires_at__gt=now)
+            if self._bloom is None or self._bloom.count > self.capacity:
+                # First load, or the filter is saturated: rebuild it from
+                # the tokens that have not expired yet.
+                self._bloom = BloomFilter(self.capacity, self.error_rate)
+                self._recent = {}
+            else:
+                revoked = revoked.filter(revoked_at__gte=self._synced_until - SYNC_OVERLAP)
+            rows = revoked.values_list('pk', 'jti', 'revoked_at')
+            for pk, jti, revoked_at in rows.iterator(chunk_size=10000):
+                self._add(pk, jti, revoked_at, window)
+            self._synced_until = now
+            self._next_sync = time.monotonic() + self.sync_interval
+            self._recent = {pk: revoked_at for pk, revoked_at in self._recent.items() if revoked_at >= window}
+
+
+def get_revocation_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RevocationStore(
+                capacity=settings.TOKEN_REVOCATION_BLOOM_CAPACITY,
+                error_rate=settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+                sync_interval=settings.TOKEN_REVOCATION_SYNC_INTERVAL
+            )
+    return _store
+
+
+def is_token_revoked(token):
+    return get_revocation_store().is_revoked(token[api_settings.JTI_CLAIM])
+
+
+def revoke_token(token):
+    """
+    Revoke a refresh token. Returns ``False`` if it had already been revoked.
+    """
+    return get_revocation_store().revoke(
+        token[api_settings.JTI_CLAIM],
+        datetime_from_epoch(token['exp']),
+        user_id=token.get(api_settings.USER_ID_CLAIM)
+    )
+
+
+def purge_expired(batch_size=1000, max_batches=None):
+    """
+    Delete expired revocations ``batch_size`` rows at a time, so purging a
+    large backlog never holds long locks. Returns the number deleted.
+    """
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        expired = RevokedToken.objects.filter(
+            expires_at__lte=timezone.now()
+        ).order_by('expires_at').values_list('pk', flat=True)[:batch_size]
+        count, _ = RevokedToken.objects.filter(pk__in=list(expired)).delete()
+        deleted += count
+        batches += 1
+        if count < batch_size:
+            break
+    return deleted
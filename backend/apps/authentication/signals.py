@@ -0,0 +1,5 @@
+from .authentication import invalidate_cached_user
+
+
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
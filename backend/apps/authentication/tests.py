@@ -1,3 +1,94 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import CachedJWTAuthentication, user_cache_key, user_version_key
+from .models import RevokedToken, User
+from .revocation import BloomFilter, RevocationStore
+
+
+class BloomFilterTests(TestCase):
+    def test_membership(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.001)
+        for index in range(1000):
+            bloom.add(f'jti-{index}')
+        self.assertTrue(all(f'jti-{index}' in bloom for index in range(1000)))
+        false_positives = sum(f'other-{index}' in bloom for index in range(10000))
+        self.assertLess(false_positives, 50)
+
+
+class RevocationStoreTests(TestCase):
+    def setUp(self):
+        self.store = RevocationStore(capacity=1000, error_rate=0.001, sync_interval=60)
+        self.expires_at = timezone.now() + timedelta(days=1)
+
+    def test_revoke_once(self):
+        self.assertFalse(self.store.is_revoked('a'))
+        self.assertTrue(self.store.revoke('a', self.expires_at))
+        self.assertFalse(self.store.revoke('a', self.expires_at))
+        self.assertTrue(self.store.is_revoked('a'))
+        self.assertFalse(self.store.is_revoked('b'))
+
+    def test_expired_revocations_are_ignored(self):
+        RevokedToken.objects.create(jti='old', expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(self.store.is_revoked('old'))
+
+    def test_unrevoked_tokens_need_no_query(self):
+        self.store.sync()
+        with self.assertNumQueries(0):
+            self.assertFalse(self.store.is_revoked('never-revoked'))
+
+    def test_replay_is_rejected_from_the_filter(self):
+        self.store.revoke('a', self.expires_at)
+        with self.assertNumQueries(1):
+            self.assertFalse(self.store.revoke('a', self.expires_at))
+
+    def test_sees_revocations_from_other_processes(self):
+        self.store.sync()
+        user = User.objects.create(username='owner', email='owner@example.com')
+        RevokedToken.objects.create(jti='elsewhere', user=user, expires_at=self.expires_at)
+        self.assertFalse(self.store.is_revoked('elsewhere'))
+        self.store.sync(force=True)
+        self.assertTrue(self.store.is_revoked('elsewhere'))
+
+    def test_overlapping_syncs_count_each_token_once(self):
+        for index in range(5):
+            self.store.revoke(f'jti-{index}', self.expires_at)
+        for _ in range(3):
+            self.store.sync(force=True)
+        self.assertEqual(self.store._bloom.count, 5)
+
+
+# Every lookup past the per-process cache, as in another process.
+@override_settings(AUTH_USER_LOCAL_CACHE_TTL=0)
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='owner', email='owner@example.com')
+        self.token = AccessToken.for_user(self.user)
+        self.authentication = CachedJWTAuthentication()
+
+    def test_user_is_cached(self):
+        self.authentication.get_user(self.token)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authentication.get_user(self.token).pk, self.user.pk)
+
+    def test_bulk_deactivation_is_seen(self):
+        self.authentication.get_user(self.token)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(self.token)
+
+    def test_entry_written_before_invalidation_is_ignored(self):
+        # A request read the version, then the user was changed before it
+        # cached its (now stale) copy.
+        version = cache.get(user_version_key(self.user.pk))
+        stale = User.objects.get(pk=self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(first_name='Changed')
+        cache.set(user_cache_key(self.user.pk), (version, stale))
+
+        self.assertEqual(self.authentication.get_user(self.token).first_name, 'Changed')
@@ -3,12 +3,16 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
+from .google import get_google_verifier
+from .revocation import is_token_revoked, revoke_token
 from .models import User
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 
@@ -16,32 +20,26 @@ import json
 @permission_classes([AllowAny])
 def google_auth(request):
     try:
-        print("Request data:", request.data)  # Debug print
         token = request.data.get('token')
         if not token:
             error_msg = 'No token provided'
-            print(error_msg)
             return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
             
-        print("Attempting to verify token with client ID:", settings.GOOGLE_CLIENT_ID)
-        
         try:
             # Verify the token
-            idinfo = id_token.verify_oauth2_token(
-                token, requests.Request(), settings.GOOGLE_CLIENT_ID)
-            print("Token verification successful. ID info:", idinfo)
+            idinfo = get_google_verifier().verify(token)
         except ValueError as e:
             error_msg = f'Token verification failed: {str(e)}'
-            print(error_msg)
+            logger.info('Google token verification failed: %s', e)
             return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             error_msg = f'Unexpected error during token verification: {str(e)}'
-            print(error_msg)
+            logger.error('Unexpected error during Google token verification: %s', e, exc_info=True)
             return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
 
         if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
             error_msg = f'Invalid token issuer: {idinfo["iss"]}'
-            print(error_msg)
+            logger.warning('Google token with invalid issuer: %s', idinfo['iss'])
             return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
@@ -57,6 +55,8 @@ def google_auth(request):
                 }
             )
 
+            logger.info('Google sign-in for user %s (created: %s)', user.pk, created)
+
             # Generate JWT tokens
             refresh = RefreshToken.for_user(user)
             
@@ -72,12 +72,12 @@ def google_auth(request):
             })
         except Exception as e:
             error_msg = f'Error creating/retrieving user: {str(e)}'
-            print(error_msg)
+            logger.error('Error creating/retrieving Google user: %s', e, exc_info=True)
             return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
             
     except Exception as e:
         error_msg = f'Authentication failed: {str(e)}'
-        print(error_msg)
+        logger.error('Google authentication failed: %s', e, exc_info=True)
         return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
@@ -86,6 +86,18 @@ def refresh_token(request):
     try:
         refresh_token = request.data.get('refresh_token')
         token = RefreshToken(refresh_token)
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # Revoking first means a replayed refresh token fails here,
+            # even when two requests race with the same token.
+            if not revoke_token(token):
+                return Response({'error': 'Refresh token has been revoked'},
+                              status=status.HTTP_401_UNAUTHORIZED)
+            token.set_jti()
+            token.set_exp()
+            token.set_iat()
+        elif is_token_revoked(token):
+            return Response({'error': 'Refresh token has been revoked'},
+                          status=status.HTTP_401_UNAUTHORIZED)
         return Response({
             'access_token': str(token.access_token),
             'refresh_token': str(token)
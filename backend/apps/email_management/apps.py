@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.core.signals import setting_changed
 
 
 class EmailManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.email_management'
+
+    def ready(self):
+        from core.metrics import registry
+
+        from .llm import reset_llm_client
+        from .metrics import collect
+
+        registry.register_collector(collect)
+        setting_changed.connect(reset_llm_client, dispatch_uid='email_management_reset_llm_client')
@@ -0,0 +1,316 @@
+"""
+Synthetic data and a load driver for benchmarking the API.
+
+``seed`` creates benchmark users (``bench-<n>@example.com``) on an
+unlimited plan, with templates, campaigns and drafts written in batches so
+millions of drafts fit in constant memory. ``run`` sends a mix of requests
+from concurrent clients, either in-process through Django's test client
+(with ``FakeProvider`` answering generations after ``latency`` seconds) or
+against a running server, and ``summarize`` turns the samples into
+throughput, latency percentiles and database queries per endpoint. Query
+counts are read from the ``Server-Timing`` header set by
+``core.middleware.PerformanceMiddleware``.
+"""
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import requests
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connections, transaction
+from django.test import Client
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.analytics.rollups import backfill
+from apps.subscriptions.models import Plan, Subscription
+from core.utils import chunked
+
+from .models import EmailCampaign, EmailDraft, EmailTemplate
+
+USER_EMAIL = 'bench-{}@example.com'
+USER_PREFIX = 'bench-'
+PLAN_SLUG = 'benchmark'
+API_PREFIX = '/api/email-management'
+DRAFT_STATUSES = (('pending', 20), ('generated', 50), ('sent', 25), ('failed', 5))
+QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+Sample = namedtuple('Sample', ['endpoint', 'status', 'seconds', 'queries'])
+Target = namedtuple('Target', ['token', 'campaign_ids'])
+
+ENDPOINTS = {
+    'templates': ('GET', '/templates/'),
+    'campaigns': ('GET', '/campaigns/'),
+    'campaign': ('GET', '/campaigns/{campaign}/'),
+    'campaign_drafts': ('GET', '/campaigns/{campaign}/drafts/'),
+    'drafts': ('GET', '/drafts/'),
+    'generate_email': ('POST', '/campaigns/{campaign}/generate_email/'),
+}
+
+
+def benchmark_users():
+    return get_user_model().objects.filter(username__startswith=USER_PREFIX)
+
+
+def reset():
+    """
+    Delete the benchmark users and everything they own.
+    """
+    deleted, _ = benchmark_users().delete()
+    return deleted
+
+
+def _draft_rows(campaigns, drafts_per_campaign, rng, now):
+    statuses = [status for status, _ in DRAFT_STATUSES]
+    weights = [weight for _, weight in DRAFT_STATUSES]
+    for campaign in campaigns:
+        for index in range(drafts_per_campaign):
+            email = f'recipient-{campaign.pk}-{index}@example.com'
+            status = rng.choices(statuses, weights)[0]
+            generated = status != 'pending'
+            draft = EmailDraft(
+                campaign=campaign,
+                recipient_email=email,
+                recipient_name=f'Recipient {index}',
+                subject=f'Hello Recipient {index}',
+                body='' if not generated else f'Hi Recipient {index}, ' + 'lorem ipsum ' * rng.randint(20, 80),
+                personalization_data={'email': email, 'name': f'Recipient {index}', 'company': f'Company {index % 97}'},
+                status=status,
+                generated_at=now if generated else None,
+                sent_at=now if status == 'sent' else None,
+                error_message='Mailbox unavailable' if status == 'failed' else '',
+                prompt_tokens=rng.randint(80, 400) if generated else None,
+                completion_tokens=rng.randint(100, 300) if generated else None,
+                generation_ms=rng.randint(300, 4000) if generated else None,
+            )
+            draft.normalize()
+            yield draft
+
+
+def seed(users=10, templates=5, campaigns=20, drafts=100000, batch_size=5000, random_seed=0,
+         rollups=True, progress=None):
+    """
+    Create ``users`` benchmark users with ``templates`` templates and
+    ``campaigns`` campaigns each, and ``drafts`` drafts spread over all
+    campaigns. Returns the number of drafts written.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    User = get_user_model()
+
+    plan, _ = Plan.objects.get_or_create(slug=PLAN_SLUG, defaults={'name': 'Benchmark'})
+    User.objects.bulk_create([
+        User(username=f'{USER_PREFIX}{index}', email=USER_EMAIL.format(index))
+        for index in range(users)
+    ])
+    created_users = list(benchmark_users().order_by('pk'))
+    Subscription.objects.bulk_create([Subscription(user=user, plan=plan) for user in created_users])
+
+    EmailTemplate.objects.bulk_create([
+        EmailTemplate(
+            name=f'Template {index}',
+            subject_template='Hello {{ name }}',
+            body_template='Hi {{ name }},\n\nI came across {{ company }} and wanted to reach out.\n' * 3,
+            created_by=user
+        )
+        for user in created_users
+        for index in range(templates)
+    ])
+    user_templates = defaultdict(list)
+    for template in EmailTemplate.objects.filter(created_by__in=created_users).order_by('pk'):
+        user_templates[template.created_by_id].append(template)
+
+    EmailCampaign.objects.bulk_create([
+        EmailCampaign(
+            name=f'Campaign {index}',
+            template=rng.choice(user_templates[user.pk]) if user_templates[user.pk] else None,
+            # Every other campaign goes through the LLM.
+            custom_prompt='Keep it short and friendly.' if index % 2 else '',
+            created_by=user
+        )
+        for user in created_users
+        for index in range(campaigns)
+    ])
+    all_campaigns = list(EmailCampaign.objects.filter(created_by__in=created_users).order_by('pk'))
+
+    drafts_per_campaign = math.ceil(drafts / len(all_campaigns)) if all_campaigns else 0
+    written = 0
+    rows = _draft_rows(all_campaigns, drafts_per_campaign, rng, now)
+    for batch in chunked(rows, batch_size):
+        batch = batch[:drafts - written]
+        if not batch:
+            break
+        with transaction.atomic():
+            EmailDraft.objects.bulk_create(batch)
+        written += len(batch)
+        if progress is not None:
+            progress(written)
+
+    if rollups:
+        backfill(campaign_ids=[campaign.pk for campaign in all_campaigns])
+    return written
+
+
+def targets(limit=None):
+    """
+    A bearer token and the campaign ids of each benchmark user.
+    """
+    campaign_ids = defaultdict(list)
+    users = list(benchmark_users().order_by('pk')[:limit])
+    for user_id, campaign_id in EmailCampaign.objects.filter(
+        created_by__in=users
+    ).values_list('created_by_id', 'pk'):
+        campaign_ids[user_id].append(campaign_id)
+    return [
+        Target(str(RefreshToken.for_user(user).access_token), campaign_ids[user.pk])
+        for user in users
+        if campaign_ids[user.pk]
+    ]
+
+
+def query_count(server_timing):
+    match = QUERIES_RE.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+class LocalTransport:
+    """
+    Requests through Django's test client, one per thread.
+    """
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, token, body=None):
+        response = self.client.generic(
+            method,
+            path,
+            data=body or '',
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        return response.status_code, response.headers.get('Server-Timing')
+
+    def close(self):
+        close_old_connections()
+        connections.close_all()
+
+
+class HTTPTransport:
+    """
+    Requests to a running server at ``base_url``.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, token, body=None):
+        response = self.session.request(
+            method,
+            self.base_url + path,
+            data=body,
+            headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'},
+            timeout=120
+        )
+        return response.status_code, response.headers.get('Server-Timing')
+
+    def close(self):
+        self.session.close()
+
+
+def _body(endpoint, rng, worker, sequence):
+    if endpoint != 'generate_email':
+        return None
+    email = f'generated-{worker}-{sequence}-{rng.randrange(10 ** 9)}@example.com'
+    return (
+        '{"recipient_data": {"email": "%s", "name": "Load Test", "company": "Company %d"}}'
+        % (email, rng.randrange(1000))
+    )
+
+
+def run(endpoints, targets, concurrency=8, requests_per_endpoint=200, base_url=None, random_seed=0):
+    """
+    Send ``requests_per_endpoint`` requests to each of ``endpoints`` (names
+    from ``ENDPOINTS``) from ``concurrency`` threads, spread over the
+    benchmark users. Returns ``(samples, elapsed_seconds)``.
+    """
+    plan = [endpoint for endpoint in endpoints for _ in range(requests_per_endpoint)]
+    random.Random(random_seed).shuffle(plan)
+    samples = []
+    samples_lock = threading.Lock()
+    position = iter(range(len(plan)))
+    position_lock = threading.Lock()
+
+    def worker(number):
+        rng = random.Random(random_seed * 1000 + number)
+        transport = HTTPTransport(base_url) if base_url else LocalTransport()
+        results = []
+        try:
+            while True:
+                with position_lock:
+                    sequence = next(position, None)
+                if sequence is None:
+                    break
+                endpoint = plan[sequence]
+                target = targets[sequence % len(targets)]
+                method, path = ENDPOINTS[endpoint]
+                path = API_PREFIX + path.format(campaign=rng.choice(target.campaign_ids))
+                started = time.perf_counter()
+                try:
+                    status, server_timing = transport.request(
+                        method, path, target.token, _body(endpoint, rng, number, sequence)
+                    )
+                except requests.RequestException:
+                    status, server_timing = 0, None
+                results.append(Sample(endpoint, status, time.perf_counter() - started, query_count(server_timing)))
+        finally:
+            transport.close()
+            with samples_lock:
+                samples.extend(results)
+
+    threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    """
+    ``{endpoint: stats}`` with request and error counts, requests per
+    second, p50/p95/p99/max latency in milliseconds and the mean and
+    maximum number of queries.
+    """
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample.endpoint].append(sample)
+
+    summary = {}
+    for endpoint, endpoint_samples in sorted(by_endpoint.items()):
+        latencies = sorted(sample.seconds * 1000 for sample in endpoint_samples)
+        queries = [sample.queries for sample in endpoint_samples if sample.queries is not None]
+        summary[endpoint] = {
+            'requests': len(endpoint_samples),
+            'errors': sum(1 for sample in endpoint_samples if not 200 <= sample.status < 400),
+            'rps': len(endpoint_samples) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'max_ms': latencies[-1],
+            'queries_mean': sum(queries) / len(queries) if queries else None,
+            'queries_max': max(queries) if queries else None,
+        }
+    return summary
@@ -0,0 +1,192 @@
+"""
+Content-addressed cache for generated email bodies.
+
+Entries are keyed by a hash of the model, generation parameters and the
+whitespace-normalized prompt, so regenerating with the same inputs (or
+retrying after an error) is served without another completion. The backend
+is selected through ``settings.EMAIL_GENERATION_CACHE``::
+
+    EMAIL_GENERATION_CACHE = {
+        'BACKEND': 'apps.email_management.cache.LRUGenerationCache',
+        'TTL': 86400,
+        'MAX_ENTRIES': 10000,
+        'OPTIONS': {},
+    }
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+_cache_lock = threading.Lock()
+_generation_cache = None
+
+
+def normalize_prompt(prompt):
+    return ' '.join(prompt.split())
+
+
+def make_key(model, params, prompt):
+    payload = json.dumps(
+        {'model': model, 'params': params, 'prompt': normalize_prompt(prompt)},
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class BaseGenerationCache:
+    """
+    Common interface and hit/miss accounting for generation cache backends.
+    Subclasses implement ``_get`` and ``_set``.
+    """
+
+    def __init__(self, ttl=86400, max_entries=10000, **options):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.options = options
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._set(key, value)
+
+    def stats(self):
+        with self._stats_lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+
+class LRUGenerationCache(BaseGenerationCache):
+    """
+    In-process LRU with per-entry expiry. Not shared between workers.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DjangoGenerationCache(BaseGenerationCache):
+    """
+    Stores entries in one of the configured Django caches (``OPTIONS['ALIAS']``).
+    Size-based eviction is left to that cache's own ``MAX_ENTRIES``.
+    """
+
+    key_prefix = 'email-generation:'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = caches[self.options.get('ALIAS', 'default')]
+
+    def _get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def _set(self, key, value):
+        self.cache.set(self.key_prefix + key, value, timeout=self.ttl)
+
+
+class DatabaseGenerationCache(BaseGenerationCache):
+    """
+    Stores entries in ``GenerationCacheEntry``. Expired rows are purged and,
+    past ``MAX_ENTRIES``, the oldest ``1 / CULL_FREQUENCY`` of the table is
+    dropped, checked every ``CULL_EVERY`` writes.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.cull_frequency = self.options.get('CULL_FREQUENCY', 3)
+        self.cull_every = self.options.get('CULL_EVERY', 100)
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def _get(self, key):
+        from .models import GenerationCacheEntry
+
+        return GenerationCacheEntry.objects.filter(
+            key=key,
+            expires_at__gt=timezone.now()
+        ).values_list('value', flat=True).first()
+
+    def _set(self, key, value):
+        from .models import GenerationCacheEntry
+
+        GenerationCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={
+                'value': value,
+                'expires_at': timezone.now() + timedelta(seconds=self.ttl)
+            }
+        )
+        with self._writes_lock:
+            self._writes += 1
+            should_cull = self._writes % self.cull_every == 0
+        if should_cull:
+            self.cull()
+
+    def cull(self):
+        from .models import GenerationCacheEntry
+
+        GenerationCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+        count = GenerationCacheEntry.objects.count()
+        if count > self.max_entries:
+            oldest = GenerationCacheEntry.objects.order_by('expires_at').values_list(
+                'pk', flat=True
+            )[:count // self.cull_frequency]
+            GenerationCacheEntry.objects.filter(pk__in=list(oldest)).delete()
+
+
+def get_generation_cache():
+    global _generation_cache
+    with _cache_lock:
+        if _generation_cache is None:
+            config = settings.EMAIL_GENERATION_CACHE
+            backend = import_string(config['BACKEND'])
+            _generation_cache = backend(
+                ttl=config.get('TTL', 86400),
+                max_entries=config.get('MAX_ENTRIES', 10000),
+                **config.get('OPTIONS', {})
+            )
+    return _generation_cache
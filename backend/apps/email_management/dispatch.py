@@ -0,0 +1,225 @@
+"""
+Scheduled campaign dispatch.
+
+Due campaigns are moved from ``scheduled`` to ``in_progress`` and their
+drafts are then worked through in batches. Every claim (of a campaign or of
+a batch of drafts) is a single UPDATE whose target rows are picked with
+``select_for_update(skip_locked=True)``, so any number of dispatcher
+processes can run side by side: rows locked by one worker are skipped by
+the others, and claimed drafts are moved to ``sending`` in the same
+statement so no draft is delivered twice.
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.subscriptions.quotas import current_period, release
+
+from .generation import USAGE_FIELDS, generate_draft_bodies, needs_llm, recover_stale_jobs
+from .models import ACTIVE_JOB_STATUSES, OPEN_DRAFT_STATUSES, EmailCampaign, EmailDraft, GenerationJob
+from .sending import send_drafts
+from .signals import draft_state, notify_status_changes
+
+logger = logging.getLogger(__name__)
+
+STALE_CLAIM_ERROR = 'Delivery was interrupted and may have succeeded; not retried automatically'
+
+
+def claim_due_campaigns(limit=None):
+    """
+    Move up to ``limit`` due scheduled campaigns to ``in_progress`` and
+    return how many were claimed.
+    """
+    limit = limit or settings.EMAIL_DISPATCH_CAMPAIGN_LIMIT
+    with transaction.atomic():
+        due = EmailCampaign.objects.select_for_update(skip_locked=True).filter(
+            status='scheduled',
+            scheduled_time__lte=timezone.now()
+        ).order_by('scheduled_time').values('pk')[:limit]
+        return EmailCampaign.objects.filter(pk__in=due).update(status='in_progress')
+
+
+def claim_draft_batch(campaign_id, batch_size=None):
+    """
+    Claim the next batch of undelivered drafts of a campaign with a single
+    ``UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED LIMIT n)``
+    and return them. Drafts without ``generated_at`` still need generating.
+    Drafts of a generation job that is still queued or running are left to
+    the job and claimed once it has written them back.
+    """
+    batch_size = batch_size or settings.EMAIL_DISPATCH_BATCH_SIZE
+    token = uuid.uuid4()
+    with transaction.atomic():
+        candidates = EmailDraft.objects.select_for_update(skip_locked=True).filter(
+            campaign_id=campaign_id,
+            status__in=['pending', 'generated']
+        ).exclude(
+            generation_job__in=GenerationJob.objects.filter(status__in=ACTIVE_JOB_STATUSES).values('pk')
+        ).order_by('id').values('pk')[:batch_size]
+        claimed = EmailDraft.objects.filter(pk__in=candidates).update(
+            status='sending',
+            claimed_at=timezone.now(),
+            claim_token=token
+        )
+    if not claimed:
+        return []
+    return list(EmailDraft.objects.filter(claim_token=token).order_by('id'))
+
+
+def release_stale_claims(timeout=None):
+    """
+    Deal with drafts whose claim is older than ``timeout`` seconds (their
+    worker most likely died). Drafts that were never generated cannot have
+    been delivered and go back to ``pending``. Generated drafts may already
+    have been handed to the SMTP server, so they are marked ``failed`` for
+    someone to review instead of being queued again.
+    """
+    timeout = timeout or settings.EMAIL_DISPATCH_CLAIM_TIMEOUT
+    stale = EmailDraft.objects.filter(
+        status='sending',
+        claimed_at__lt=timezone.now() - timedelta(seconds=timeout)
+    )
+    released = stale.filter(generated_at__isnull=True).update(
+        status='pending', claimed_at=None, claim_token=None
+    )
+    with transaction.atomic():
+        expired = list(
+            stale.filter(generated_at__isnull=False).select_for_update(skip_locked=True).only(
+                'pk', 'campaign_id', 'status', 'created_at', 'generated_at', 'sent_at'
+            )
+        )
+        failed = EmailDraft.objects.filter(pk__in=[draft.pk for draft in expired]).update(
+            status='failed', error_message=STALE_CLAIM_ERROR, claimed_at=None, claim_token=None
+        )
+        previous = [draft_state(draft) for draft in expired]
+        for draft in expired:
+            draft.status = 'failed'
+        notify_status_changes(expired, previous)
+    if released:
+        logger.warning("Released %s stale draft claims", released)
+    if failed:
+        logger.error("Marked %s drafts with stale delivery claims as failed", failed)
+    return released + failed
+
+
+def process_campaign(campaign_id, batch_size=None):
+    """
+    Generate and deliver drafts of an in-progress campaign until no
+    unclaimed drafts are left, then try to close the campaign.
+    """
+    processed = 0
+    try:
+        campaign = EmailCampaign.objects.select_related('template').get(pk=campaign_id)
+        while True:
+            drafts = claim_draft_batch(campaign_id, batch_size)
+            if not drafts:
+                break
+            process_draft_batch(campaign, drafts)
+            processed += len(drafts)
+        complete_campaign(campaign_id)
+    finally:
+        connection.close()
+    return processed
+
+
+def process_draft_batch(campaign, drafts):
+    """
+    Generate the claimed drafts that still need a body, then hand every
+    deliverable draft to the sending pipeline. Drafts stay ``sending`` in the
+    database until their delivery outcome is recorded. Drafts that fail to
+    generate or to be delivered are refunded to the campaign owner.
+    """
+    pending = [draft for draft in drafts if draft.generated_at is None]
+    failed_generations = 0
+    if pending:
+        previous = [draft_state(draft) for draft in pending]
+        generate_draft_bodies(campaign, pending)
+        with transaction.atomic():
+            notify_status_changes(pending, previous)
+            for draft in pending:
+                if draft.status == 'generated':
+                    draft.status = 'sending'
+                else:
+                    draft.claimed_at = None
+                    draft.claim_token = None
+            EmailDraft.objects.bulk_update(
+                pending,
+                ['subject', 'body', 'status', 'generated_at', 'error_message', 'claimed_at', 'claim_token',
+                 *USAGE_FIELDS]
+            )
+        failed_generations = sum(1 for draft in pending if draft.status != 'sending')
+
+    deliverable = [draft for draft in drafts if draft.status == 'sending']
+    failed_deliveries = len(deliverable) - send_drafts(deliverable)
+    refund_failures(campaign, failed_generations, failed_generations + failed_deliveries)
+
+
+def refund_failures(campaign, generations, sends):
+    """
+    Give back the generations and sends ``send`` charged the campaign for
+    drafts that failed, to the month they were charged in.
+    """
+    period = campaign.quota_period or current_period()
+    if needs_llm(campaign):
+        release(campaign.created_by_id, 'generation', generations, period=period)
+    release(campaign.created_by_id, 'send', sends, period=period)
+
+
+def complete_campaign(campaign_id):
+    """
+    Mark an in-progress campaign as completed once none of its drafts are
+    waiting to be generated or delivered.
+    """
+    if EmailDraft.objects.filter(campaign_id=campaign_id, status__in=OPEN_DRAFT_STATUSES).exists():
+        return False
+    has_sent = EmailDraft.objects.filter(campaign_id=campaign_id, status='sent').exists()
+    has_drafts = EmailDraft.objects.filter(campaign_id=campaign_id).exists()
+    return bool(EmailCampaign.objects.filter(pk=campaign_id, status='in_progress').update(
+        status='completed' if has_sent or not has_drafts else 'failed'
+    ))
+
+
+def active_campaign_ids():
+    return list(
+        EmailCampaign.objects.filter(
+            status='in_progress'
+        ).order_by('scheduled_time').values_list('pk', flat=True)
+    )
+
+
+def dispatch(workers=None, batch_size=None):
+    """
+    Run one dispatch pass: claim due campaigns, release stale draft claims,
+    fail stale generation jobs and work through every in-progress campaign
+    on ``workers`` threads.
+    Returns the number of drafts processed by this process.
+    """
+    workers = workers or settings.EMAIL_DISPATCH_WORKERS
+    claimed = claim_due_campaigns()
+    if claimed:
+        logger.info("Claimed %s due campaigns", claimed)
+    release_stale_claims()
+    recover_stale_jobs()
+
+    # Every worker is pointed at each campaign in turn, so a single large
+    # campaign is still processed ``workers`` batches at a time.
+    tasks = [pk for pk in active_campaign_ids() for _ in range(workers)]
+    if not tasks:
+        return 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='campaign-dispatch') as executor:
+        return sum(executor.map(lambda pk: _process_campaign_safely(pk, batch_size), tasks))
+
+
+def _process_campaign_safely(campaign_id, batch_size):
+    # One broken campaign must not stop the others; its claimed drafts are
+    # picked up by ``release_stale_claims`` once the claim expires.
+    try:
+        return process_campaign(campaign_id, batch_size)
+    except Exception:
+        logger.exception("Dispatching campaign %s failed", campaign_id)
+        return 0
@@ -0,0 +1,471 @@
+"""
+Email body generation.
+
+Holds the prompt/LLM plumbing shared by ``generate_email`` and the bulk
+generation jobs. Completions go through the shared ``LLMClient`` (see
+``llm``), which adapts its concurrency to the provider's rate limits. Bulk
+jobs are coordinated on a small job executor and fan their LLM calls out
+over a shared, bounded thread pool so the number of in-flight provider
+requests per process never exceeds ``EMAIL_GENERATION_CONCURRENCY``,
+regardless of how many jobs are running. Prompts are built under a token
+budget (see ``prompts``), and the token counts and latency of each
+generation are stored on its draft.
+
+Jobs run in the process that accepted them, so a crash or deploy can leave
+them queued or running; ``recover_stale_jobs`` fails jobs whose heartbeat
+stopped and refunds the generations they did not get to.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.subscriptions.quotas import current_period, release
+from core.metrics import record_llm
+from core.utils import chunked, normalize_email
+
+from .cache import get_generation_cache, make_key
+from .llm import get_llm_client
+from .models import EmailCampaign, EmailDraft, GenerationJob
+from .prompts import build_prompt, count_message_tokens, count_tokens
+from .rendering import build_context, render_body, render_subject
+from .signals import draft_state, notify_status_changes
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are a professional email writer."
+USAGE_FIELDS = ['prompt_tokens', 'completion_tokens', 'generation_ms']
+NO_USAGE = dict.fromkeys(USAGE_FIELDS)
+STALE_JOB_ERROR = 'The job stopped making progress (the worker running it probably exited).'
+
+_executor_lock = threading.Lock()
+_llm_executor = None
+_job_executor = None
+
+
+def build_messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def measure_usage(started, prompt_tokens=0, completion_tokens=0):
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'generation_ms': int((time.monotonic() - started) * 1000),
+    }
+
+
+def generate_body(prompt):
+    """
+    Return ``(text, usage)`` for ``prompt``, serving the text from the
+    generation cache when the same model, parameters and prompt were seen
+    before. ``usage`` holds the tokens billed (none for a cache hit) and
+    the time taken.
+    """
+    started = time.monotonic()
+    client = get_llm_client()
+    cache = get_generation_cache()
+    key = make_key(client.model, client.params, prompt)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached['content'], measure_usage(started)
+
+    messages = build_messages(prompt)
+    completion = client.complete(messages)
+    cache.set(key, {'content': completion.content})
+    usage = measure_usage(
+        started,
+        prompt_tokens=completion.prompt_tokens,
+        completion_tokens=completion.completion_tokens
+    )
+    if usage['prompt_tokens'] is None:
+        usage['prompt_tokens'] = count_message_tokens(messages)
+    if usage['completion_tokens'] is None:
+        usage['completion_tokens'] = count_tokens(completion.content)
+    record_llm(usage['generation_ms'] / 1000, usage['prompt_tokens'], usage['completion_tokens'])
+    return completion.content, usage
+
+
+async def stream_body(prompt, usage=None):
+    """
+    Async generator yielding the generated text for ``prompt`` chunk by
+    chunk as the provider streams it. A cached completion is yielded in one
+    piece; a completed stream is added to the cache. When given, the
+    ``usage`` dict is filled in once the stream completes.
+    """
+    started = time.monotonic()
+    client = get_llm_client()
+    cache = get_generation_cache()
+    key = make_key(client.model, client.params, prompt)
+    cached = await sync_to_async(cache.get)(key)
+    if cached is not None:
+        yield cached['content']
+        if usage is not None:
+            usage.update(measure_usage(started))
+        return
+
+    messages = build_messages(prompt)
+    parts = []
+    async for token in client.astream(messages):
+        parts.append(token)
+        yield token
+    content = ''.join(parts)
+    await sync_to_async(cache.set)(key, {'content': content})
+    stream_usage = measure_usage(
+        started,
+        prompt_tokens=count_message_tokens(messages),
+        completion_tokens=count_tokens(content)
+    )
+    record_llm(stream_usage['generation_ms'] / 1000, stream_usage['prompt_tokens'], stream_usage['completion_tokens'])
+    if usage is not None:
+        usage.update(stream_usage)
+
+
+def default_subject(template):
+    return template.subject_template if template else 'Subject'
+
+
+def needs_llm(campaign):
+    """
+    Plain merge-field campaigns (a template and no custom prompt) are
+    rendered locally; everything else goes through the LLM.
+    """
+    return campaign.template is None or bool(campaign.custom_prompt.strip())
+
+
+def prepare_content(campaign, recipient_data, email=None, name=None):
+    """
+    Return ``(subject, body, prompt)`` for one recipient. ``prompt`` is
+    ``None`` when the rendered template is the final body; otherwise the
+    body still has to be generated from it.
+    """
+    template = campaign.template
+    if template is None:
+        prompt = build_prompt(None, campaign.custom_prompt, recipient_data)
+        return default_subject(None), None, prompt
+
+    context = build_context(recipient_data, email=email, name=name)
+    subject = render_subject(template, context)
+    body = render_body(template, context)
+    if needs_llm(campaign):
+        return subject, None, build_prompt(body, campaign.custom_prompt, recipient_data)
+    return subject, body, None
+
+
+def generate_content(campaign, recipient_data, email=None, name=None):
+    """
+    Return ``(subject, body, usage)`` for one recipient. The template is
+    rendered with the recipient's merge fields and, when the campaign asks
+    for it, used as the basis of an LLM prompt. ``usage`` is ``NO_USAGE``
+    when the LLM was not involved.
+    """
+    subject, body, prompt = prepare_content(campaign, recipient_data, email=email, name=name)
+    if prompt is None:
+        return subject, body, NO_USAGE
+    body, usage = generate_body(prompt)
+    return subject, body, usage
+
+
+def recipient_already_sent(campaign, email):
+    return EmailDraft.objects.filter(
+        campaign=campaign,
+        recipient_email_normalized=normalize_email(email),
+        status__in=['sending', 'sent']
+    ).exists()
+
+
+class RecipientAlreadySent(Exception):
+    """The recipient's draft is being sent or was sent already."""
+
+    def __init__(self, message='This recipient has already been emailed.'):
+        super().__init__(message)
+
+
+def save_generated_draft(campaign, recipient_data, subject, body, usage=None):
+    """
+    Store a generated email as the campaign's draft for the recipient,
+    replacing the body of an existing pending, generated or failed draft for
+    the same address. Raises ``RecipientAlreadySent`` if a draft for the
+    address is being sent or was sent, which must not be reset.
+    """
+    email = recipient_data.get('email')
+    values = {
+        'recipient_email': email,
+        'recipient_name': recipient_data.get('name'),
+        'subject': subject,
+        'body': body,
+        'personalization_data': recipient_data,
+        'status': 'generated',
+        'generated_at': timezone.now(),
+        'error_message': '',
+        **(usage or NO_USAGE),
+    }
+    with transaction.atomic():
+        # The latest unsent draft for the address; update_or_create is not
+        # used so that its previous state can be reported.
+        locked = list(EmailDraft.objects.select_for_update().filter(
+            campaign=campaign,
+            recipient_email_normalized=normalize_email(email)
+        ).order_by('-id'))
+        if any(draft.status in ('sending', 'sent') for draft in locked):
+            raise RecipientAlreadySent()
+        draft = locked[0] if locked else None
+        if draft is None:
+            draft = EmailDraft.objects.create(campaign=campaign, **values)
+            previous = None
+        else:
+            previous = [draft_state(draft)]
+            for field, value in values.items():
+                setattr(draft, field, value)
+            draft.save(update_fields=list(values))
+        notify_status_changes([draft], previous)
+    return draft
+
+
+def _get_executors():
+    global _llm_executor, _job_executor
+    with _executor_lock:
+        if _llm_executor is None:
+            _llm_executor = ThreadPoolExecutor(
+                max_workers=settings.EMAIL_GENERATION_CONCURRENCY,
+                thread_name_prefix='email-generation'
+            )
+            _job_executor = ThreadPoolExecutor(
+                max_workers=settings.EMAIL_GENERATION_MAX_JOBS,
+                thread_name_prefix='email-generation-job'
+            )
+    return _llm_executor, _job_executor
+
+
+def start_bulk_generation(campaign, recipients, user):
+    """
+    Create a generation job with one pending draft per recipient and hand it
+    to the background executor once the transaction commits. Recipients the
+    campaign already has a draft for are skipped.
+    """
+    from .importers import insert_drafts
+
+    template = campaign.template
+    subject = default_subject(template)
+    batch_size = settings.EMAIL_GENERATION_BATCH_SIZE
+
+    with transaction.atomic():
+        job = GenerationJob.objects.create(campaign=campaign, created_by=user)
+        insert_drafts(
+            [
+                EmailDraft(
+                    campaign=campaign,
+                    generation_job=job,
+                    recipient_email=recipient['email'],
+                    recipient_name=recipient.get('name') or '',
+                    subject=subject,
+                    body='',
+                    personalization_data=recipient
+                )
+                for recipient in recipients
+            ],
+            batch_size=batch_size
+        )
+        job.total = job.drafts.count()
+        job.save(update_fields=['total'])
+        transaction.on_commit(lambda: submit_generation_job(job.pk))
+
+    return job
+
+
+def submit_generation_job(job_id):
+    _, job_executor = _get_executors()
+    return job_executor.submit(run_generation_job, job_id)
+
+
+def run_generation_job(job_id):
+    """
+    Generate every pending draft of a job in batches of
+    ``EMAIL_GENERATION_BATCH_SIZE``. LLM calls run on the shared pool and
+    only touch in-memory objects; each batch is written back from this
+    thread with a single bulk update of the drafts that are still pending.
+    """
+    batch_size = settings.EMAIL_GENERATION_BATCH_SIZE
+
+    try:
+        now = timezone.now()
+        # A job that waited too long in the executor may have been failed
+        # by recover_stale_jobs in the meantime.
+        if not GenerationJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', started_at=now, heartbeat_at=now
+        ):
+            return
+        job = GenerationJob.objects.select_related('campaign__template').get(pk=job_id)
+
+        campaign = job.campaign
+        drafts = job.drafts.filter(status='pending').only(
+            'id', 'campaign_id', 'recipient_email', 'recipient_name', 'subject', 'personalization_data',
+            'status', 'created_at', 'generated_at', 'sent_at'
+        )
+        for chunk in chunked(drafts.iterator(chunk_size=batch_size), batch_size):
+            previous = [draft_state(draft) for draft in chunk]
+            generate_draft_bodies(campaign, chunk)
+            if not _flush_drafts(job, chunk, previous):
+                # Failed (and refunded) meanwhile, e.g. by recover_stale_jobs.
+                return
+
+        GenerationJob.objects.filter(pk=job_id, status='running').update(
+            status='completed', finished_at=timezone.now()
+        )
+    except Exception as e:
+        logger.error("Generation job %s failed: %s", job_id, e, exc_info=True)
+        fail_generation_job(job_id, str(e))
+    finally:
+        connection.close()
+
+
+def fail_generation_job(job_id, error_message, condition=None):
+    """
+    Mark an unfinished job failed (when it also matches ``condition``) and
+    refund the generations charged for drafts it did not process, to the
+    month the job was charged in. Returns whether the job was failed.
+    """
+    jobs = GenerationJob.objects.filter(pk=job_id, status__in=['queued', 'running'])
+    if condition is not None:
+        jobs = jobs.filter(condition)
+    if not jobs.update(status='failed', error_message=error_message, finished_at=timezone.now()):
+        return False
+    job = GenerationJob.objects.select_related('campaign__template').get(pk=job_id)
+    if needs_llm(job.campaign):
+        release(job.created_by_id, 'generation', job.total - job.processed, period=current_period(job.created_at))
+    return True
+
+
+def recover_stale_jobs(timeout=None):
+    """
+    Fail jobs left queued or running by a process that went away: queued
+    jobs older than ``timeout`` seconds and running jobs whose heartbeat is.
+    Their unprocessed drafts stay pending. Returns the number of jobs
+    failed.
+    """
+    timeout = timeout or settings.EMAIL_GENERATION_JOB_TIMEOUT
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = Q(status='queued', created_at__lt=cutoff) | Q(status='running', heartbeat_at__lt=cutoff)
+    recovered = sum(
+        fail_generation_job(job_id, STALE_JOB_ERROR, condition=stale)
+        for job_id in GenerationJob.objects.filter(stale).values_list('pk', flat=True)
+    )
+    if recovered:
+        logger.warning("Failed %s stale generation jobs", recovered)
+    return recovered
+
+
+def generate_draft_bodies(campaign, drafts):
+    """
+    Generate subjects and bodies for ``drafts``, on the shared LLM pool when
+    the campaign needs the LLM and inline otherwise. Each draft is updated
+    in place (subject, body, status, generated_at, error_message and the
+    ``USAGE_FIELDS``); nothing is saved.
+    """
+    if not needs_llm(campaign):
+        for draft in drafts:
+            _apply_generation_result(draft, _generate_draft_content, campaign, draft)
+        return drafts
+
+    llm_executor, _ = _get_executors()
+    futures = {
+        llm_executor.submit(_generate_on_pool, campaign, draft): draft
+        for draft in drafts
+    }
+    for future in as_completed(futures):
+        _apply_generation_result(futures[future], future.result)
+    return drafts
+
+
+def _apply_generation_result(draft, result, *args):
+    try:
+        draft.subject, draft.body, usage = result(*args)
+        for field, value in usage.items():
+            setattr(draft, field, value)
+        draft.status = 'generated'
+        draft.generated_at = timezone.now()
+    except Exception as e:
+        logger.warning("Generation failed for draft %s: %s", draft.pk, e)
+        draft.status = 'failed'
+        draft.error_message = str(e)
+
+
+def _generate_draft_content(campaign, draft):
+    return generate_content(
+        campaign,
+        draft.personalization_data,
+        email=draft.recipient_email,
+        name=draft.recipient_name
+    )
+
+
+def _generate_on_pool(campaign, draft):
+    # The pool's threads are long-lived and reach the database through the
+    # generation cache, so their connections are recycled like a request's.
+    close_old_connections()
+    try:
+        return _generate_draft_content(campaign, draft)
+    finally:
+        close_old_connections()
+
+
+def _flush_drafts(job, drafts, previous):
+    """
+    Write a generated batch back, count it on the job and refund the drafts
+    that failed to generate. Nothing is written and False is returned once
+    the job is no longer running.
+    """
+    if not drafts:
+        return True
+    with transaction.atomic():
+        # Only drafts that are still pending are written back: one generated
+        # on its own in the meantime must not be overwritten.
+        pending = set(EmailDraft.objects.select_for_update().filter(
+            pk__in=[draft.pk for draft in drafts],
+            status='pending'
+        ).values_list('pk', flat=True))
+        written = [(draft, state) for draft, state in zip(drafts, previous) if draft.pk in pending]
+        written_drafts = [draft for draft, _ in written]
+        succeeded = sum(1 for draft in written_drafts if draft.status == 'generated')
+        if not GenerationJob.objects.filter(pk=job.pk, status='running').update(
+            processed=F('processed') + len(drafts),
+            succeeded=F('succeeded') + succeeded,
+            failed=F('failed') + len(written_drafts) - succeeded,
+            heartbeat_at=timezone.now()
+        ):
+            return False
+        EmailDraft.objects.filter(status='pending').bulk_update(
+            written_drafts,
+            ['subject', 'body', 'status', 'generated_at', 'error_message', *USAGE_FIELDS]
+        )
+        notify_status_changes(written_drafts, [state for _, state in written])
+    _refund_failed_generations(job, sum(1 for draft in drafts if draft.status != 'generated'))
+    return True
+
+
+def _refund_failed_generations(job, failed):
+    """
+    Give back the generations charged when the job was started for drafts
+    that failed, and their sends if the campaign was sent with them still
+    pending.
+    """
+    if not failed:
+        return
+    if needs_llm(job.campaign):
+        release(job.created_by_id, 'generation', failed, period=current_period(job.created_at))
+    sent_in = EmailCampaign.objects.filter(
+        pk=job.campaign_id,
+        status__in=['scheduled', 'in_progress']
+    ).values_list('quota_period', flat=True).first()
+    if sent_in is not None:
+        release(job.created_by_id, 'send', failed, period=sent_in)
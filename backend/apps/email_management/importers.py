@@ -0,0 +1,145 @@
+"""
+Bulk draft import from uploaded CSV/JSONL recipient files.
+
+Rows are streamed from the upload, validated in chunks and inserted with
+``bulk_create``, one transaction per chunk, so memory use is bounded by
+the chunk size rather than the file size. Recipients are deduplicated on
+their normalized address, both within a chunk and against the drafts the
+campaign already has.
+"""
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from core.utils import chunked, iter_uploaded_rows
+
+from .generation import default_subject
+from .models import EmailDraft
+from .signals import notify_status_changes
+
+logger = logging.getLogger(__name__)
+
+EMAIL_COLUMNS = ('email', 'recipient_email')
+NAME_COLUMNS = ('name', 'recipient_name')
+
+
+def _first_value(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, ''):
+            return str(value).strip()
+    return ''
+
+
+def build_draft(campaign, row, default_subject_line):
+    """
+    Validate one imported row and return ``(draft, errors)``. Columns other
+    than the recipient fields are kept as personalization data.
+    """
+    errors = {}
+    email = _first_value(row, EMAIL_COLUMNS)
+    name = _first_value(row, NAME_COLUMNS)
+    subject = _first_value(row, ('subject',)) or default_subject_line
+    body = _first_value(row, ('body',))
+
+    try:
+        validate_email(email)
+    except ValidationError:
+        errors['email'] = 'Enter a valid email address.'
+    if len(name) > 100:
+        errors['name'] = 'Ensure this field has no more than 100 characters.'
+    if len(subject) > 200:
+        errors['subject'] = 'Ensure this field has no more than 200 characters.'
+    if errors:
+        return None, errors
+
+    personalization_data = {
+        key: value for key, value in row.items()
+        if key not in EMAIL_COLUMNS + NAME_COLUMNS + ('subject', 'body')
+    }
+    personalization_data.update({'email': email, 'name': name})
+    return EmailDraft(
+        campaign=campaign,
+        recipient_email=email,
+        recipient_name=name,
+        subject=subject,
+        body=body,
+        personalization_data=personalization_data
+    ), None
+
+
+def insert_drafts(drafts, batch_size=None):
+    """
+    Insert new drafts, skipping recipients whose normalized address repeats
+    within ``drafts`` (the first one wins) or already has a draft in the
+    same campaign. Returns ``(created, duplicates)``.
+    """
+    unique = {}
+    for draft in drafts:
+        draft.normalize()
+        unique.setdefault((draft.campaign_id, draft.recipient_email_normalized), draft)
+    if not unique:
+        return 0, 0
+
+    existing = None
+    while True:
+        previous, existing = existing, set(EmailDraft.objects.filter(
+            campaign_id__in={campaign_id for campaign_id, _ in unique},
+            recipient_email_normalized__in={email for _, email in unique}
+        ).values_list('campaign_id', 'recipient_email_normalized'))
+        new_drafts = [draft for key, draft in unique.items() if key not in existing]
+        try:
+            with transaction.atomic():
+                EmailDraft.objects.bulk_create(new_drafts, batch_size=batch_size)
+            break
+        except IntegrityError:
+            # Drafts for some of the recipients were inserted concurrently
+            # since the check; check again so only inserted rows are counted.
+            if existing == previous:
+                raise
+            for draft in new_drafts:
+                draft.pk = None
+                draft._state.adding = True
+
+    notify_status_changes(new_drafts)
+    return len(new_drafts), len(drafts) - len(new_drafts)
+
+
+def import_drafts(campaign, upload, file_format=None, batch_size=None):
+    """
+    Import every row of ``upload`` as a pending draft of ``campaign`` and
+    return a report with the number of created, duplicate and failed rows
+    plus the first ``EMAIL_IMPORT_MAX_ERRORS`` row errors.
+    """
+    batch_size = batch_size or settings.EMAIL_IMPORT_BATCH_SIZE
+    max_errors = settings.EMAIL_IMPORT_MAX_ERRORS
+    subject = default_subject(campaign.template)
+    report = {'created': 0, 'duplicates': 0, 'failed': 0, 'errors': []}
+
+    for chunk in chunked(iter_uploaded_rows(upload, file_format), batch_size):
+        drafts = []
+        for line_number, row, parse_error in chunk:
+            if parse_error:
+                errors = {'row': parse_error}
+            else:
+                draft, errors = build_draft(campaign, row, subject)
+            if errors:
+                report['failed'] += 1
+                if len(report['errors']) < max_errors:
+                    report['errors'].append({'line': line_number, 'errors': errors})
+                continue
+            drafts.append(draft)
+
+        with transaction.atomic():
+            created, duplicates = insert_drafts(drafts, batch_size=batch_size)
+        report['created'] += created
+        report['duplicates'] += duplicates
+
+    logger.info(
+        "Imported %s drafts into campaign %s (%s duplicates, %s failed rows)",
+        report['created'], campaign.pk, report['duplicates'], report['failed']
+    )
+    return report
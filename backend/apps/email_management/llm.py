@@ -0,0 +1,412 @@
+"""
+LLM client used by every generation path.
+
+Providers implement ``complete`` and ``stream`` against one chat-completion
+API; ``LLMClient`` wraps a provider with an ``AdaptiveLimiter`` and retries:
+
+* concurrency follows AIMD: every success raises the in-flight limit by
+  ``1 / limit``, every 429 or overload halves it (down to one request);
+* a 429's ``Retry-After`` and exhausted ``x-ratelimit-remaining-*``
+  headers pause all new requests of the process until the reset;
+* retryable failures (429, 5xx, timeouts, dropped connections) are retried
+  up to ``max_retries`` times with full-jitter exponential backoff. Streams
+  are only retried until their first token.
+
+The provider is selected through ``settings.LLM_PROVIDER``::
+
+    LLM_PROVIDER = {
+        'BACKEND': 'apps.email_management.llm.OpenAIProvider',
+        'OPTIONS': {'api_key': '...', 'read_timeout': 60.0},
+    }
+
+``FakeProvider`` answers locally for tests and benchmarks.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import closing
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+OPENAI_BASE_URL = 'https://api.openai.com/v1'
+DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+RETRYABLE_STATUSES = {408, 409, 500, 502, 503, 504}
+
+Completion = namedtuple('Completion', ['content', 'prompt_tokens', 'completion_tokens'])
+
+_client_lock = threading.Lock()
+_client = None
+_STREAM_END = object()
+
+
+class LLMError(Exception):
+    """
+    A failed completion that should not be retried.
+    """
+
+
+class RetryableError(LLMError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(RetryableError):
+    pass
+
+
+def parse_duration(value):
+    """
+    Seconds in a rate-limit reset header (``"1s"``, ``"6m0s"``, ``"20ms"``
+    or a plain number of seconds), or ``None``.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def rate_limit_info(headers):
+    """
+    ``{'remaining_requests', 'reset_requests', 'remaining_tokens',
+    'reset_tokens', 'retry_after'}`` from provider response headers.
+    """
+    retry_after = parse_duration(headers.get('retry-after'))
+    retry_after_ms = _int_header(headers, 'retry-after-ms')
+    if retry_after_ms is not None:
+        retry_after = retry_after_ms / 1000
+    return {
+        'remaining_requests': _int_header(headers, 'x-ratelimit-remaining-requests'),
+        'reset_requests': parse_duration(headers.get('x-ratelimit-reset-requests')),
+        'remaining_tokens': _int_header(headers, 'x-ratelimit-remaining-tokens'),
+        'reset_tokens': parse_duration(headers.get('x-ratelimit-reset-tokens')),
+        'retry_after': retry_after,
+    }
+
+
+class BaseProvider:
+    """
+    ``complete`` returns ``(Completion, rate_limit_info)``. ``stream`` is a
+    generator of content tokens that returns ``rate_limit_info`` when done.
+    """
+
+    def complete(self, messages, model, params):
+        raise NotImplementedError
+
+    def stream(self, messages, model, params):
+        raise NotImplementedError
+
+
+class OpenAIProvider(BaseProvider):
+    """
+    Chat completions over a pooled ``requests.Session``.
+    """
+
+    def __init__(self, api_key='', base_url=OPENAI_BASE_URL, organization='', pool_size=16,
+                 connect_timeout=5.0, read_timeout=60.0, session=None):
+        self.api_key = api_key
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.organization = organization
+        self.timeout = (connect_timeout, read_timeout)
+
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session = session
+
+    def complete(self, messages, model, params):
+        response = self._post({'model': model, 'messages': messages, **params})
+        try:
+            data = response.json()
+            content = data['choices'][0]['message']['content'] or ''
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise RetryableError('Malformed completion response')
+        usage = data.get('usage') or {}
+        return (
+            Completion(content, usage.get('prompt_tokens'), usage.get('completion_tokens')),
+            rate_limit_info(response.headers)
+        )
+
+    def stream(self, messages, model, params):
+        response = self._post({'model': model, 'messages': messages, 'stream': True, **params}, stream=True)
+        with closing(response):
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == '[DONE]':
+                        break
+                    choices = json.loads(payload).get('choices') or [{}]
+                    token = (choices[0].get('delta') or {}).get('content')
+                    if token:
+                        yield token
+            except requests.RequestException as e:
+                raise RetryableError(f'Completion stream interrupted: {e}')
+            except ValueError:
+                raise RetryableError('Malformed completion stream')
+        return rate_limit_info(response.headers)
+
+    def _post(self, body, stream=False):
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+        if self.organization:
+            headers['OpenAI-Organization'] = self.organization
+        try:
+            response = self.session.post(self.url, json=body, headers=headers, timeout=self.timeout, stream=stream)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise RetryableError(f'Completion request failed: {e}')
+
+        if response.status_code < 400:
+            return response
+
+        try:
+            error = response.json().get('error') or {}
+        except (ValueError, AttributeError):
+            error = {}
+        message = error.get('message') or response.text[:200]
+        response.close()
+        info = rate_limit_info(response.headers)
+        # Running out of credit is reported as a 429 as well but will not
+        # go away by waiting.
+        if response.status_code == 429 and error.get('code') != 'insufficient_quota':
+            raise RateLimited(f'Rate limited: {message}', retry_after=info['retry_after'])
+        if response.status_code in RETRYABLE_STATUSES:
+            raise RetryableError(f'Provider error {response.status_code}: {message}',
+                                 retry_after=info['retry_after'])
+        raise LLMError(f'Provider error {response.status_code}: {message}')
+
+
+class FakeProvider(BaseProvider):
+    """
+    Deterministic local completions, optionally after ``latency`` seconds.
+    """
+
+    def __init__(self, latency=0.0, **options):
+        self.latency = latency
+
+    def _content(self, messages, model):
+        prompt = ' '.join(messages[-1]['content'].split())
+        return f'[{model}] Generated email for: {prompt[:200]}'
+
+    def complete(self, messages, model, params):
+        if self.latency:
+            time.sleep(self.latency)
+        content = self._content(messages, model)
+        prompt_tokens = sum(len(message['content'].split()) for message in messages)
+        return Completion(content, prompt_tokens, len(content.split())), {}
+
+    def stream(self, messages, model, params):
+        if self.latency:
+            time.sleep(self.latency)
+        words = self._content(messages, model).split(' ')
+        for index, word in enumerate(words):
+            yield word if index == 0 else ' ' + word
+        return {}
+
+
+class AdaptiveLimiter:
+    """
+    Process-wide AIMD limit on in-flight provider requests, between
+    ``min_limit`` and ``max_limit``, plus a pause every request waits out.
+    """
+
+    def __init__(self, max_limit, min_limit=1, decrease_factor=0.5):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_factor = decrease_factor
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._condition.wait(wait if wait > 0 else None)
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def increase(self):
+        with self._condition:
+            previous = int(self.limit)
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if int(self.limit) > previous:
+                self._condition.notify()
+
+    def decrease(self):
+        with self._condition:
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+
+    def pause(self, seconds):
+        with self._condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+
+class LLMClient:
+    def __init__(self, provider, model, params, limiter, max_retries=4, backoff_base=0.5, backoff_max=30.0):
+        self.provider = provider
+        self.model = model
+        self.params = params
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+    def complete(self, messages):
+        """
+        Return the ``Completion`` for ``messages``, raising ``LLMError`` once
+        retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                completion, info = self.provider.complete(messages, self.model, self.params)
+            except RetryableError as e:
+                error = e
+            else:
+                self._succeeded(info)
+                return completion
+            finally:
+                self.limiter.release()
+
+            self._failed(error)
+            if attempt >= self.max_retries:
+                raise error
+            time.sleep(self.backoff(attempt, error.retry_after))
+            attempt += 1
+
+    def stream(self, messages):
+        """
+        Yield the content tokens for ``messages`` as the provider sends them.
+        """
+        attempt = 0
+        while True:
+            started = False
+            tokens = None
+            self.limiter.acquire()
+            try:
+                tokens = self.provider.stream(messages, self.model, self.params)
+                while True:
+                    try:
+                        token = next(tokens)
+                    except StopIteration as stop:
+                        info = stop.value or {}
+                        break
+                    started = True
+                    yield token
+            except RetryableError as e:
+                if started:
+                    self._failed(e)
+                    raise
+                error = e
+            else:
+                self._succeeded(info)
+                return
+            finally:
+                if tokens is not None:
+                    tokens.close()
+                self.limiter.release()
+
+            self._failed(error)
+            if attempt >= self.max_retries:
+                raise error
+            time.sleep(self.backoff(attempt, error.retry_after))
+            attempt += 1
+
+    async def astream(self, messages):
+        """
+        ``stream`` for async views. Every token is read on a worker thread,
+        so the event loop never blocks on the provider.
+        """
+        tokens = self.stream(messages)
+        read = sync_to_async(next, thread_sensitive=False)
+        try:
+            while True:
+                token = await read(tokens, _STREAM_END)
+                if token is _STREAM_END:
+                    return
+                yield token
+        finally:
+            await sync_to_async(tokens.close, thread_sensitive=False)()
+
+    def _succeeded(self, info):
+        self.limiter.increase()
+        for remaining, reset in (('remaining_requests', 'reset_requests'), ('remaining_tokens', 'reset_tokens')):
+            if info.get(remaining) == 0 and info.get(reset):
+                self.limiter.pause(info[reset])
+
+    def _failed(self, error):
+        self.limiter.decrease()
+        if isinstance(error, RateLimited) and error.retry_after:
+            self.limiter.pause(error.retry_after)
+
+
+def get_llm_client():
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            config = settings.LLM_PROVIDER
+            provider = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+            _client = LLMClient(
+                provider,
+                model=settings.LLM_MODEL,
+                params={
+                    'max_tokens': settings.LLM_MAX_TOKENS,
+                    'temperature': settings.LLM_TEMPERATURE,
+                },
+                limiter=AdaptiveLimiter(settings.LLM_MAX_CONCURRENCY),
+                max_retries=settings.LLM_MAX_RETRIES,
+                backoff_base=settings.LLM_BACKOFF_BASE,
+                backoff_max=settings.LLM_BACKOFF_MAX
+            )
+    return _client
+
+
+def reset_llm_client(setting=None, **kwargs):
+    """
+    Drop the shared client so the next ``get_llm_client`` picks up new
+    settings. Also connected to ``setting_changed`` for ``LLM_*`` settings.
+    """
+    global _client
+    if setting is None or setting.startswith('LLM_'):
+        with _client_lock:
+            _client = None
@@ -0,0 +1,77 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from apps.email_management.benchmark import ENDPOINTS, run, summarize, targets
+
+
+class Command(BaseCommand):
+    help = 'Drive the email management API with concurrent clients and report latency and queries per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                            help=f"Comma-separated endpoints out of {', '.join(ENDPOINTS)}")
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--users', type=int, default=None,
+                            help='Only use the first N benchmark users')
+        parser.add_argument('--latency', type=float, default=0.2,
+                            help='Seconds the fake LLM provider takes per completion (in-process only)')
+        parser.add_argument('--url', default=None,
+                            help='Benchmark a running server at this base URL instead of in-process')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path', default=None,
+                            help='Also write the results to this file as JSON')
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        users = targets(options['users'])
+        if not users:
+            raise CommandError('No benchmark data; run seed_benchmark_data first')
+
+        if options['url']:
+            samples, elapsed = run(endpoints, users, options['concurrency'], options['requests'],
+                                   base_url=options['url'], random_seed=options['seed'])
+        else:
+            overrides = {
+                'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+                'LLM_PROVIDER': {
+                    'BACKEND': 'apps.email_management.llm.FakeProvider',
+                    'OPTIONS': {'latency': options['latency']},
+                },
+            }
+            with override_settings(**overrides):
+                samples, elapsed = run(endpoints, users, options['concurrency'], options['requests'],
+                                       random_seed=options['seed'])
+
+        summary = summarize(samples, elapsed)
+        self.stdout.write(
+            f"{len(samples)} requests in {elapsed:.1f}s ({len(samples) / elapsed:.1f}/s) "
+            f"with {options['concurrency']} clients"
+        )
+        self.stdout.write(
+            f"{'endpoint':<16}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'max ms':>9}{'queries':>9}{'max q':>7}"
+        )
+        for endpoint, stats in summary.items():
+            queries = '-' if stats['queries_mean'] is None else f"{stats['queries_mean']:.1f}"
+            max_queries = '-' if stats['queries_max'] is None else stats['queries_max']
+            self.stdout.write(
+                f"{endpoint:<16}{stats['requests']:>9}{stats['errors']:>8}{stats['rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}"
+                f"{queries:>9}{max_queries:>7}"
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({
+                    'elapsed': elapsed,
+                    'concurrency': options['concurrency'],
+                    'endpoints': summary,
+                }, f, indent=2)
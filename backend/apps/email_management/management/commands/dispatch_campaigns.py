@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.email_management.dispatch import dispatch
+
+
+class Command(BaseCommand):
+    help = 'Claim due scheduled campaigns and generate/deliver their drafts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single dispatch pass and exit')
+        parser.add_argument('--interval', type=int, default=settings.EMAIL_DISPATCH_INTERVAL,
+                            help='Seconds to sleep between passes when idle')
+        parser.add_argument('--workers', type=int, default=settings.EMAIL_DISPATCH_WORKERS,
+                            help='Number of draft batches processed in parallel')
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_DISPATCH_BATCH_SIZE,
+                            help='Number of drafts claimed per batch')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = dispatch(workers=options['workers'], batch_size=options['batch_size'])
+            if processed:
+                self.stdout.write(f"Processed {processed} drafts")
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
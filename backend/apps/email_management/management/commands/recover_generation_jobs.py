@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.email_management.generation import recover_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Fail generation jobs left behind by a worker that exited and refund their quota'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=int, default=settings.EMAIL_GENERATION_JOB_TIMEOUT,
+                            help='Seconds without progress after which a job is considered stale')
+
+    def handle(self, *args, **options):
+        recovered = recover_stale_jobs(timeout=options['timeout'])
+        self.stdout.write(f"Failed {recovered} stale generation jobs")
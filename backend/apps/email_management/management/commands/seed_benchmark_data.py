@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.email_management.benchmark import benchmark_users, reset, seed
+
+
+class Command(BaseCommand):
+    help = 'Create synthetic users, templates, campaigns and drafts for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--templates', type=int, default=5,
+                            help='Templates per user')
+        parser.add_argument('--campaigns', type=int, default=20,
+                            help='Campaigns per user')
+        parser.add_argument('--drafts', type=int, default=100000,
+                            help='Drafts in total, spread over all campaigns')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed, for reproducible data')
+        parser.add_argument('--skip-rollups', action='store_true',
+                            help='Do not rebuild the draft status rollups afterwards')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete existing benchmark data first')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['campaigns'] < 1:
+            raise CommandError('At least one user and one campaign per user are needed')
+        if options['reset']:
+            self.stdout.write(f"Deleted {reset()} benchmark objects")
+        elif benchmark_users().exists():
+            raise CommandError('Benchmark data already exists; use --reset to recreate it')
+
+        def progress(written):
+            self.stdout.write(f"Wrote {written} drafts")
+
+        written = seed(
+            users=options['users'],
+            templates=options['templates'],
+            campaigns=options['campaigns'],
+            drafts=options['drafts'],
+            batch_size=options['batch_size'],
+            random_seed=options['seed'],
+            rollups=not options['skip_rollups'],
+            progress=progress
+        )
+        self.stdout.write(
+            f"Seeded {options['users']} users, {options['users'] * options['campaigns']} campaigns "
+            f"and {written} drafts"
+        )
@@ -0,0 +1,18 @@
+"""
+Generation metrics added to ``/metrics`` (see ``core.metrics``).
+"""
+from .cache import get_generation_cache
+from .llm import get_llm_client
+
+
+def collect():
+    stats = get_generation_cache().stats()
+    limiter = get_llm_client().limiter
+    return [
+        ('generation_cache_requests_total', 'counter', 'Generation cache lookups',
+         [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])]),
+        ('llm_concurrency_limit', 'gauge', 'Adaptive limit on in-flight LLM requests',
+         [({}, limiter.limit)]),
+        ('llm_requests_in_flight', 'gauge', 'LLM requests in flight',
+         [({}, limiter.in_flight)]),
+    ]
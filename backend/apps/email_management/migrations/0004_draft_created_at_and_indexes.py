@@ -0,0 +1,42 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+from core.db import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    atomic = False
+
+    dependencies = [
+        ('email_management', '0003_generationcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaildraft',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        AddIndexConcurrently(
+            model_name='emailcampaign',
+            index=models.Index(fields=['created_by', 'created_at'], name='campaign_owner_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='emailcampaign',
+            index=models.Index(fields=['status', 'scheduled_time'], name='campaign_status_sched_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='emaildraft',
+            index=models.Index(fields=['campaign', 'status'], name='draft_campaign_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='emaildraft',
+            index=models.Index(fields=['campaign', 'created_at'], name='draft_campaign_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='emaildraft',
+            index=models.Index(fields=['recipient_email'], name='draft_recipient_email_idx'),
+        ),
+    ]
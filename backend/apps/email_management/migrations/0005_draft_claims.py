@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_management', '0004_draft_created_at_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaildraft',
+            name='claim_token',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emaildraft',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='emaildraft',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('generated', 'Generated'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,102 @@
+from django.db import migrations, models, transaction
+from django.db.models import Count
+
+BATCH_SIZE = 2000
+
+GMAIL_DOMAINS = ('gmail.com', 'googlemail.com')
+
+# Only drafts in these states are unique per recipient (see 0007).
+OPEN_STATUSES = ['pending', 'generated', 'sending']
+DUPLICATE_ERROR = 'Duplicate of another draft for the same recipient; not sent'
+
+
+def normalize_email(email):
+    # Frozen copy of core.utils.normalize_email as of this migration.
+    email = (email or '').strip().lower()
+    local, at, domain = email.rpartition('@')
+    if not at or not local:
+        return email
+
+    domain = domain.rstrip('.')
+    try:
+        domain = domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    if domain in GMAIL_DOMAINS:
+        local = local.partition('+')[0].replace('.', '')
+        domain = 'gmail.com'
+    return f'{local}@{domain}'
+
+
+def backfill(apps, schema_editor):
+    # One transaction per batch, so the table is never locked for the whole
+    # backfill and an interrupted run keeps the batches already written.
+    EmailDraft = apps.get_model('email_management', 'EmailDraft')
+
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                EmailDraft.objects.filter(pk__gt=last_pk).order_by('pk').only('id', 'recipient_email')[:BATCH_SIZE]
+            )
+            if not chunk:
+                return
+            for draft in chunk:
+                draft.recipient_email_normalized = normalize_email(draft.recipient_email)
+            EmailDraft.objects.bulk_update(chunk, ['recipient_email_normalized'])
+        last_pk = chunk[-1].pk
+
+
+def deduplicate(apps, schema_editor):
+    """
+    Resolve drafts of a campaign that share a normalized address. Pending
+    drafts are deleted when the recipient has any other draft (the oldest
+    pending one is kept otherwise). Generated, sent and failed drafts are
+    never deleted; when more than one of them is still open, all but one are
+    marked failed so the recipient is not emailed twice.
+    """
+    EmailDraft = apps.get_model('email_management', 'EmailDraft')
+
+    duplicates = EmailDraft.objects.values(
+        'campaign_id', 'recipient_email_normalized'
+    ).annotate(copies=Count('id')).filter(copies__gt=1).order_by()
+
+    for group in duplicates.iterator():
+        with transaction.atomic():
+            copies = list(EmailDraft.objects.filter(
+                campaign_id=group['campaign_id'],
+                recipient_email_normalized=group['recipient_email_normalized']
+            ).order_by('id').values_list('id', 'status'))
+
+            pending = [pk for pk, status in copies if status == 'pending']
+            others = [(pk, status) for pk, status in copies if status != 'pending']
+            redundant = pending if others else pending[1:]
+            EmailDraft.objects.filter(pk__in=redundant).delete()
+
+            # Keep the open draft furthest along; ties go to the oldest.
+            open_drafts = [
+                pk for _, pk in sorted((status != 'sending', pk) for pk, status in others if status in OPEN_STATUSES)
+            ]
+            EmailDraft.objects.filter(pk__in=open_drafts[1:]).update(
+                status='failed', error_message=DUPLICATE_ERROR, claimed_at=None, claim_token=None
+            )
+
+
+class Migration(migrations.Migration):
+    # The backfill commits batch by batch.
+    atomic = False
+
+    dependencies = [
+        ('email_management', '0005_draft_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaildraft',
+            name='recipient_email_normalized',
+            field=models.CharField(default='', editable=False, max_length=254),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop, atomic=False),
+        migrations.RunPython(deduplicate, migrations.RunPython.noop, atomic=False),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+from core.db import AddUniqueConstraintConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    atomic = False
+
+    dependencies = [
+        ('email_management', '0006_draft_recipient_email_normalized'),
+    ]
+
+    operations = [
+        AddUniqueConstraintConcurrently(
+            model_name='emaildraft',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'generated', 'sending'])),
+                                               fields=('campaign', 'recipient_email_normalized'),
+                                               name='draft_campaign_recipient_uniq'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_management', '0007_draft_campaign_recipient_uniq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaildraft',
+            name='completion_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emaildraft',
+            name='generation_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emaildraft',
+            name='prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
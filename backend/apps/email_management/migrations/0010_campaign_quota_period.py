@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_management', '0009_generationjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailcampaign',
+            name='quota_period',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -2,8 +2,15 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from core.utils import normalize_email
+
 User = get_user_model()
 
+# Drafts still on their way out; unique per campaign and recipient.
+OPEN_DRAFT_STATUSES = ['pending', 'generated', 'sending']
+# Generation jobs that may still write to their drafts.
+ACTIVE_JOB_STATUSES = ['queued', 'running']
+
 class EmailTemplate(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -33,9 +40,18 @@ class EmailCampaign(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     scheduled_time = models.DateTimeField(null=True, blank=True)
+    # Quota month the campaign's sends and generations were charged to, so
+    # the dispatcher refunds failures to the same month.
+    quota_period = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'created_at'], name='campaign_owner_created_idx'),
+            models.Index(fields=['status', 'scheduled_time'], name='campaign_status_sched_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -43,12 +59,16 @@ class EmailDraft(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('generated', 'Generated'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('failed', 'Failed')
     ]
 
     campaign = models.ForeignKey(EmailCampaign, on_delete=models.CASCADE, related_name='drafts')
+    generation_job = models.ForeignKey('GenerationJob', on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='drafts')
     recipient_email = models.EmailField()
+    recipient_email_normalized = models.CharField(max_length=254, editable=False)
     recipient_name = models.CharField(max_length=100)
     subject = models.CharField(max_length=200)
     body = models.TextField()
@@ -57,16 +77,91 @@ class EmailDraft(models.Model):
     generated_at = models.DateTimeField(null=True, blank=True)
     sent_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claim_token = models.UUIDField(null=True, blank=True, db_index=True)
+    # Tokens billed for the generation (0 when served from the generation
+    # cache) and how long it took; empty for drafts not written by the LLM.
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True)
+    generation_ms = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['campaign', 'status'], name='draft_campaign_status_idx'),
+            models.Index(fields=['campaign', 'created_at'], name='draft_campaign_created_idx'),
+            models.Index(fields=['recipient_email'], name='draft_recipient_email_idx'),
+        ]
+        constraints = [
+            # Only drafts still on their way out are unique: sent and failed
+            # drafts from before addresses were normalized are kept as history.
+            models.UniqueConstraint(fields=['campaign', 'recipient_email_normalized'],
+                                    condition=models.Q(status__in=OPEN_DRAFT_STATUSES),
+                                    name='draft_campaign_recipient_uniq'),
+        ]
 
     def __str__(self):
         return f"Email to {self.recipient_email} - {self.status}"
 
+    def normalize(self):
+        """
+        Fill ``recipient_email_normalized``. Called from ``save()``; call it
+        directly before ``bulk_create``.
+        """
+        self.recipient_email_normalized = normalize_email(self.recipient_email)
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'recipient_email' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'recipient_email_normalized'}
+        super().save(*args, **kwargs)
+
     def mark_as_generated(self):
+        from .signals import draft_state, notify_status_changes
+
+        previous = draft_state(self)
         self.status = 'generated'
         self.generated_at = timezone.now()
-        self.save()
+        self.save(update_fields=['status', 'generated_at'])
+        notify_status_changes([self], [previous])
 
-    def mark_as_sent(self):
-        self.status = 'sent'
-        self.sent_at = timezone.now()
-        self.save()
+class GenerationJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed')
+    ]
+
+    campaign = models.ForeignKey(EmailCampaign, on_delete=models.CASCADE, related_name='generation_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    succeeded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed after every batch; see generation.recover_stale_jobs.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Generation job {self.pk} for {self.campaign} - {self.status}"
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 0.0
+        return round(self.processed / self.total, 4)
+
+class GenerationCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    value = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
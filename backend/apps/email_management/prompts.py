@@ -0,0 +1,192 @@
+"""
+Token-budgeted generation prompts.
+
+``build_prompt`` keeps the user prompt under ``LLM_PROMPT_TOKEN_BUDGET``
+tokens. The template, the custom instructions and the recipient data are
+each given a fair share of the budget (parts smaller than their share keep
+all of it and the rest is split among the larger ones), and oversized parts
+are cut at their share. Recipient data is sent as compact JSON without
+empty values; long strings and lists inside it are shortened, and if it is
+still too large its biggest fields are dropped, keeping the recipient's
+email and name.
+
+Tokens are counted with ``tiktoken`` when it is installed and estimated
+from the text otherwise.
+"""
+import json
+import math
+import re
+import threading
+
+from django.conf import settings
+
+PROMPT_HEADER = 'Generate a professional email based on the following template and customization:'
+TRUNCATION_MARK = ' [...]'
+WORD_RE = re.compile(r'\w+|[^\w\s]')
+FIELD_CHARS = 500
+LIST_ITEMS = 10
+KEEP_FIELDS = ('email', 'name')
+
+_encoding_lock = threading.Lock()
+_encoding = None
+_encoding_loaded = False
+
+
+def get_encoding():
+    """
+    The ``tiktoken`` encoding for ``LLM_MODEL``, or ``None`` when tiktoken
+    is not installed.
+    """
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+            except ImportError:
+                _encoding = None
+            else:
+                try:
+                    _encoding = tiktoken.encoding_for_model(settings.LLM_MODEL)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding('cl100k_base')
+            _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Roughly four characters per token for English text, and never fewer
+    # tokens than words and punctuation marks.
+    return max(math.ceil(len(text) / 4), len(WORD_RE.findall(text)))
+
+
+def count_message_tokens(messages):
+    # Each chat message carries a few tokens of framing.
+    return sum(count_tokens(message['content']) + 4 for message in messages) + 3
+
+
+def truncate_tokens(text, max_tokens):
+    """
+    ``text`` cut to at most ``max_tokens`` tokens, marked as truncated.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    available = max_tokens - count_tokens(TRUNCATION_MARK)
+    if available <= 0:
+        return ''
+
+    encoding = get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:available]) + TRUNCATION_MARK
+
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= available:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + TRUNCATION_MARK
+
+
+def allocate(sizes, budget):
+    """
+    Split ``budget`` over ``{name: size}``: parts that fit in an equal share
+    get their full size and the remainder is shared by the larger ones.
+    """
+    allocation = {}
+    remaining = dict(sizes)
+    left = budget
+    while remaining:
+        share = left // len(remaining)
+        fitting = {name: size for name, size in remaining.items() if size <= share}
+        if not fitting:
+            allocation.update(dict.fromkeys(remaining, share))
+            break
+        for name, size in fitting.items():
+            allocation[name] = size
+            left -= size
+            del remaining[name]
+    return allocation
+
+
+def _is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _shorten(value):
+    if isinstance(value, str):
+        return value if len(value) <= FIELD_CHARS else value[:FIELD_CHARS] + TRUNCATION_MARK
+    if isinstance(value, dict):
+        return {key: _shorten(item) for key, item in value.items() if not _is_empty(item)}
+    if isinstance(value, (list, tuple)):
+        items = [_shorten(item) for item in value[:LIST_ITEMS]]
+        if len(value) > LIST_ITEMS:
+            items.append(f'... {len(value) - LIST_ITEMS} more')
+        return items
+    return value
+
+
+def dump_compact(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def compact_recipient_data(recipient_data, max_tokens=None):
+    """
+    Recipient data as compact JSON, within ``max_tokens`` when given.
+    """
+    if not isinstance(recipient_data, dict):
+        text = str(recipient_data or '')
+        return text if max_tokens is None else truncate_tokens(text, max_tokens)
+
+    data = {key: value for key, value in recipient_data.items() if not _is_empty(value)}
+    text = dump_compact(data)
+    if max_tokens is None or count_tokens(text) <= max_tokens:
+        return text
+
+    data = _shorten(data)
+    text = dump_compact(data)
+    droppable = sorted(
+        (key for key in data if key not in KEEP_FIELDS),
+        key=lambda key: len(dump_compact(data[key])),
+        reverse=True
+    )
+    while count_tokens(text) > max_tokens and droppable:
+        del data[droppable.pop(0)]
+        text = dump_compact(data)
+    if count_tokens(text) > max_tokens:
+        return truncate_tokens(text, max_tokens)
+    return text
+
+
+def build_prompt(template_body, custom_prompt, recipient_data, budget=None):
+    """
+    The user prompt for a generation, at most ``budget`` tokens
+    (``LLM_PROMPT_TOKEN_BUDGET`` by default).
+    """
+    budget = budget or settings.LLM_PROMPT_TOKEN_BUDGET
+    labels = {
+        'template': 'Template: ',
+        'instructions': 'Custom Instructions: ',
+        'recipient': 'Recipient Details: ',
+    }
+    parts = {
+        'template': template_body or 'No template provided',
+        'instructions': custom_prompt or '',
+        'recipient': compact_recipient_data(recipient_data),
+    }
+    overhead = count_tokens(PROMPT_HEADER) + sum(count_tokens(label) + 1 for label in labels.values())
+    sizes = {name: count_tokens(text) for name, text in parts.items()}
+    if sum(sizes.values()) + overhead > budget:
+        allocation = allocate(sizes, max(budget - overhead, 0))
+        parts['template'] = truncate_tokens(parts['template'], allocation['template'])
+        parts['instructions'] = truncate_tokens(parts['instructions'], allocation['instructions'])
+        parts['recipient'] = compact_recipient_data(recipient_data, allocation['recipient'])
+
+    return '\n'.join([PROMPT_HEADER] + [labels[name] + parts[name] for name in labels])
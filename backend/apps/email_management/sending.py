@@ -0,0 +1,280 @@
+"""
+Draft delivery pipeline.
+
+Messages go out through the configured Django email backend (SMTP in
+production, ``locmem``/``console`` locally) using connections kept open in a
+process-wide pool, so a worker pays for the SMTP handshake once per
+``EMAIL_CONNECTION_MAX_MESSAGES`` messages rather than once per batch.
+Recipients are interleaved by domain and throttled per domain with a token
+bucket, and results are written back with one UPDATE per outcome instead
+of one ``save()`` per draft. With tracking enabled each message also gets
+an HTML alternative carrying the open pixel and tracked links.
+"""
+import logging
+import queue
+import smtplib
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from apps.analytics.tracking import tracked_html, tracking_enabled
+
+from .models import EmailCampaign, EmailDraft
+from .signals import draft_state, notify_status_changes
+
+logger = logging.getLogger(__name__)
+
+_pool_lock = threading.Lock()
+_connection_pool = None
+_domain_throttle = None
+
+
+class ConnectionPool:
+    """
+    Pool of open email backend connections shared by all threads of a
+    process. A connection is retired after ``max_messages`` messages.
+    """
+
+    def __init__(self, size, max_messages, backend=None):
+        self.size = size
+        self.max_messages = max_messages
+        self.backend = backend
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            email_connection = get_connection(self.backend)
+            email_connection.open()
+            email_connection.messages_sent = 0
+            return email_connection
+
+    def checkin(self, email_connection):
+        if email_connection.messages_sent >= self.max_messages:
+            email_connection.close()
+            return
+        try:
+            self._idle.put_nowait(email_connection)
+        except queue.Full:
+            email_connection.close()
+
+    def discard(self, email_connection):
+        try:
+            email_connection.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class DomainThrottle:
+    """
+    Token bucket per recipient domain: ``rate`` messages per second with
+    bursts of up to ``burst`` messages.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, domain):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, updated = self._buckets.get(domain, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                if tokens >= 1:
+                    self._buckets[domain] = (tokens - 1, now)
+                    return
+                self._buckets[domain] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+def get_connection_pool():
+    global _connection_pool
+    with _pool_lock:
+        if _connection_pool is None:
+            _connection_pool = ConnectionPool(
+                size=settings.EMAIL_CONNECTION_POOL_SIZE,
+                max_messages=settings.EMAIL_CONNECTION_MAX_MESSAGES
+            )
+    return _connection_pool
+
+
+def get_domain_throttle():
+    global _domain_throttle
+    with _pool_lock:
+        if _domain_throttle is None:
+            _domain_throttle = DomainThrottle(
+                rate=settings.EMAIL_DOMAIN_RATE_LIMIT,
+                burst=settings.EMAIL_DOMAIN_BURST
+            )
+    return _domain_throttle
+
+
+def recipient_domain(email):
+    return email.rpartition('@')[2].lower()
+
+
+def interleave_by_domain(drafts):
+    """
+    Order drafts round-robin across recipient domains so that waiting on
+    one throttled domain does not hold up the others.
+    """
+    by_domain = OrderedDict()
+    for draft in drafts:
+        by_domain.setdefault(recipient_domain(draft.recipient_email), deque()).append(draft)
+    ordered = []
+    while by_domain:
+        for domain in list(by_domain):
+            ordered.append(by_domain[domain].popleft())
+            if not by_domain[domain]:
+                del by_domain[domain]
+    return ordered
+
+
+def build_message(draft, owner_id=None):
+    """
+    Plain-text message for ``draft``; with ``owner_id`` (the campaign
+    owner) the tracked HTML version is attached as an alternative.
+    """
+    if owner_id is None:
+        return EmailMessage(
+            subject=draft.subject,
+            body=draft.body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[draft.recipient_email]
+        )
+    message = EmailMultiAlternatives(
+        subject=draft.subject,
+        body=draft.body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[draft.recipient_email]
+    )
+    message.attach_alternative(tracked_html(draft, owner_id), 'text/html')
+    return message
+
+
+def campaign_owners(drafts):
+    """
+    Map the campaigns of ``drafts`` to their owners when tracking is
+    enabled, with one query per batch.
+    """
+    if not tracking_enabled():
+        return {}
+    return dict(
+        EmailCampaign.objects.filter(
+            pk__in={draft.campaign_id for draft in drafts}
+        ).values_list('pk', 'created_by_id')
+    )
+
+
+def failure_reason(error):
+    """
+    The error message stored on drafts that failed with ``error``: the
+    exception class and SMTP code, so a batch's failures share few values.
+    """
+    code = getattr(error, 'smtp_code', None)
+    name = type(error).__name__
+    return f'{name} ({code})' if code else name
+
+
+def send_drafts(drafts):
+    """
+    Deliver ``drafts`` over a pooled connection and record the outcome with
+    bulk UPDATEs. Drafts are updated in place as well. When no connection
+    can be opened, every draft not yet delivered fails. Returns the number
+    of drafts sent.
+    """
+    if not drafts:
+        return 0
+
+    pool = get_connection_pool()
+    throttle = get_domain_throttle()
+    ordered = interleave_by_domain(drafts)
+    sent_ids = []
+    failures = defaultdict(list)
+    attempted = 0
+    email_connection = None
+
+    try:
+        owners = campaign_owners(drafts)
+        email_connection = pool.checkout()
+        for draft in ordered:
+            throttle.acquire(recipient_domain(draft.recipient_email))
+            try:
+                message = build_message(draft, owners.get(draft.campaign_id))
+                try:
+                    email_connection.send_messages([message])
+                except smtplib.SMTPServerDisconnected:
+                    # Idle pooled connections get dropped by the server;
+                    # reconnect once before giving up on the message. A
+                    # failed reconnect fails the rest of the batch.
+                    pool.discard(email_connection)
+                    email_connection = None
+                    email_connection = pool.checkout()
+                    email_connection.send_messages([message])
+            except Exception as e:
+                if email_connection is None:
+                    raise
+                logger.warning("Delivery failed for draft %s: %s", draft.pk, e)
+                failures[failure_reason(e)].append(draft.pk)
+            else:
+                email_connection.messages_sent += 1
+                sent_ids.append(draft.pk)
+            attempted += 1
+    except Exception as e:
+        logger.error("Email connection failed, %s drafts not delivered: %s", len(ordered) - attempted, e)
+        failures[failure_reason(e)].extend(draft.pk for draft in ordered[attempted:])
+        if email_connection is not None:
+            pool.discard(email_connection)
+    except BaseException:
+        if email_connection is not None:
+            pool.discard(email_connection)
+        raise
+    else:
+        pool.checkin(email_connection)
+    finally:
+        record_results(drafts, sent_ids, failures)
+
+    return len(sent_ids)
+
+
+def record_results(drafts, sent_ids, failures):
+    now = timezone.now()
+    if sent_ids:
+        EmailDraft.objects.filter(pk__in=sent_ids).update(
+            status='sent', sent_at=now, error_message='', claimed_at=None, claim_token=None
+        )
+    for error_message, draft_ids in failures.items():
+        EmailDraft.objects.filter(pk__in=draft_ids).update(
+            status='failed', error_message=error_message, claimed_at=None, claim_token=None
+        )
+
+    sent = set(sent_ids)
+    failed = {pk: error_message for error_message, pks in failures.items() for pk in pks}
+    changed = [draft for draft in drafts if draft.pk in sent or draft.pk in failed]
+    previous = [draft_state(draft) for draft in changed]
+    for draft in changed:
+        if draft.pk in sent:
+            draft.status = 'sent'
+            draft.sent_at = now
+        elif draft.pk in failed:
+            draft.status = 'failed'
+            draft.error_message = failed[draft.pk]
+    notify_status_changes(changed, previous)
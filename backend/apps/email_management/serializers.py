@@ -1,10 +1,16 @@
 from rest_framework import serializers
-from .models import EmailTemplate, EmailCampaign, EmailDraft
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from core.logging import Payload
+from core.metrics import TimedSerializerMixin
+from core.utils import normalize_email
+from .models import OPEN_DRAFT_STATUSES, EmailTemplate, EmailCampaign, EmailDraft, GenerationJob
 import logging
 
 logger = logging.getLogger(__name__)
 
-class EmailTemplateSerializer(serializers.ModelSerializer):
+class EmailTemplateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     created_by_name = serializers.SerializerMethodField()
 
     class Meta:
@@ -17,7 +23,7 @@ class EmailTemplateSerializer(serializers.ModelSerializer):
         return obj.created_by.get_full_name() if obj.created_by else None
 
     def validate(self, data):
-        logger.info(f"Validating template data: {data}")
+        logger.debug("Validating template data: %s", Payload(data))
         
         # Validate required fields
         required_fields = {
@@ -32,32 +38,51 @@ class EmailTemplateSerializer(serializers.ModelSerializer):
                 errors[field] = message
         
         if errors:
-            logger.error(f"Validation errors: {errors}")
+            logger.info("Template validation failed for fields: %s", sorted(errors))
             raise serializers.ValidationError(errors)
         
-        logger.info("Template data validation successful")
         return data
 
     def create(self, validated_data):
-        logger.info(f"Creating template with validated data: {validated_data}")
+        logger.debug("Creating template with validated data: %s", Payload(validated_data))
         try:
             template = super().create(validated_data)
-            logger.info(f"Template created successfully with ID: {template.id}")
+            logger.info("Template created successfully with ID: %s", template.id)
             return template
         except Exception as e:
-            logger.error(f"Error creating template: {str(e)}")
+            logger.error("Error creating template: %s", e)
             raise
 
-class EmailDraftSerializer(serializers.ModelSerializer):
+class EmailDraftSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = EmailDraft
         fields = ['id', 'campaign', 'recipient_email', 'recipient_name', 'subject',
                  'body', 'personalization_data', 'status', 'generated_at', 'sent_at',
-                 'error_message']
-        read_only_fields = ['generated_at', 'sent_at', 'status']
+                 'error_message', 'prompt_tokens', 'completion_tokens', 'generation_ms', 'created_at']
+        read_only_fields = ['generated_at', 'sent_at', 'status', 'prompt_tokens', 'completion_tokens',
+                            'generation_ms', 'created_at']
 
-class EmailCampaignSerializer(serializers.ModelSerializer):
-    drafts = EmailDraftSerializer(many=True, read_only=True)
+    def validate(self, data):
+        campaign = data.get('campaign', getattr(self.instance, 'campaign', None))
+        email = data.get('recipient_email', getattr(self.instance, 'recipient_email', None))
+        # Mirrors the draft_campaign_recipient_uniq constraint, which only
+        # covers drafts still on their way out (new drafts start pending).
+        is_open = self.instance is None or self.instance.status in OPEN_DRAFT_STATUSES
+        if campaign is not None and email and is_open:
+            duplicates = EmailDraft.objects.filter(
+                campaign=campaign,
+                recipient_email_normalized=normalize_email(email),
+                status__in=OPEN_DRAFT_STATUSES
+            )
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError(
+                    {'recipient_email': 'This campaign already has a draft for this recipient.'}
+                )
+        return data
+
+class EmailCampaignSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     template_name = serializers.SerializerMethodField()
     created_by_name = serializers.SerializerMethodField()
 
@@ -65,11 +90,82 @@ class EmailCampaignSerializer(serializers.ModelSerializer):
         model = EmailCampaign
         fields = ['id', 'name', 'description', 'template', 'template_name', 'custom_prompt',
                  'created_by', 'created_by_name', 'status', 'scheduled_time', 'created_at',
-                 'updated_at', 'drafts']
-        read_only_fields = ['created_at', 'updated_at', 'created_by', 'created_by_name']
+                 'updated_at']
+        # Campaigns are only scheduled through the ``send`` action, which
+        # charges the drafts against the plan's quotas.
+        read_only_fields = ['created_at', 'updated_at', 'created_by', 'created_by_name', 'status']
 
     def get_template_name(self, obj):
         return obj.template.name if obj.template else None
 
     def get_created_by_name(self, obj):
         return obj.created_by.get_full_name() if obj.created_by else None
+
+class EmailCampaignSummarySerializer(EmailCampaignSerializer):
+    """
+    List representation of a campaign. Draft counts and generation usage
+    come from annotations added by ``EmailCampaignViewSet.get_queryset``
+    rather than from the drafts.
+    """
+    draft_counts = serializers.SerializerMethodField()
+    generation_usage = serializers.SerializerMethodField()
+
+    class Meta(EmailCampaignSerializer.Meta):
+        fields = ['id', 'name', 'template', 'template_name', 'created_by', 'created_by_name',
+                 'status', 'scheduled_time', 'created_at', 'updated_at', 'draft_counts',
+                 'generation_usage']
+        read_only_fields = fields
+
+    def get_draft_counts(self, obj):
+        counts = {'total': getattr(obj, 'draft_total', 0)}
+        for draft_status, _ in EmailDraft.STATUS_CHOICES:
+            counts[draft_status] = getattr(obj, f'draft_{draft_status}', 0)
+        return counts
+
+    def get_generation_usage(self, obj):
+        average_ms = getattr(obj, 'draft_generation_ms_avg', None)
+        return {
+            'prompt_tokens': getattr(obj, 'draft_prompt_tokens', None) or 0,
+            'completion_tokens': getattr(obj, 'draft_completion_tokens', None) or 0,
+            'average_generation_ms': round(average_ms) if average_ms is not None else None,
+        }
+
+class GenerationJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = GenerationJob
+        fields = ['id', 'campaign', 'status', 'total', 'processed', 'succeeded', 'failed',
+                 'progress', 'error_message', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+class CampaignSendSerializer(serializers.Serializer):
+    scheduled_time = serializers.DateTimeField(required=False, allow_null=True)
+
+class BulkGenerateSerializer(serializers.Serializer):
+    recipients = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.EMAIL_GENERATION_MAX_RECIPIENTS
+    )
+
+    def validate_recipients(self, recipients):
+        errors = {}
+        for index, recipient in enumerate(recipients):
+            try:
+                validate_email(recipient.get('email') or '')
+            except DjangoValidationError:
+                errors[index] = 'Enter a valid email address.'
+                continue
+            if len(recipient.get('name') or '') > 100:
+                errors[index] = 'Name must be at most 100 characters.'
+        if errors:
+            raise serializers.ValidationError(errors)
+        return recipients
+
+class DraftImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+    batch_size = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=settings.EMAIL_IMPORT_MAX_BATCH_SIZE
+    )
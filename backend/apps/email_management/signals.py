@@ -0,0 +1,30 @@
+from collections import namedtuple
+
+from django.dispatch import Signal
+
+# Sent after drafts are created or change status, once per batch of drafts,
+# with ``transitions`` = [(before, after)] of ``DraftState`` (``before`` is
+# None for new drafts).
+draft_status_changed = Signal()
+
+DraftState = namedtuple('DraftState', ['campaign_id', 'status', 'created_at', 'generated_at', 'sent_at'])
+
+
+def draft_state(draft):
+    return DraftState(draft.campaign_id, draft.status, draft.created_at, draft.generated_at, draft.sent_at)
+
+
+def notify_status_changes(drafts, previous=None):
+    """
+    Send ``draft_status_changed`` for ``drafts``. ``previous`` holds their
+    ``draft_state`` from before the change, in the same order; leave it out
+    for drafts that were just created.
+    """
+    from .models import EmailDraft
+
+    drafts = list(drafts)
+    if previous is None:
+        previous = [None] * len(drafts)
+    transitions = [(before, draft_state(draft)) for before, draft in zip(previous, drafts)]
+    if transitions:
+        draft_status_changed.send(sender=EmailDraft, transitions=transitions)
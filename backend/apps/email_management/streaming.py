@@ -0,0 +1,132 @@
+"""
+Server-Sent Events variant of ``EmailCampaignViewSet.generate_email``.
+
+This is a plain async Django view rather than a DRF action so that, when
+served through ``config.asgi``, a long generation holds an event-loop task
+instead of a worker thread. Tokens are forwarded as ``token`` events as the
+provider streams them; the draft is saved when the stream completes and
+announced with a final ``done`` event.
+
+Only ASGI streams: under WSGI, Django 4.2 consumes the whole async iterator
+before sending anything. ``PerformanceMiddleware`` and
+``PrimaryPinMiddleware`` are sync-only, so each request also passes through
+a sync/async adapter on its way to this view.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from apps.subscriptions.quotas import QuotaExceeded, consume, current_period, release
+from core.routers import pin_primary
+
+from .generation import (
+    RecipientAlreadySent, prepare_content, recipient_already_sent, save_generated_draft, stream_body
+)
+from .models import EmailCampaign
+
+logger = logging.getLogger(__name__)
+
+
+def _authenticate(request):
+    drf_request = Request(request)
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(drf_request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def generate_email_stream(request, pk):
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except exceptions.APIException as e:
+        data = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+        return JsonResponse(data, status=e.status_code)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    campaign = await EmailCampaign.objects.select_related('template').filter(
+        pk=pk,
+        created_by=user
+    ).afirst()
+    if campaign is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    try:
+        recipient_data = json.loads(request.body or b'{}').get('recipient_data', {})
+    except (ValueError, AttributeError):
+        return JsonResponse({'detail': 'Invalid JSON body.'}, status=400)
+    if not isinstance(recipient_data, dict):
+        return JsonResponse({'detail': 'recipient_data must be an object.'}, status=400)
+
+    if await sync_to_async(recipient_already_sent)(campaign, recipient_data.get('email')):
+        return JsonResponse({'detail': 'This recipient has already been emailed.'}, status=409)
+
+    subject, body, prompt = prepare_content(
+        campaign,
+        recipient_data,
+        email=recipient_data.get('email'),
+        name=recipient_data.get('name')
+    )
+    period = current_period()
+    if prompt is not None:
+        try:
+            await sync_to_async(consume)(user.pk, 'generation', period=period)
+        except QuotaExceeded as e:
+            response = JsonResponse({'detail': e.detail}, status=e.status_code)
+            response['Retry-After'] = str(e.wait)
+            return response
+
+    async def events():
+        parts = [body] if body is not None else []
+        usage = {}
+        completed = False
+        try:
+            yield _event('subject', {'subject': subject})
+            if prompt is None:
+                yield _event('token', {'token': body})
+            else:
+                async for token in stream_body(prompt, usage):
+                    parts.append(token)
+                    yield _event('token', {'token': token})
+
+            draft = await sync_to_async(save_generated_draft)(
+                campaign, recipient_data, subject, ''.join(parts), usage=usage or None
+            )
+            completed = True
+            await sync_to_async(pin_primary)(user.pk)
+            yield _event('done', {'draft_id': draft.id})
+        except RecipientAlreadySent as e:
+            yield _event('error', {'error': str(e)})
+        except Exception as e:
+            logger.error("Unexpected error in generate_email_stream: %s", e, exc_info=True)
+            yield _event('error', {'error': str(e)})
+        finally:
+            # Also reached when the client goes away mid-stream (the
+            # generator is closed or its task cancelled), which ``except
+            # Exception`` does not catch.
+            if prompt is not None and not completed:
+                await asyncio.shield(sync_to_async(release)(user.pk, 'generation', period=period))
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Token-authenticated API endpoint; csrf_exempt() cannot wrap async views on
+# this Django version, so the flag the CSRF middleware checks is set directly.
+generate_email_stream.csrf_exempt = True
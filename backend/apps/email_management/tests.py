@@ -1,3 +1,600 @@
-from django.test import TestCase
+import asyncio
+import json
+import smtplib
+from base64 import b64decode
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.authentication.models import User
+from apps.subscriptions.quotas import consume, current_period, invalidate_quotas, usage
+
+from . import dispatch, generation
+from .importers import insert_drafts
+from .rendering import build_context, render_body, render_subject
+from .models import EmailCampaign, EmailDraft, EmailTemplate, GenerationJob
+from .sending import ConnectionPool, send_drafts
+from .streaming import generate_email_stream
+
+
+class QueryCountTestCase(APITestCase):
+    """
+    Fixed query counts for the email management endpoints. Every list has
+    several rows with related objects, so an N+1 shows up as a changed
+    count.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner', email='owner@example.com', first_name='Olive')
+        cls.templates = [
+            EmailTemplate.objects.create(
+                name=f'Template {index}',
+                subject_template='Hello {{ name }}',
+                body_template='Hi {{ name }}',
+                created_by=cls.user
+            )
+            for index in range(3)
+        ]
+        cls.campaigns = [
+            EmailCampaign.objects.create(
+                name=f'Campaign {index}',
+                template=cls.templates[index],
+                created_by=cls.user
+            )
+            for index in range(3)
+        ]
+        drafts = [
+            EmailDraft(
+                campaign=campaign,
+                recipient_email=f'recipient{index}@example.com',
+                recipient_name=f'Recipient {index}',
+                subject='Hello',
+                body='Hi',
+                status='generated' if index % 2 else 'pending'
+            )
+            for campaign in cls.campaigns
+            for index in range(5)
+        ]
+        for draft in drafts:
+            draft.normalize()
+        EmailDraft.objects.bulk_create(drafts)
+        for campaign in cls.campaigns:
+            GenerationJob.objects.create(campaign=campaign, created_by=cls.user, total=5)
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.SUBSCRIPTION_QUOTA_CACHE].clear()
+        invalidate_quotas()
+        self.client.force_authenticate(self.user)
+        self.campaign = self.campaigns[0]
+
+
+class EmailTemplateViewSetQueryTests(QueryCountTestCase):
+    def test_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/email-management/templates/')
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/email-management/templates/{self.templates[0].pk}/')
+
+    def test_create(self):
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/email-management/templates/', {
+                'name': 'New', 'subject_template': 'Hi', 'body_template': 'Body'
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+
+class EmailCampaignViewSetQueryTests(QueryCountTestCase):
+    def test_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/email-management/campaigns/')
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/email-management/campaigns/{self.campaign.pk}/')
+
+    def test_drafts(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/email-management/campaigns/{self.campaign.pk}/drafts/')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_create(self):
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/email-management/campaigns/', {
+                'name': 'New', 'template': self.templates[0].pk
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    @override_settings(LLM_PROVIDER={'BACKEND': 'apps.email_management.llm.FakeProvider'})
+    def test_generate_email(self):
+        self.campaign.custom_prompt = 'Keep it short.'
+        self.campaign.save(update_fields=['custom_prompt'])
+        # Quota lookup and seed and the draft upsert; rollups are written
+        # from a buffer after the commit.
+        with self.assertNumQueries(9):
+            response = self.client.post(
+                f'/api/email-management/campaigns/{self.campaign.pk}/generate_email/',
+                {'recipient_data': {'email': 'new@example.com', 'name': 'New'}},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+
+
+class EmailDraftViewSetQueryTests(QueryCountTestCase):
+    def test_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/email-management/drafts/')
+        self.assertEqual(len(response.data['results']), 15)
+
+    def test_retrieve(self):
+        draft = self.campaign.drafts.first()
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/email-management/drafts/{draft.pk}/')
+
+
+class DraftPaginationTests(QueryCountTestCase):
+    def test_pages_across_tied_timestamps(self):
+        EmailDraft.objects.update(created_at=timezone.now())
+        expected = list(EmailDraft.objects.order_by('-id').values_list('pk', flat=True))
+
+        seen = []
+        url = '/api/email-management/drafts/?page_size=4'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            seen.extend(draft['id'] for draft in response.data['results'])
+            url = response.data['next']
+            if url:
+                # The cursor carries (created_at, id) rather than an offset
+                # into the rows sharing a timestamp.
+                cursor = parse_qs(urlparse(url).query)['cursor'][0]
+                self.assertNotIn('o=', b64decode(cursor).decode())
+        self.assertEqual(seen, expected)
+
+    def test_previous_page_across_tied_timestamps(self):
+        EmailDraft.objects.update(created_at=timezone.now())
+        first = self.client.get('/api/email-management/drafts/?page_size=4').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [draft['id'] for draft in back['results']],
+            [draft['id'] for draft in first['results']]
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/email-management/drafts/?cursor=cD1ub3QtYS1kYXRl')
+        self.assertEqual(response.status_code, 404)
+
+
+class DraftUniquenessTests(QueryCountTestCase):
+    def test_open_drafts_are_unique_per_recipient(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            EmailDraft.objects.create(campaign=self.campaign, recipient_email='Recipient0@Example.com')
+
+    def test_delivered_drafts_may_repeat(self):
+        EmailDraft.objects.filter(campaign=self.campaign, recipient_email='recipient0@example.com').update(status='sent')
+        EmailDraft.objects.create(campaign=self.campaign, recipient_email='Recipient0@Example.com', status='failed')
+        self.assertEqual(self.campaign.drafts.filter(recipient_email_normalized='recipient0@example.com').count(), 2)
+
+    def test_api_only_rejects_open_duplicates(self):
+        payload = {
+            'campaign': self.campaign.pk, 'recipient_email': 'Recipient0@Example.com',
+            'recipient_name': 'Recipient 0', 'subject': 'Hi', 'body': 'Hi'
+        }
+        response = self.client.post('/api/email-management/drafts/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        EmailDraft.objects.filter(campaign=self.campaign, recipient_email='recipient0@example.com').update(status='sent')
+        response = self.client.post('/api/email-management/drafts/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+
+
+class GenerationJobViewSetQueryTests(QueryCountTestCase):
+    def test_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/email-management/generation-jobs/')
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class CampaignSchedulingTests(QueryCountTestCase):
+    def test_status_is_read_only(self):
+        response = self.client.patch(f'/api/email-management/campaigns/{self.campaign.pk}/', {
+            'status': 'scheduled', 'scheduled_time': '2024-01-01T00:00:00Z'
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'draft')
+
+    def test_send_schedules_and_charges_quotas(self):
+        self.campaign.custom_prompt = 'Keep it short.'
+        self.campaign.save(update_fields=['custom_prompt'])
+        response = self.client.post(f'/api/email-management/campaigns/{self.campaign.pk}/send/', {
+            'scheduled_time': '2030-01-01T09:00:00Z'
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'scheduled')
+        self.assertEqual(self.campaign.scheduled_time.year, 2030)
+        used = usage(self.user.pk)
+        self.assertEqual(used['generation']['used'], 3)
+        self.assertEqual(used['send']['used'], 5)
+
+    def test_sending_a_scheduled_campaign_again_only_reschedules(self):
+        self.campaign.custom_prompt = 'Keep it short.'
+        self.campaign.save(update_fields=['custom_prompt'])
+        url = f'/api/email-management/campaigns/{self.campaign.pk}/send/'
+        self.client.post(url, {'scheduled_time': '2030-01-01T09:00:00Z'}, format='json')
+        response = self.client.post(url, {'scheduled_time': '2031-01-01T09:00:00Z'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.scheduled_time.year), ('scheduled', 2031))
+        used = usage(self.user.pk)
+        self.assertEqual((used['generation']['used'], used['send']['used']), (3, 5))
+
+    def test_drafts_of_active_jobs_are_not_charged_again(self):
+        self.campaign.custom_prompt = 'Keep it short.'
+        self.campaign.save(update_fields=['custom_prompt'])
+        job = self.campaign.generation_jobs.get()
+        owned = list(self.campaign.drafts.filter(status='pending').values_list('pk', flat=True)[:2])
+        EmailDraft.objects.filter(pk__in=owned).update(generation_job=job)
+        response = self.client.post(f'/api/email-management/campaigns/{self.campaign.pk}/send/', format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(usage(self.user.pk)['generation']['used'], 1)
+
+
+class SendDraftsTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.drafts = list(self.campaign.drafts.order_by('pk'))
+        EmailDraft.objects.filter(pk__in=[draft.pk for draft in self.drafts]).update(status='sending')
+
+    def test_sends_and_records(self):
+        self.assertEqual(send_drafts(self.drafts), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(set(self.campaign.drafts.values_list('status', flat=True)), {'sent'})
+
+    def test_connection_failure_fails_the_batch(self):
+        error = smtplib.SMTPConnectError(421, 'Service not available')
+        with mock.patch.object(ConnectionPool, 'checkout', side_effect=error):
+            self.assertEqual(send_drafts(self.drafts), 0)
+        self.assertEqual(
+            set(self.campaign.drafts.values_list('status', 'error_message', 'claim_token')),
+            {('failed', 'SMTPConnectError (421)', None)}
+        )
+
+    def test_message_failures_are_grouped_by_error_class(self):
+        errors = [smtplib.SMTPDataError(550, f'Mailbox {index} unavailable') for index in range(5)]
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=errors):
+            self.assertEqual(send_drafts(self.drafts), 0)
+        self.assertEqual(set(self.campaign.drafts.values_list('error_message', flat=True)), {'SMTPDataError (550)'})
+
+    def test_draft_send_releases_quota_when_delivery_fails(self):
+        draft = self.drafts[1]
+        EmailDraft.objects.filter(pk=draft.pk).update(status='generated')
+        with mock.patch.object(ConnectionPool, 'checkout', side_effect=OSError('Connection refused')):
+            response = self.client.post(f'/api/email-management/drafts/{draft.pk}/send/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertEqual(usage(self.user.pk)['send']['used'], 0)
+
+    def test_mark_sent_delivers_and_charges_like_send(self):
+        draft = self.drafts[1]
+        EmailDraft.objects.filter(pk=draft.pk).update(status='generated')
+        response = self.client.post(f'/api/email-management/drafts/{draft.pk}/mark_sent/')
+        self.assertEqual(response.data['status'], 'sent')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(usage(self.user.pk)['send']['used'], 1)
+        response = self.client.post(f'/api/email-management/drafts/{draft.pk}/mark_sent/')
+        self.assertEqual(response.status_code, 409)
+
+
+class DispatchTests(QueryCountTestCase):
+    def test_claims_do_not_overlap(self):
+        first = dispatch.claim_draft_batch(self.campaign.pk, batch_size=3)
+        second = dispatch.claim_draft_batch(self.campaign.pk, batch_size=3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({draft.pk for draft in first} & {draft.pk for draft in second})
+        self.assertEqual({draft.status for draft in first + second}, {'sending'})
+        self.assertEqual(dispatch.claim_draft_batch(self.campaign.pk), [])
+
+    def test_stale_claims_are_not_queued_again_once_generated(self):
+        drafts = dispatch.claim_draft_batch(self.campaign.pk)
+        generated = [draft.pk for draft in drafts[:2]]
+        EmailDraft.objects.filter(pk__in=generated).update(generated_at=timezone.now())
+        EmailDraft.objects.filter(campaign=self.campaign).update(claimed_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(dispatch.release_stale_claims(timeout=60), 5)
+        statuses = dict(self.campaign.drafts.values_list('pk', 'status'))
+        self.assertEqual({statuses[pk] for pk in generated}, {'failed'})
+        self.assertEqual({status for pk, status in statuses.items() if pk not in generated}, {'pending'})
+        self.assertFalse(self.campaign.drafts.filter(claim_token__isnull=False).exists())
+
+    def test_drafts_of_active_jobs_are_left_to_the_job(self):
+        job = self.campaign.generation_jobs.get()
+        owned = list(self.campaign.drafts.filter(status='pending').values_list('pk', flat=True)[:2])
+        EmailDraft.objects.filter(pk__in=owned).update(generation_job=job)
+
+        claimed = {draft.pk for draft in dispatch.claim_draft_batch(self.campaign.pk)}
+        self.assertEqual(len(claimed), 3)
+        self.assertFalse(claimed & set(owned))
+
+        GenerationJob.objects.filter(pk=job.pk).update(status='completed')
+        self.assertEqual({draft.pk for draft in dispatch.claim_draft_batch(self.campaign.pk)}, set(owned))
+
+    def test_failed_generations_and_deliveries_are_refunded(self):
+        EmailCampaign.objects.filter(pk=self.campaign.pk).update(custom_prompt='Keep it short.')
+        self.client.post(f'/api/email-management/campaigns/{self.campaign.pk}/send/', format='json')
+        self.assertEqual(dispatch.claim_due_campaigns(), 1)
+
+        def generate(campaign, drafts):
+            for index, draft in enumerate(drafts):
+                draft.status = 'failed' if index == 0 else 'generated'
+                draft.generated_at = timezone.now()
+
+        def deliver(messages):
+            if messages[0].to == ['recipient1@example.com']:
+                raise smtplib.SMTPDataError(550, 'Mailbox unavailable')
+            return 1
+
+        with mock.patch.object(dispatch, 'generate_draft_bodies', side_effect=generate), \
+                mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=deliver):
+            self.assertEqual(dispatch.process_campaign(self.campaign.pk), 5)
+        statuses = list(self.campaign.drafts.values_list('status', flat=True))
+        self.assertEqual((statuses.count('sent'), statuses.count('failed')), (3, 2))
+        used = usage(self.user.pk)
+        self.assertEqual((used['generation']['used'], used['send']['used']), (2, 3))
+
+    def test_fresh_claims_are_kept(self):
+        dispatch.claim_draft_batch(self.campaign.pk)
+        self.assertEqual(dispatch.release_stale_claims(timeout=60), 0)
+        self.assertEqual(set(self.campaign.drafts.values_list('status', flat=True)), {'sending'})
+
+    def test_failing_campaign_does_not_stop_the_others(self):
+        EmailCampaign.objects.filter(pk__in=[self.campaigns[0].pk, self.campaigns[1].pk]).update(
+            status='in_progress', scheduled_time=timezone.now()
+        )
+
+        def process(campaign_id, batch_size=None):
+            if campaign_id == self.campaigns[0].pk:
+                raise RuntimeError('boom')
+            return 5
+
+        with mock.patch.object(dispatch, 'process_campaign', side_effect=process):
+            self.assertEqual(dispatch.dispatch(workers=1), 5)
+
+
+class RenderingTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.template = self.templates[0]
+        self.template.body_template = 'Hi {{ name }} at {{company.name}}, {{ missing }}{{ email }}'
+        self.template.save()
+
+    def test_merge_fields(self):
+        context = build_context({'company': {'name': 'Acme'}}, email='jane@example.com', name='Jane')
+        self.assertEqual(render_subject(self.template, context), 'Hello Jane')
+        self.assertEqual(render_body(self.template, context), 'Hi Jane at Acme, jane@example.com')
+
+    def test_recipient_data_overrides_defaults(self):
+        context = build_context({'name': 'Janet', 'company': 'Acme'}, name='Jane')
+        self.assertEqual(render_body(self.template, context), 'Hi Janet at , ')
+
+    def test_changed_template_is_compiled_again(self):
+        context = build_context({}, name='Jane')
+        render_subject(self.template, context)
+        self.template.subject_template = 'Welcome {{ name }}'
+        self.template.save()
+        self.assertEqual(render_subject(self.template, context), 'Welcome Jane')
+
+    def test_long_subject_fits_the_draft(self):
+        context = build_context({}, name='J' * 300)
+        subject = render_subject(self.template, context)
+        self.assertEqual(len(subject), EmailDraft._meta.get_field('subject').max_length)
+        self.assertTrue(subject.startswith('Hello JJ'))
+
+
+class ImportDraftsTests(QueryCountTestCase):
+    def test_undecodable_line_is_reported_and_the_rest_imported(self):
+        upload = SimpleUploadedFile('recipients.csv', b'email,name\nnew1@example.com,A\n\xff\nnew2@example.com,B\n')
+        response = self.client.post(
+            f'/api/email-management/campaigns/{self.campaign.pk}/import_drafts/',
+            {'file': upload, 'batch_size': 1},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        self.assertEqual(response.data['errors'], [{'line': 3, 'errors': {'row': 'Line is not valid UTF-8'}}])
+
+    def test_drafts_inserted_concurrently_are_not_counted(self):
+        EmailDraft.objects.create(campaign=self.campaign, recipient_email='new0@example.com', recipient_name='New')
+        drafts = [
+            EmailDraft(campaign=self.campaign, recipient_email=f'new{index}@example.com', recipient_name='New')
+            for index in range(2)
+        ]
+        # The first check misses the draft, as if it had been inserted
+        # right after it.
+        checks = [EmailDraft.objects.none()]
+        real_filter = EmailDraft.objects.filter
+
+        def filter(*args, **kwargs):
+            return checks.pop() if checks else real_filter(*args, **kwargs)
+
+        with mock.patch.object(EmailDraft.objects, 'filter', side_effect=filter):
+            self.assertEqual(insert_drafts(drafts), (1, 1))
+        self.assertEqual(self.campaign.drafts.filter(recipient_email__startswith='new').count(), 2)
+
+
+class StaleGenerationJobTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        EmailCampaign.objects.filter(pk=self.campaign.pk).update(custom_prompt='Keep it short.')
+        self.job = self.campaign.generation_jobs.get()
+
+    def test_stale_running_job_is_failed_and_refunded(self):
+        consume(self.user.pk, 'generation', 5)
+        GenerationJob.objects.filter(pk=self.job.pk).update(
+            status='running', processed=2, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(generation.recover_stale_jobs(timeout=60), 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'failed')
+        self.assertEqual(self.job.error_message, generation.STALE_JOB_ERROR)
+        self.assertEqual(usage(self.user.pk)['generation']['used'], 2)
+
+    def test_fresh_jobs_are_kept(self):
+        GenerationJob.objects.filter(pk=self.job.pk).update(status='running', heartbeat_at=timezone.now())
+        self.assertEqual(generation.recover_stale_jobs(timeout=60), 0)
+        self.assertEqual(set(GenerationJob.objects.values_list('status', flat=True)), {'queued', 'running'})
+
+    def test_job_only_writes_back_drafts_still_pending(self):
+        EmailDraft.objects.filter(campaign=self.campaign, status='pending').update(generation_job=self.job)
+        taken = self.campaign.drafts.filter(status='pending').first()
+
+        def generate(campaign, drafts):
+            # Sent by other means while the job waited on the LLM.
+            EmailDraft.objects.filter(pk=taken.pk).update(status='sent')
+            for draft in drafts:
+                draft.status = 'generated'
+                draft.body = 'Generated'
+                draft.generated_at = timezone.now()
+
+        with mock.patch.object(generation, 'generate_draft_bodies', side_effect=generate):
+            generation.run_generation_job(self.job.pk)
+        taken.refresh_from_db()
+        self.assertEqual((taken.status, taken.body), ('sent', 'Hi'))
+        self.assertEqual(
+            set(self.campaign.drafts.filter(generation_job=self.job).values_list('status', flat=True)),
+            {'generated', 'sent'}
+        )
+
+    def test_job_failed_while_generating_stops_and_stays_failed(self):
+        consume(self.user.pk, 'generation', 5)
+        EmailDraft.objects.filter(campaign=self.campaign, status='pending').update(generation_job=self.job)
+
+        def generate(campaign, drafts):
+            # The heartbeat went stale during a slow provider call.
+            GenerationJob.objects.filter(pk=self.job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+            generation.recover_stale_jobs(timeout=60)
+            for draft in drafts:
+                draft.status = 'generated'
+
+        with mock.patch.object(generation, 'generate_draft_bodies', side_effect=generate):
+            generation.run_generation_job(self.job.pk)
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.processed), ('failed', 0))
+        self.assertEqual(
+            set(self.campaign.drafts.filter(generation_job=self.job).values_list('status', flat=True)), {'pending'}
+        )
+        self.assertEqual(usage(self.user.pk)['generation']['used'], 0)
+
+    def test_failed_generations_are_refunded(self):
+        consume(self.user.pk, 'generation', 3)
+        consume(self.user.pk, 'send', 5)
+        EmailCampaign.objects.filter(pk=self.campaign.pk).update(status='scheduled', quota_period=current_period())
+        EmailDraft.objects.filter(campaign=self.campaign, status='pending').update(generation_job=self.job)
+
+        def generate(campaign, drafts):
+            for index, draft in enumerate(drafts):
+                draft.status = 'failed' if index == 0 else 'generated'
+
+        with mock.patch.object(generation, 'generate_draft_bodies', side_effect=generate):
+            generation.run_generation_job(self.job.pk)
+        used = usage(self.user.pk)
+        self.assertEqual((used['generation']['used'], used['send']['used']), (2, 4))
+
+    def test_recovered_queued_job_is_not_run(self):
+        GenerationJob.objects.filter(pk=self.job.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(generation.recover_stale_jobs(timeout=60), 1)
+
+        with mock.patch.object(generation, 'generate_draft_bodies') as generate:
+            generation.run_generation_job(self.job.pk)
+        generate.assert_not_called()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'failed')
+
+
+@override_settings(LLM_PROVIDER={'BACKEND': 'apps.email_management.llm.FakeProvider'})
+class GenerateEmailStreamTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.campaign.custom_prompt = 'Keep it short.'
+        self.campaign.save(update_fields=['custom_prompt'])
+        self.url = f'/api/email-management/campaigns/{self.campaign.pk}/generate_email/stream/'
+
+    def request(self, recipient_data):
+        return AsyncRequestFactory().post(
+            self.url,
+            json.dumps({'recipient_data': recipient_data}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        )
+
+    async def test_recipient_data_must_be_an_object(self):
+        response = await generate_email_stream(self.request('new@example.com'), self.campaign.pk)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_disconnect_releases_quota(self):
+        response = await generate_email_stream(self.request({'email': 'new@example.com', 'name': 'New'}), self.campaign.pk)
+        used = sync_to_async(lambda: usage(self.user.pk)['generation']['used'])
+        self.assertEqual(await used(), 1)
+
+        events = response.streaming_content
+        await events.__anext__()
+        pending = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(await used(), 0)
+
+    async def test_completed_stream_keeps_quota(self):
+        response = await generate_email_stream(self.request({'email': 'new@example.com', 'name': 'New'}), self.campaign.pk)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b'event: done', body)
+        used = sync_to_async(lambda: usage(self.user.pk)['generation']['used'])
+        self.assertEqual(await used(), 1)
+
+
+class GenerateEmailTests(QueryCountTestCase):
+    def test_recipient_data_must_be_an_object(self):
+        response = self.client.post(
+            f'/api/email-management/campaigns/{self.campaign.pk}/generate_email/',
+            {'recipient_data': 'new@example.com'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(LLM_PROVIDER={'BACKEND': 'apps.email_management.llm.FakeProvider'})
+    def test_draft_sent_meanwhile_is_not_reset(self):
+        self.campaign.custom_prompt = 'Keep it short.'
+        self.campaign.save(update_fields=['custom_prompt'])
+        draft = self.campaign.drafts.get(recipient_email='recipient1@example.com')
+        EmailDraft.objects.filter(pk=draft.pk).update(status='sending')
+        # The draft is claimed for delivery after the up-front check.
+        with mock.patch('apps.email_management.views.recipient_already_sent', return_value=False):
+            response = self.client.post(
+                f'/api/email-management/campaigns/{self.campaign.pk}/generate_email/',
+                {'recipient_data': {'email': 'recipient1@example.com'}},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 409)
+        draft.refresh_from_db()
+        self.assertEqual((draft.status, draft.body), ('sending', 'Hi'))
+        self.assertEqual(usage(self.user.pk)['generation']['used'], 0)
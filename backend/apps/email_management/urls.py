@@ -1,12 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EmailTemplateViewSet, EmailCampaignViewSet, EmailDraftViewSet
+from .streaming import generate_email_stream
+from .views import EmailTemplateViewSet, EmailCampaignViewSet, EmailDraftViewSet, GenerationJobViewSet
 
 router = DefaultRouter()
 router.register(r'templates', EmailTemplateViewSet, basename='email-template')
 router.register(r'campaigns', EmailCampaignViewSet, basename='email-campaign')
 router.register(r'drafts', EmailDraftViewSet, basename='email-draft')
+router.register(r'generation-jobs', GenerationJobViewSet, basename='generation-job')
 
 urlpatterns = [
+    path('campaigns/<int:pk>/generate_email/stream/', generate_email_stream,
+         name='email-campaign-generate-email-stream'),
     path('', include(router.urls)),
 ]
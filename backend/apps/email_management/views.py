@@ -1,20 +1,38 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from rest_framework import viewsets, status, permissions, serializers
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
+from django.db.models import Avg, Count, Q, Sum
 from django.utils import timezone
-from .models import EmailTemplate, EmailCampaign, EmailDraft
-from .serializers import EmailTemplateSerializer, EmailCampaignSerializer, EmailDraftSerializer
-import openai
+from .models import ACTIVE_JOB_STATUSES, EmailTemplate, EmailCampaign, EmailDraft, GenerationJob
+from .serializers import (
+    EmailTemplateSerializer, EmailCampaignSerializer, EmailCampaignSummarySerializer,
+    EmailDraftSerializer, GenerationJobSerializer, BulkGenerateSerializer, CampaignSendSerializer,
+    DraftImportSerializer
+)
+from .generation import (
+    RecipientAlreadySent, generate_content, needs_llm, recipient_already_sent, save_generated_draft,
+    start_bulk_generation
+)
+from .importers import import_drafts
+from .llm import LLMError, RetryableError
+from .sending import send_drafts
+from .signals import notify_status_changes
 from django.conf import settings
+from apps.subscriptions.quotas import consume, current_period, release
+from core.logging import Payload
+from core.routers import ReplicaReadMixin
 import logging
 
 logger = logging.getLogger(__name__)
 
-class EmailTemplateViewSet(viewsets.ModelViewSet):
+class EmailTemplateViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = EmailTemplate.objects.all()
     serializer_class = EmailTemplateSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_date_field = 'created_at'
 
     def get_queryset(self):
         """
@@ -22,27 +40,25 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
         """
         return EmailTemplate.objects.filter(
             is_active=True
-        ).order_by('-created_at')
+        ).select_related('created_by').order_by('-created_at')
 
     def perform_create(self, serializer):
         """
         Set the created_by field to the current user before saving
         """
         try:
-            logger.info(f"Creating template with data: {serializer.validated_data}")
             serializer.save(created_by=self.request.user)
-            logger.info("Template created successfully")
         except Exception as e:
-            logger.error(f"Error in perform_create: {str(e)}")
+            logger.error("Error in perform_create: %s", e)
             raise
 
     def create(self, request, *args, **kwargs):
         try:
-            logger.info(f"Received template creation request with data: {request.data}")
+            logger.debug("Received template creation request with data: %s", Payload(request.data))
             
             # Check if user is authenticated
             if not request.user.is_authenticated:
-                logger.error("Unauthenticated user attempted to create template")
+                logger.warning("Unauthenticated user attempted to create template")
                 return Response(
                     {'detail': 'Authentication required'},
                     status=status.HTTP_401_UNAUTHORIZED
@@ -52,7 +68,7 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
             
             # Log validation errors if any
             if not serializer.is_valid():
-                logger.error(f"Validation errors: {serializer.errors}")
+                logger.info("Template validation errors: %s", Payload(serializer.errors))
                 return Response(
                     serializer.errors,
                     status=status.HTTP_400_BAD_REQUEST
@@ -67,13 +83,13 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
             )
             
         except serializers.ValidationError as e:
-            logger.error(f"Validation error in create: {str(e)}")
+            logger.info("Validation error in create: %s", e)
             return Response(
                 {'detail': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
         except Exception as e:
-            logger.error(f"Unexpected error in create: {str(e)}", exc_info=True)
+            logger.error("Unexpected error in create: %s", e, exc_info=True)
             return Response(
                 {'detail': 'An unexpected error occurred'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -81,28 +97,54 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.get_queryset()
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data)
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         except Exception as e:
-            logger.error(f"Unexpected error in list: {str(e)}", exc_info=True)
+            logger.error("Unexpected error in list: %s", e, exc_info=True)
             return Response(
                 {'detail': 'An unexpected error occurred'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class EmailCampaignViewSet(viewsets.ModelViewSet):
+class EmailCampaignViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = EmailCampaign.objects.all()  # Default queryset for router
     serializer_class = EmailCampaignSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_lookups = {
+        'status': 'status',
+        'template': 'template_id',
+    }
+    filter_date_field = 'created_at'
+    replica_actions = ('list', 'retrieve', 'drafts')
 
     def get_queryset(self):
         """
         Filter campaigns to show only those created by the current user
         """
-        return EmailCampaign.objects.filter(
+        queryset = EmailCampaign.objects.filter(
             created_by=self.request.user
-        ).order_by('-created_at')
+        ).select_related('template', 'created_by').order_by('-created_at')
+
+        if self.action == 'list':
+            counts = {
+                f'draft_{draft_status}': Count('drafts', filter=Q(drafts__status=draft_status))
+                for draft_status, _ in EmailDraft.STATUS_CHOICES
+            }
+            queryset = queryset.annotate(
+                draft_total=Count('drafts'),
+                draft_prompt_tokens=Sum('drafts__prompt_tokens'),
+                draft_completion_tokens=Sum('drafts__completion_tokens'),
+                draft_generation_ms_avg=Avg('drafts__generation_ms'),
+                **counts
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return EmailCampaignSummarySerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         """
@@ -123,7 +165,7 @@ class EmailCampaignViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         except Exception as e:
-            logger.error(f"Unexpected error in create: {str(e)}", exc_info=True)
+            logger.error("Unexpected error in create: %s", e, exc_info=True)
             return Response(
                 {'detail': 'An unexpected error occurred'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -133,58 +175,200 @@ class EmailCampaignViewSet(viewsets.ModelViewSet):
     def generate_email(self, request, pk=None):
         campaign = self.get_object()
         recipient_data = request.data.get('recipient_data', {})
-        
-        try:
-            # Prepare prompt for GPT
-            template = campaign.template
-            custom_prompt = campaign.custom_prompt
-            
-            prompt = f"""
-            Generate a professional email based on the following template and customization:
-            Template: {template.body_template if template else 'No template provided'}
-            Custom Instructions: {custom_prompt}
-            Recipient Details: {recipient_data}
-            """
-
-            # Call OpenAI API
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a professional email writer."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,
-                temperature=0.7
+        if not isinstance(recipient_data, dict):
+            return Response(
+                {'detail': 'recipient_data must be an object.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if recipient_already_sent(campaign, recipient_data.get('email')):
+            return Response(
+                {'detail': 'This recipient has already been emailed.'},
+                status=status.HTTP_409_CONFLICT
             )
 
-            generated_email = response.choices[0].message.content
+        uses_llm = needs_llm(campaign)
+        period = current_period()
+        if uses_llm:
+            consume(request.user.pk, 'generation', period=period)
 
-            # Create email draft
-            draft = EmailDraft.objects.create(
-                campaign=campaign,
-                recipient_email=recipient_data.get('email'),
-                recipient_name=recipient_data.get('name'),
-                subject=template.subject_template if template else 'Subject',
-                body=generated_email,
-                personalization_data=recipient_data
+        try:
+            subject, generated_email, usage = generate_content(
+                campaign,
+                recipient_data,
+                email=recipient_data.get('email'),
+                name=recipient_data.get('name')
             )
-            draft.mark_as_generated()
+
+            # Create or refresh the recipient's email draft
+            draft = save_generated_draft(campaign, recipient_data, subject, generated_email, usage)
 
             return Response({
                 'draft_id': draft.id,
                 'generated_email': generated_email
             }, status=status.HTTP_201_CREATED)
 
+        except RecipientAlreadySent as e:
+            if uses_llm:
+                release(request.user.pk, 'generation', period=period)
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+        except RetryableError as e:
+            logger.warning("Generation provider unavailable: %s", e)
+            if uses_llm:
+                release(request.user.pk, 'generation', period=period)
+            response = Response({
+                'error': 'The generation provider is busy, please retry shortly.'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            if e.retry_after:
+                response['Retry-After'] = str(int(e.retry_after) + 1)
+            return response
+        except LLMError as e:
+            logger.error("Generation provider error: %s", e)
+            if uses_llm:
+                release(request.user.pk, 'generation', period=period)
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_502_BAD_GATEWAY)
         except Exception as e:
-            logger.error(f"Unexpected error in generate_email: {str(e)}", exc_info=True)
+            logger.error("Unexpected error in generate_email: %s", e, exc_info=True)
+            if uses_llm:
+                release(request.user.pk, 'generation', period=period)
             return Response({
                 'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class EmailDraftViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], serializer_class=EmailDraftSerializer,
+            filter_lookups={'status': 'status', 'recipient': 'recipient_email'})
+    def drafts(self, request, pk=None):
+        """
+        Cursor-paginated drafts of a single campaign. The query parameters
+        filter the drafts, so the campaign is looked up without them.
+        """
+        campaign = get_object_or_404(self.get_queryset(), pk=pk)
+        self.check_object_permissions(request, campaign)
+        page = self.paginate_queryset(self.filter_queryset(campaign.drafts.all()))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def send(self, request, pk=None):
+        """
+        Queue a campaign for delivery by the campaign dispatcher, right away
+        or at ``scheduled_time``. Its undelivered drafts count against the
+        send quota, and those still to be generated (other than by a running
+        bulk generation job, which was charged already) against the
+        generation quota. Sending a scheduled campaign again only moves its
+        ``scheduled_time``.
+        """
+        campaign = self.get_object()
+        send_serializer = CampaignSendSerializer(data=request.data)
+        send_serializer.is_valid(raise_exception=True)
+        scheduled_time = send_serializer.validated_data.get('scheduled_time') or timezone.now()
+        if EmailCampaign.objects.filter(pk=campaign.pk, status='scheduled').update(scheduled_time=scheduled_time):
+            campaign.refresh_from_db()
+            return Response(self.get_serializer(campaign).data, status=status.HTTP_202_ACCEPTED)
+
+        counts = campaign.drafts.aggregate(
+            deliverable=Count('id', filter=Q(status__in=['pending', 'generated'])),
+            pending=Count('id', filter=Q(status='pending') & ~Q(
+                generation_job__in=GenerationJob.objects.filter(status__in=ACTIVE_JOB_STATUSES).values('pk')
+            ))
+        )
+        generations = counts['pending'] if needs_llm(campaign) else 0
+        period = current_period()
+        consume(request.user.pk, 'generation', generations, period=period)
+        try:
+            consume(request.user.pk, 'send', counts['deliverable'], period=period)
+        except Exception:
+            release(request.user.pk, 'generation', generations, period=period)
+            raise
+
+        queued = EmailCampaign.objects.filter(
+            pk=campaign.pk,
+            status__in=['draft', 'failed']
+        ).update(status='scheduled', scheduled_time=scheduled_time, quota_period=period)
+        if not queued:
+            release(request.user.pk, 'generation', generations, period=period)
+            release(request.user.pk, 'send', counts['deliverable'], period=period)
+            return Response(
+                {'detail': f'Campaign is already {campaign.status}'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        campaign.refresh_from_db()
+        serializer = self.get_serializer(campaign)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def bulk_generate(self, request, pk=None):
+        """
+        Queue generation for a list of recipients and return the job right away.
+        Progress is available from the generation-jobs endpoint.
+        """
+        campaign = self.get_object()
+        serializer = BulkGenerateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipients = serializer.validated_data['recipients']
+
+        # Charge for every recipient up front, then give back the ones that
+        # turned out to be duplicates.
+        charged = len(recipients) if needs_llm(campaign) else 0
+        period = current_period()
+        consume(request.user.pk, 'generation', charged, period=period)
+        try:
+            job = start_bulk_generation(campaign, recipients, request.user)
+        except Exception:
+            release(request.user.pk, 'generation', charged, period=period)
+            raise
+        if charged:
+            release(request.user.pk, 'generation', charged - job.total, period=period)
+        return Response(GenerationJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    def import_drafts(self, request, pk=None):
+        """
+        Create pending drafts from an uploaded CSV or JSONL recipient file
+        and report per-row errors
+        """
+        campaign = self.get_object()
+        serializer = DraftImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        report = import_drafts(
+            campaign,
+            serializer.validated_data['file'],
+            file_format=serializer.validated_data.get('format'),
+            batch_size=serializer.validated_data.get('batch_size')
+        )
+        return Response(report, status=status.HTTP_201_CREATED)
+
+class GenerationJobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = GenerationJob.objects.all()  # Default queryset for router
+    serializer_class = GenerationJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_lookups = {
+        'status': 'status',
+        'campaign': 'campaign_id',
+    }
+    filter_date_field = 'created_at'
+
+    def get_queryset(self):
+        """
+        Filter jobs to show only those started by the current user
+        """
+        return GenerationJob.objects.filter(
+            created_by=self.request.user
+        ).order_by('-created_at')
+
+class EmailDraftViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = EmailDraft.objects.all()  # Default queryset for router
     serializer_class = EmailDraftSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_lookups = {
+        'status': 'status',
+        'campaign': 'campaign_id',
+        'recipient': 'recipient_email',
+    }
+    filter_date_field = 'created_at'
 
     def get_queryset(self):
         """
@@ -196,9 +380,12 @@ class EmailDraftViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         """
-        Set the created_by field to the current user before saving
+        Only allow drafts in campaigns owned by the current user
         """
-        serializer.save(created_by=self.request.user)
+        if serializer.validated_data['campaign'].created_by_id != self.request.user.id:
+            raise PermissionDenied('You can only add drafts to your own campaigns.')
+        draft = serializer.save()
+        notify_status_changes([draft])
 
     def create(self, request, *args, **kwargs):
         try:
@@ -212,16 +399,43 @@ class EmailDraftViewSet(viewsets.ModelViewSet):
                 {'detail': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        except PermissionDenied:
+            raise
         except Exception as e:
-            logger.error(f"Unexpected error in create: {str(e)}", exc_info=True)
+            logger.error("Unexpected error in create: %s", e, exc_info=True)
             return Response(
                 {'detail': 'An unexpected error occurred'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
     @action(detail=True, methods=['post'])
-    def mark_sent(self, request, pk=None):
+    def send(self, request, pk=None):
+        """
+        Deliver a generated draft right away through the sending pipeline
+        """
         draft = self.get_object()
-        draft.mark_as_sent()
+        period = current_period()
+        consume(request.user.pk, 'send', period=period)
+        claimed = EmailDraft.objects.filter(pk=draft.pk, status='generated').update(
+            status='sending',
+            claimed_at=timezone.now()
+        )
+        if not claimed:
+            release(request.user.pk, 'send', period=period)
+            return Response(
+                {'detail': 'Only generated drafts can be sent'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if not send_drafts([draft]):
+            release(request.user.pk, 'send', period=period)
         serializer = self.get_serializer(draft)
         return Response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def mark_sent(self, request, pk=None):
+        """
+        Kept for older clients: delivers the draft (and charges the send
+        quota) exactly like ``send``.
+        """
+        return self.send(request, pk)
@@ -0,0 +1,65 @@
+"""
+Campaign audiences built from the recruiter store.
+
+The recruiters are read with one query, streamed in chunks, and turned
+into pending drafts with ``bulk_create``; recipients the campaign already
+has are skipped. Generation and delivery then go through the usual
+campaign pipeline.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from apps.email_management.generation import default_subject
+from apps.email_management.importers import insert_drafts
+from apps.email_management.models import EmailDraft
+from core.utils import chunked
+
+AUDIENCE_FIELDS = (
+    'email', 'first_name', 'last_name', 'title', 'location',
+    'company__name', 'company__domain', 'extra_data',
+)
+
+
+def recipient_data(row):
+    name = ' '.join(part for part in (row['first_name'], row['last_name']) if part)
+    data = dict(row['extra_data'] or {})
+    data.update({
+        'email': row['email'],
+        'name': name,
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'title': row['title'],
+        'location': row['location'],
+        'company': row['company__name'] or '',
+        'company_domain': row['company__domain'] or '',
+    })
+    return data
+
+
+def build_audience(campaign, recruiters, batch_size=None):
+    """
+    Create one pending draft in ``campaign`` per recruiter in the
+    ``recruiters`` queryset and return ``(created, duplicates)``.
+    """
+    batch_size = batch_size or settings.RECRUITER_AUDIENCE_BATCH_SIZE
+    subject = default_subject(campaign.template)
+    rows = recruiters.order_by('pk').values(*AUDIENCE_FIELDS).iterator(chunk_size=batch_size)
+
+    created = duplicates = 0
+    with transaction.atomic():
+        for chunk in chunked(rows, batch_size):
+            drafts = []
+            for row in chunk:
+                data = recipient_data(row)
+                drafts.append(EmailDraft(
+                    campaign=campaign,
+                    recipient_email=row['email'],
+                    recipient_name=data['name'],
+                    subject=subject,
+                    body='',
+                    personalization_data=data
+                ))
+            chunk_created, chunk_duplicates = insert_drafts(drafts)
+            created += chunk_created
+            duplicates += chunk_duplicates
+    return created, duplicates
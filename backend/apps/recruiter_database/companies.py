@@ -0,0 +1,66 @@
+from core.utils import normalize_domain, normalize_text
+
+from .models import Company
+
+
+def company_key(name=None, domain=None):
+    """
+    Identity of a company: its normalized domain or, without one, its
+    normalized name. ``None`` when neither is given.
+    """
+    domain = normalize_domain(domain)
+    if domain:
+        return ('domain', domain)
+    name = normalize_text(name)
+    if name:
+        return ('name', name)
+    return None
+
+
+def resolve_company(name=None, domain=None):
+    """
+    Return the company identified by ``domain`` (or, without a domain, by
+    its normalized name), creating it if needed. Returns ``None`` when
+    neither is given.
+    """
+    key = company_key(name, domain)
+    if key is None:
+        return None
+    return resolve_companies([(name, domain)])[key]
+
+
+def resolve_companies(pairs):
+    """
+    Resolve many ``(name, domain)`` pairs at once: one query for the known
+    companies, one ``bulk_create`` for the missing ones and one query to
+    read those back. Returns a dict keyed by ``company_key``.
+    """
+    names = {}
+    for name, domain in pairs:
+        key = company_key(name, domain)
+        if key is not None:
+            names.setdefault(key, ' '.join((name or '').split()) or key[1])
+    if not names:
+        return {}
+
+    def fetch():
+        domains = [value for kind, value in names if kind == 'domain']
+        name_keys = [value for kind, value in names if kind == 'name']
+        found = {}
+        for company in Company.objects.filter(domain__in=domains):
+            found[('domain', company.domain)] = company
+        for company in Company.objects.filter(domain__isnull=True, name_normalized__in=name_keys).order_by('pk'):
+            found.setdefault(('name', company.name_normalized), company)
+        return found
+
+    companies = fetch()
+    missing = []
+    for key, name in names.items():
+        if key not in companies:
+            company = Company(name=name, domain=key[1] if key[0] == 'domain' else None)
+            company.normalize()
+            missing.append(company)
+    if missing:
+        Company.objects.bulk_create(missing, ignore_conflicts=True)
+        companies = fetch()
+    return companies
@@ -0,0 +1,167 @@
+"""
+Bulk recruiter import from uploaded CSV/JSONL files.
+
+Rows are streamed and processed in chunks. Within a chunk, rows are
+deduplicated on the normalized email (the last row wins). Companies are
+resolved with a handful of set-based queries, and the recruiters are
+upserted with a single ``INSERT ... ON CONFLICT DO UPDATE`` on the owner's
+unique normalized email. Re-importing a list updates contacts instead of
+duplicating them; columns left empty keep their stored values.
+"""
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from core.utils import chunked, iter_uploaded_rows
+
+from .companies import company_key, resolve_companies
+from .models import Recruiter
+
+logger = logging.getLogger(__name__)
+
+FIELD_COLUMNS = {
+    'email': ('email', 'email_address'),
+    'first_name': ('first_name',),
+    'last_name': ('last_name',),
+    'title': ('title', 'job_title'),
+    'location': ('location',),
+    'company': ('company', 'company_name'),
+    'company_domain': ('company_domain', 'domain', 'website'),
+    'linkedin_url': ('linkedin_url', 'linkedin'),
+}
+KNOWN_COLUMNS = {column for columns in FIELD_COLUMNS.values() for column in columns} | {'name'}
+MAX_LENGTHS = {'first_name': 100, 'last_name': 100, 'title': 200, 'location': 200, 'linkedin_url': 500}
+MERGED_FIELDS = ['first_name', 'last_name', 'title', 'location', 'linkedin_url']
+UPSERT_FIELDS = [
+    'email', 'first_name', 'last_name', 'title', 'title_normalized', 'location',
+    'location_normalized', 'company', 'linkedin_url', 'extra_data', 'updated_at',
+]
+
+
+def _first_value(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, ''):
+            return str(value).strip()
+    return ''
+
+
+def parse_row(row):
+    """
+    Validate one imported row and return ``(values, errors)``. Columns that
+    are not recruiter fields are kept in ``extra_data``.
+    """
+    values = {field: _first_value(row, columns) for field, columns in FIELD_COLUMNS.items()}
+    if not values['first_name'] and not values['last_name'] and row.get('name'):
+        values['first_name'], _, values['last_name'] = str(row['name']).strip().partition(' ')
+
+    errors = {}
+    try:
+        validate_email(values['email'])
+    except ValidationError:
+        errors['email'] = 'Enter a valid email address.'
+    for field, max_length in MAX_LENGTHS.items():
+        if len(values[field]) > max_length:
+            errors[field] = f'Ensure this field has no more than {max_length} characters.'
+    if errors:
+        return None, errors
+
+    values['extra_data'] = {key: value for key, value in row.items() if key not in KNOWN_COLUMNS}
+    return values, None
+
+
+def upsert_recruiters(user, rows):
+    """
+    Insert or update the recruiters described by ``rows`` (parsed values)
+    for ``user``. Returns ``(created, updated, duplicates)``.
+    """
+    unique = {}
+    for values in rows:
+        recruiter = Recruiter(
+            created_by=user,
+            email=values['email'],
+            first_name=values['first_name'],
+            last_name=values['last_name'],
+            title=values['title'],
+            location=values['location'],
+            linkedin_url=values['linkedin_url'],
+            extra_data=values['extra_data']
+        )
+        recruiter.normalize()
+        unique[recruiter.email_normalized] = (recruiter, values['company'], values['company_domain'])
+    if not unique:
+        return 0, 0, 0
+
+    companies = resolve_companies((name, domain) for _, name, domain in unique.values())
+    recruiters = []
+    for recruiter, name, domain in unique.values():
+        recruiter.company = companies.get(company_key(name, domain))
+        recruiters.append(recruiter)
+
+    # Columns missing from the import keep the values already stored.
+    existing = {
+        row['email_normalized']: row
+        for row in Recruiter.objects.filter(
+            created_by=user,
+            email_normalized__in=list(unique)
+        ).values('email_normalized', 'company_id', 'extra_data', *MERGED_FIELDS)
+    }
+    for recruiter in recruiters:
+        current = existing.get(recruiter.email_normalized)
+        if current is None:
+            continue
+        for field in MERGED_FIELDS:
+            if not getattr(recruiter, field):
+                setattr(recruiter, field, current[field])
+        if recruiter.company is None:
+            recruiter.company_id = current['company_id']
+        recruiter.extra_data = {**(current['extra_data'] or {}), **recruiter.extra_data}
+        recruiter.normalize()
+
+    Recruiter.objects.bulk_create(
+        recruiters,
+        update_conflicts=True,
+        unique_fields=['created_by', 'email_normalized'],
+        update_fields=UPSERT_FIELDS
+    )
+    return len(unique) - len(existing), len(existing), len(rows) - len(unique)
+
+
+def import_recruiters(user, upload, file_format=None, batch_size=None):
+    """
+    Import every row of ``upload`` into ``user``'s recruiters and return a
+    report with the number of created, updated, duplicate and failed rows
+    plus the first ``RECRUITER_IMPORT_MAX_ERRORS`` row errors.
+    """
+    batch_size = batch_size or settings.RECRUITER_IMPORT_BATCH_SIZE
+    max_errors = settings.RECRUITER_IMPORT_MAX_ERRORS
+    report = {'created': 0, 'updated': 0, 'duplicates': 0, 'failed': 0, 'errors': []}
+
+    for chunk in chunked(iter_uploaded_rows(upload, file_format), batch_size):
+        rows = []
+        for line_number, row, parse_error in chunk:
+            if parse_error:
+                errors = {'row': parse_error}
+            else:
+                values, errors = parse_row(row)
+            if errors:
+                report['failed'] += 1
+                if len(report['errors']) < max_errors:
+                    report['errors'].append({'line': line_number, 'errors': errors})
+                continue
+            rows.append(values)
+
+        with transaction.atomic():
+            created, updated, duplicates = upsert_recruiters(user, rows)
+        report['created'] += created
+        report['updated'] += updated
+        report['duplicates'] += duplicates
+
+    logger.info(
+        "Imported recruiters for user %s: %s created, %s updated, %s duplicates, %s failed rows",
+        user.pk, report['created'], report['updated'], report['duplicates'], report['failed']
+    )
+    return report
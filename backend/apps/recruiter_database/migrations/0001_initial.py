@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Company',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('name_normalized', models.CharField(db_index=True, editable=False, max_length=200)),
+                ('domain', models.CharField(blank=True, max_length=253, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'companies',
+            },
+        ),
+        migrations.CreateModel(
+            name='Recruiter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('first_name', models.CharField(blank=True, max_length=100)),
+                ('last_name', models.CharField(blank=True, max_length=100)),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('title_normalized', models.CharField(blank=True, editable=False, max_length=200)),
+                ('location', models.CharField(blank=True, max_length=200)),
+                ('location_normalized', models.CharField(blank=True, editable=False, max_length=200)),
+                ('linkedin_url', models.URLField(blank=True, max_length=500)),
+                ('extra_data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recruiters', to='recruiter_database.company')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recruiters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_by', 'created_at'], name='recruiter_owner_created_idx'), models.Index(fields=['created_by', 'company'], name='recruiter_owner_company_idx'), models.Index(fields=['created_by', 'title_normalized'], name='recruiter_owner_title_idx'), models.Index(fields=['created_by', 'location_normalized'], name='recruiter_owner_location_idx'), models.Index(fields=['email'], name='recruiter_email_idx')],
+            },
+        ),
+    ]
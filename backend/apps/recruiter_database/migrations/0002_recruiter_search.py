@@ -0,0 +1,118 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE recruiter_database_recruiter_fts USING fts5(
+        name, email, title, location, company,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER recruiter_fts_insert AFTER INSERT ON recruiter_database_recruiter BEGIN
+        INSERT INTO recruiter_database_recruiter_fts (rowid, name, email, title, location, company)
+        VALUES (
+            new.id, new.first_name || ' ' || new.last_name, new.email, new.title, new.location,
+            coalesce((SELECT name FROM recruiter_database_company WHERE id = new.company_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER recruiter_fts_update AFTER UPDATE ON recruiter_database_recruiter BEGIN
+        DELETE FROM recruiter_database_recruiter_fts WHERE rowid = old.id;
+        INSERT INTO recruiter_database_recruiter_fts (rowid, name, email, title, location, company)
+        VALUES (
+            new.id, new.first_name || ' ' || new.last_name, new.email, new.title, new.location,
+            coalesce((SELECT name FROM recruiter_database_company WHERE id = new.company_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER recruiter_fts_delete AFTER DELETE ON recruiter_database_recruiter BEGIN
+        DELETE FROM recruiter_database_recruiter_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER company_fts_update AFTER UPDATE OF name ON recruiter_database_company BEGIN
+        UPDATE recruiter_database_recruiter_fts SET company = new.name
+        WHERE rowid IN (SELECT id FROM recruiter_database_recruiter WHERE company_id = new.id);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS company_fts_update',
+    'DROP TRIGGER IF EXISTS recruiter_fts_delete',
+    'DROP TRIGGER IF EXISTS recruiter_fts_update',
+    'DROP TRIGGER IF EXISTS recruiter_fts_insert',
+    'DROP TABLE IF EXISTS recruiter_database_recruiter_fts',
+]
+
+POSTGRES_FORWARD = [
+    'ALTER TABLE recruiter_database_recruiter ADD COLUMN search_vector tsvector',
+    """
+    CREATE FUNCTION recruiter_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.first_name, '') || ' ' || coalesce(NEW.last_name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(
+                (SELECT name FROM recruiter_database_company WHERE id = NEW.company_id), ''
+            )), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.location, '') || ' ' || coalesce(NEW.email, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recruiter_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON recruiter_database_recruiter
+    FOR EACH ROW EXECUTE FUNCTION recruiter_search_vector_update()
+    """,
+    """
+    CREATE FUNCTION company_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.name IS DISTINCT FROM OLD.name THEN
+            -- Touching the rows re-runs recruiter_search_vector_trigger.
+            UPDATE recruiter_database_recruiter SET company_id = company_id WHERE company_id = NEW.id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER company_search_vector_trigger
+    AFTER UPDATE ON recruiter_database_company
+    FOR EACH ROW EXECUTE FUNCTION company_search_vector_update()
+    """,
+    'UPDATE recruiter_database_recruiter SET company_id = company_id',
+    'CREATE INDEX recruiter_search_vector_idx ON recruiter_database_recruiter USING GIN (search_vector)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP TRIGGER IF EXISTS company_search_vector_trigger ON recruiter_database_company',
+    'DROP FUNCTION IF EXISTS company_search_vector_update()',
+    'DROP TRIGGER IF EXISTS recruiter_search_vector_trigger ON recruiter_database_recruiter',
+    'DROP FUNCTION IF EXISTS recruiter_search_vector_update()',
+    'ALTER TABLE recruiter_database_recruiter DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run_statements(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiter_database', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run_statements({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import migrations, models, transaction
+from django.db.models import Count, Min
+
+from ._search_index import preserve_sqlite_triggers
+
+BATCH_SIZE = 2000
+
+GMAIL_DOMAINS = ('gmail.com', 'googlemail.com')
+
+
+def normalize_email(email):
+    # Frozen copy of core.utils.normalize_email as of this migration.
+    email = (email or '').strip().lower()
+    local, at, domain = email.rpartition('@')
+    if not at or not local:
+        return email
+
+    domain = domain.rstrip('.')
+    try:
+        domain = domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    if domain in GMAIL_DOMAINS:
+        local = local.partition('+')[0].replace('.', '')
+        domain = 'gmail.com'
+    return f'{local}@{domain}'
+
+
+def backfill(apps, schema_editor):
+    # One transaction per batch, so the table is never locked for the whole
+    # backfill and an interrupted run keeps the batches already written.
+    Recruiter = apps.get_model('recruiter_database', 'Recruiter')
+
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(Recruiter.objects.filter(pk__gt=last_pk).order_by('pk').only('id', 'email')[:BATCH_SIZE])
+            if not chunk:
+                return
+            for recruiter in chunk:
+                recruiter.email_normalized = normalize_email(recruiter.email)
+            Recruiter.objects.bulk_update(chunk, ['email_normalized'])
+        last_pk = chunk[-1].pk
+
+
+def deduplicate(apps, schema_editor):
+    # Keep the oldest contact of each owner/address pair.
+    Recruiter = apps.get_model('recruiter_database', 'Recruiter')
+
+    duplicates = Recruiter.objects.values(
+        'created_by_id', 'email_normalized'
+    ).annotate(copies=Count('id'), keep=Min('id')).filter(copies__gt=1).order_by()
+
+    for group in duplicates.iterator():
+        Recruiter.objects.filter(
+            created_by_id=group['created_by_id'],
+            email_normalized=group['email_normalized']
+        ).exclude(pk=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+    # The backfill commits batch by batch.
+    atomic = False
+
+    dependencies = [
+        ('recruiter_database', '0002_recruiter_search'),
+    ]
+
+    operations = [
+        *preserve_sqlite_triggers(
+            migrations.AddField(
+                model_name='recruiter',
+                name='email_normalized',
+                field=models.CharField(default='', editable=False, max_length=254),
+                preserve_default=False,
+            ),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop, atomic=False),
+        migrations.RunPython(deduplicate, migrations.RunPython.noop, atomic=False),
+    ]
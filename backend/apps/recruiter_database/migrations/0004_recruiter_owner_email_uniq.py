@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+from core.db import AddUniqueConstraintConcurrently
+
+from ._search_index import preserve_sqlite_triggers
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    atomic = False
+
+    dependencies = [
+        ('recruiter_database', '0003_recruiter_email_normalized'),
+    ]
+
+    operations = preserve_sqlite_triggers(
+        AddUniqueConstraintConcurrently(
+            model_name='recruiter',
+            constraint=models.UniqueConstraint(fields=('created_by', 'email_normalized'),
+                                               name='recruiter_owner_email_uniq'),
+        ),
+    )
@@ -0,0 +1,90 @@
+"""
+SQLite search triggers for migrations that alter recruiter tables.
+
+The search index itself is created by ``0002_recruiter_search``: an FTS5
+table kept in sync by triggers on SQLite, a GIN-indexed ``search_vector``
+column filled by a trigger on PostgreSQL. Django rebuilds a SQLite table
+(dropping its triggers) whenever a migration alters it, so migrations that
+touch ``Recruiter`` or ``Company`` wrap their operations in
+``preserve_sqlite_triggers``. This module lives with the migrations (the
+leading underscore keeps the loader from treating it as one) so later
+changes to the app do not alter what applied migrations did.
+"""
+from django.db import migrations
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER recruiter_fts_insert AFTER INSERT ON recruiter_database_recruiter BEGIN
+        INSERT INTO recruiter_database_recruiter_fts (rowid, name, email, title, location, company)
+        VALUES (
+            new.id, new.first_name || ' ' || new.last_name, new.email, new.title, new.location,
+            coalesce((SELECT name FROM recruiter_database_company WHERE id = new.company_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER recruiter_fts_update AFTER UPDATE ON recruiter_database_recruiter BEGIN
+        DELETE FROM recruiter_database_recruiter_fts WHERE rowid = old.id;
+        INSERT INTO recruiter_database_recruiter_fts (rowid, name, email, title, location, company)
+        VALUES (
+            new.id, new.first_name || ' ' || new.last_name, new.email, new.title, new.location,
+            coalesce((SELECT name FROM recruiter_database_company WHERE id = new.company_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER recruiter_fts_delete AFTER DELETE ON recruiter_database_recruiter BEGIN
+        DELETE FROM recruiter_database_recruiter_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER company_fts_update AFTER UPDATE OF name ON recruiter_database_company BEGIN
+        UPDATE recruiter_database_recruiter_fts SET company = new.name
+        WHERE rowid IN (SELECT id FROM recruiter_database_recruiter WHERE company_id = new.id);
+    END
+    """,
+]
+
+SQLITE_DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS company_fts_update',
+    'DROP TRIGGER IF EXISTS recruiter_fts_delete',
+    'DROP TRIGGER IF EXISTS recruiter_fts_update',
+    'DROP TRIGGER IF EXISTS recruiter_fts_insert',
+]
+
+SQLITE_REBUILD = [
+    'DELETE FROM recruiter_database_recruiter_fts',
+    """
+    INSERT INTO recruiter_database_recruiter_fts (rowid, name, email, title, location, company)
+    SELECT r.id, r.first_name || ' ' || r.last_name, r.email, r.title, r.location, coalesce(c.name, '')
+    FROM recruiter_database_recruiter r
+    LEFT JOIN recruiter_database_company c ON c.id = r.company_id
+    """,
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_sqlite_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP_TRIGGERS)
+
+
+def create_sqlite_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        _execute(schema_editor, [*SQLITE_TRIGGERS, *SQLITE_REBUILD])
+
+
+def preserve_sqlite_triggers(*operations):
+    """
+    Wrap migration operations that rebuild the recruiter or company table
+    so the SQLite search triggers are dropped first and restored after.
+    """
+    return [
+        migrations.RunPython(drop_sqlite_triggers, create_sqlite_triggers),
+        *operations,
+        migrations.RunPython(create_sqlite_triggers, drop_sqlite_triggers),
+    ]
@@ -1,3 +1,80 @@
 from django.db import models
+from django.contrib.auth import get_user_model
 
-# Create your models here.
+from core.utils import normalize_domain, normalize_email, normalize_text
+
+User = get_user_model()
+
+class Company(models.Model):
+    name = models.CharField(max_length=200)
+    name_normalized = models.CharField(max_length=200, db_index=True, editable=False)
+    domain = models.CharField(max_length=253, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'companies'
+
+    def normalize(self):
+        self.name = ' '.join(self.name.split())
+        self.name_normalized = normalize_text(self.name)
+        self.domain = normalize_domain(self.domain) or None
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+class Recruiter(models.Model):
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recruiters')
+    company = models.ForeignKey(Company, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='recruiters')
+    email = models.EmailField()
+    email_normalized = models.CharField(max_length=254, editable=False)
+    first_name = models.CharField(max_length=100, blank=True)
+    last_name = models.CharField(max_length=100, blank=True)
+    title = models.CharField(max_length=200, blank=True)
+    title_normalized = models.CharField(max_length=200, blank=True, editable=False)
+    location = models.CharField(max_length=200, blank=True)
+    location_normalized = models.CharField(max_length=200, blank=True, editable=False)
+    linkedin_url = models.URLField(max_length=500, blank=True)
+    extra_data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'created_at'], name='recruiter_owner_created_idx'),
+            models.Index(fields=['created_by', 'company'], name='recruiter_owner_company_idx'),
+            models.Index(fields=['created_by', 'title_normalized'], name='recruiter_owner_title_idx'),
+            models.Index(fields=['created_by', 'location_normalized'], name='recruiter_owner_location_idx'),
+            models.Index(fields=['email'], name='recruiter_email_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['created_by', 'email_normalized'],
+                                    name='recruiter_owner_email_uniq'),
+        ]
+
+    @property
+    def full_name(self):
+        return ' '.join(part for part in (self.first_name, self.last_name) if part)
+
+    def normalize(self):
+        """
+        Fill the normalized columns. Called from ``save()``; call it
+        directly before ``bulk_create``/``bulk_update``.
+        """
+        self.email = self.email.strip().lower()
+        self.email_normalized = normalize_email(self.email)
+        self.title = ' '.join(self.title.split())
+        self.location = ' '.join(self.location.split())
+        self.title_normalized = normalize_text(self.title)
+        self.location_normalized = normalize_text(self.location)
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.email
@@ -0,0 +1,94 @@
+"""
+Recruiter search and facets.
+
+Full-text search uses the index created by ``0002_recruiter_search``: an
+FTS5 table on SQLite and a GIN-indexed ``search_vector`` column on
+PostgreSQL, both kept current by triggers. Terms are prefix matched and
+ANDed together. Other databases fall back to ``icontains``.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, CharField, Count, F, Min, Q, Value
+from django.db.models.expressions import RawSQL
+
+from core.utils import normalize_text
+
+# Facet name -> (normalized field grouped on, display field)
+FACETS = {
+    'company': ('company__name_normalized', 'company__name'),
+    'title': ('title_normalized', 'title'),
+    'location': ('location_normalized', 'location'),
+}
+
+TERM_RE = re.compile(r'\w+')
+
+
+def search_terms(query):
+    return TERM_RE.findall((query or '').lower())
+
+
+def search_recruiters(queryset, query):
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(id__in=RawSQL(
+            'SELECT rowid FROM recruiter_database_recruiter_fts '
+            'WHERE recruiter_database_recruiter_fts MATCH %s',
+            [match]
+        ))
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.alias(search_match=RawSQL(
+            "recruiter_database_recruiter.search_vector @@ to_tsquery('simple', %s)",
+            [tsquery],
+            output_field=BooleanField()
+        )).filter(search_match=True)
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(first_name__icontains=term) | Q(last_name__icontains=term) | Q(email__icontains=term) |
+            Q(title__icontains=term) | Q(location__icontains=term) | Q(company__name__icontains=term)
+        )
+    return queryset.filter(condition)
+
+
+def filter_recruiters(queryset, params):
+    """
+    Apply the ``search`` query and the facet filters (``company``, ``title``,
+    ``location``, matched on their normalized form) from ``params``.
+    """
+    queryset = search_recruiters(queryset, params.get('search'))
+    for facet, (field, _) in FACETS.items():
+        value = params.get(facet)
+        if value:
+            queryset = queryset.filter(**{field: normalize_text(value)})
+    return queryset
+
+
+def facet_counts(queryset, limit=10):
+    """
+    Count recruiters per company, title and location in a single
+    ``UNION ALL`` query and return the ``limit`` largest values per facet:
+    ``{'title': [{'value': ..., 'label': ..., 'count': ...}, ...], ...}``.
+    """
+    branches = [
+        queryset.order_by().filter(**{f'{field}__gt': ''}).values(value=F(field)).annotate(
+            facet=Value(facet, output_field=CharField()),
+            label=Min(label_field),
+            count=Count('pk')
+        ).values('facet', 'value', 'label', 'count')
+        for facet, (field, label_field) in FACETS.items()
+    ]
+    results = {facet: [] for facet in FACETS}
+    for row in branches[0].union(*branches[1:], all=True):
+        results[row['facet']].append({'value': row['value'], 'label': row['label'], 'count': row['count']})
+    for facet, rows in results.items():
+        rows.sort(key=lambda row: (-row['count'], row['value']))
+        del rows[limit:]
+    return results
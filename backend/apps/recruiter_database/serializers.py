@@ -0,0 +1,62 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from core.metrics import TimedSerializerMixin
+from core.utils import normalize_email
+
+from .companies import resolve_company
+from .models import Recruiter
+
+
+class RecruiterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    company_name = serializers.CharField(source='company.name', required=False, allow_blank=True)
+    company_domain = serializers.CharField(source='company.domain', required=False, allow_blank=True,
+                                           allow_null=True)
+    full_name = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Recruiter
+        fields = ['id', 'email', 'first_name', 'last_name', 'full_name', 'title', 'location',
+                 'company', 'company_name', 'company_domain', 'linkedin_url', 'extra_data',
+                 'created_at', 'updated_at']
+        read_only_fields = ['company', 'created_at', 'updated_at']
+
+    def validate_email(self, value):
+        request = self.context.get('request')
+        if request is None:
+            return value
+        duplicates = Recruiter.objects.filter(created_by=request.user, email_normalized=normalize_email(value))
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError('You already have a recruiter with this email address.')
+        return value
+
+    def _resolve_company(self, validated_data):
+        company_data = validated_data.pop('company', None)
+        if company_data is not None:
+            validated_data['company'] = resolve_company(
+                company_data.get('name'),
+                company_data.get('domain')
+            )
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self._resolve_company(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self._resolve_company(validated_data))
+
+
+class AudienceSerializer(serializers.Serializer):
+    campaign = serializers.IntegerField()
+
+
+class RecruiterImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+    batch_size = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=settings.RECRUITER_IMPORT_MAX_BATCH_SIZE
+    )
@@ -1,3 +1,89 @@
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from apps.authentication.models import User
+
+from .models import Company, Recruiter
+
+
+class RecruiterViewSetQueryTests(APITestCase):
+    """
+    Fixed query counts for the recruiter endpoints, over several recruiters
+    at different companies so an N+1 shows up as a changed count.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner', email='owner@example.com')
+        companies = [Company.objects.create(name=f'Company {index}', domain=f'company{index}.com') for index in range(3)]
+        cls.recruiters = [
+            Recruiter.objects.create(
+                created_by=cls.user,
+                company=companies[index % 3],
+                email=f'recruiter{index}@company{index % 3}.com',
+                first_name=f'Recruiter {index}',
+                title='Talent Partner',
+                location='Berlin'
+            )
+            for index in range(6)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/recruiter-database/recruiters/')
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/recruiter-database/recruiters/{self.recruiters[0].pk}/')
+
+    def test_facets(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/recruiter-database/recruiters/facets/')
+        self.assertEqual(len(response.data['company']), 3)
+
+
+class RecruiterImportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner', email='owner@example.com')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_undecodable_line_is_reported_and_the_rest_imported(self):
+        upload = SimpleUploadedFile(
+            'recruiters.csv',
+            b'email,name\nann@example.com,Ann\nbob@example.com,B\xf6b\ncid@example.com,Cid\n'
+        )
+        response = self.client.post(
+            '/api/recruiter-database/recruiters/import/', {'file': upload, 'batch_size': 1}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        self.assertEqual(response.data['errors'], [{'line': 3, 'errors': {'row': 'Line is not valid UTF-8'}}])
+        self.assertEqual(
+            set(Recruiter.objects.values_list('email', flat=True)), {'ann@example.com', 'cid@example.com'}
+        )
+
+    def test_reimport_updates_and_keeps_empty_columns(self):
+        self.import_file(b'email,name,title,company\nAnn@Example.com,Ann Lee,Recruiter,Acme\n')
+        report = self.import_file(
+            b'email,name,title,company\nann@example.com,,Head of Talent,\nann@EXAMPLE.com,,,\n'
+        )
+        self.assertEqual((report['created'], report['updated'], report['duplicates']), (0, 1, 1))
+        recruiter = Recruiter.objects.get()
+        self.assertEqual((recruiter.first_name, recruiter.last_name), ('Ann', 'Lee'))
+        self.assertEqual(recruiter.company.name, 'Acme')
+
+    def import_file(self, content):
+        response = self.client.post(
+            '/api/recruiter-database/recruiters/import/',
+            {'file': SimpleUploadedFile('recruiters.csv', content)},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
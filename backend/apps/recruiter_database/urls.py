@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import RecruiterViewSet
+
+router = DefaultRouter()
+router.register(r'recruiters', RecruiterViewSet, basename='recruiter')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -1,3 +1,93 @@
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404
+from rest_framework import viewsets, status, permissions
+from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+from apps.email_management.models import EmailCampaign
+from .audience import build_audience
+from .importers import import_recruiters
+from .models import Recruiter
+from .search import facet_counts, filter_recruiters
+from .serializers import RecruiterSerializer, AudienceSerializer, RecruiterImportSerializer
+import logging
 
-# Create your views here.
+logger = logging.getLogger(__name__)
+
+class RecruiterViewSet(viewsets.ModelViewSet):
+    queryset = Recruiter.objects.all()  # Default queryset for router
+    serializer_class = RecruiterSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_lookups = {
+        'email': 'email',
+        'company_id': 'company_id',
+        'domain': 'company__domain',
+    }
+    filter_date_field = 'created_at'
+
+    def get_queryset(self):
+        """
+        Filter recruiters to show only those added by the current user
+        """
+        return Recruiter.objects.filter(
+            created_by=self.request.user
+        ).select_related('company').order_by('-created_at')
+
+    def filter_queryset(self, queryset):
+        """
+        Apply ``search`` and the company/title/location facet filters on
+        top of the default filter backends
+        """
+        queryset = super().filter_queryset(queryset)
+        return filter_recruiters(queryset, self.request.query_params)
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Company, title and location counts for the current filters
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 100)
+        except ValueError:
+            limit = 10
+        return Response(facet_counts(self.filter_queryset(self.get_queryset()), limit=limit))
+
+    @action(detail=False, methods=['post'])
+    def audience(self, request):
+        """
+        Add every recruiter matching the current filters to a campaign as a
+        pending draft
+        """
+        serializer = AudienceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        campaign = get_object_or_404(
+            EmailCampaign.objects.select_related('template'),
+            pk=serializer.validated_data['campaign'],
+            created_by=request.user
+        )
+
+        created, duplicates = build_audience(campaign, self.filter_queryset(self.get_queryset()))
+        logger.info("Added %s recruiters to campaign %s (%s duplicates)", created, campaign.pk, duplicates)
+        return Response(
+            {'campaign': campaign.pk, 'created': created, 'duplicates': duplicates},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """
+        Upsert recruiters from an uploaded CSV or JSONL file, merging rows
+        with the same normalized email, and report per-row errors
+        """
+        serializer = RecruiterImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        report = import_recruiters(
+            request.user,
+            serializer.validated_data['file'],
+            file_format=serializer.validated_data.get('format'),
+            batch_size=serializer.validated_data.get('batch_size')
+        )
+        return Response(report, status=status.HTTP_201_CREATED)
@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_delete, post_save
 
 
 class SubscriptionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.subscriptions'
+
+    def ready(self):
+        from .checks import check_quota_cache
+        from .models import Plan, Subscription
+        from .signals import invalidate_plan_quotas, invalidate_subscription_quotas
+
+        post_save.connect(invalidate_plan_quotas, sender=Plan, dispatch_uid='subscriptions_plan_save')
+        post_delete.connect(invalidate_plan_quotas, sender=Plan, dispatch_uid='subscriptions_plan_delete')
+        post_save.connect(invalidate_subscription_quotas, sender=Subscription,
+                          dispatch_uid='subscriptions_subscription_save')
+        post_delete.connect(invalidate_subscription_quotas, sender=Subscription,
+                            dispatch_uid='subscriptions_subscription_delete')
+        checks.register(check_quota_cache, checks.Tags.caches, deploy=True)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error
+
+from core.checks import is_shared_cache
+
+
+def check_quota_cache(app_configs, **kwargs):
+    """
+    Quota counters only add up when every worker increments the same ones.
+    """
+    alias = settings.SUBSCRIPTION_QUOTA_CACHE
+    if settings.DEBUG or is_shared_cache(alias):
+        return []
+    return [
+        Error(
+            f'SUBSCRIPTION_QUOTA_CACHE ({alias!r}) is not shared between workers.',
+            hint=(
+                'Use a Redis or Memcached cache. With a per-process cache each worker '
+                'counts usage on its own and overwrites the others when flushing it.'
+            ),
+            id='subscriptions.E001',
+        )
+    ]
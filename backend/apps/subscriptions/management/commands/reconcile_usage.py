@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.subscriptions.quotas import reconcile
+from core.utils import chunked
+
+
+class Command(BaseCommand):
+    help = 'Copy the shared quota counters of the current month to the usage records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        written = 0
+        for batch in chunked(user_ids.iterator(chunk_size=options['batch_size']), options['batch_size']):
+            written += reconcile(batch)
+        self.stdout.write(f"Wrote {written} usage records")
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+# Users without a subscription fall back to this plan, so generation and
+# sending are capped from the start.
+DEFAULT_PLAN = {
+    'name': 'Free',
+    'slug': 'free',
+    'monthly_generation_quota': 100,
+    'monthly_send_quota': 500,
+    'is_default': True,
+}
+
+
+def create_default_plan(apps, schema_editor):
+    Plan = apps.get_model('subscriptions', 'Plan')
+    Plan.objects.get_or_create(slug=DEFAULT_PLAN['slug'], defaults=DEFAULT_PLAN)
+
+
+def delete_default_plan(apps, schema_editor):
+    Plan = apps.get_model('subscriptions', 'Plan')
+    Plan.objects.filter(slug=DEFAULT_PLAN['slug'], subscriptions__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_plan, delete_default_plan),
+    ]
@@ -1,3 +1,66 @@
 from django.db import models
+from django.contrib.auth import get_user_model
 
-# Create your models here.
+User = get_user_model()
+
+class Plan(models.Model):
+    """
+    Monthly quotas of a subscription plan. A ``None`` quota is unlimited.
+    Users without an active subscription are on the ``is_default`` plan.
+    """
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=50, unique=True)
+    monthly_generation_quota = models.PositiveIntegerField(null=True, blank=True)
+    monthly_send_quota = models.PositiveIntegerField(null=True, blank=True)
+    is_default = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    def quotas(self):
+        return {
+            'generation': self.monthly_generation_quota,
+            'send': self.monthly_send_quota,
+        }
+
+class Subscription(models.Model):
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('canceled', 'Canceled')
+    ]
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='subscription')
+    plan = models.ForeignKey(Plan, on_delete=models.PROTECT, related_name='subscriptions')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    started_at = models.DateTimeField(auto_now_add=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.plan_id} ({self.status})"
+
+class UsageRecord(models.Model):
+    """
+    Durable usage counter of one user, metric and monthly period (the first
+    day of the month). Written in batches by the quota usage buffer; the
+    live counters are kept in the shared cache.
+    """
+    METRIC_CHOICES = [
+        ('generation', 'Generation'),
+        ('send', 'Send')
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='usage_records')
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    period = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'metric', 'period'], name='usage_user_metric_period_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.metric} {self.period}: {self.count}"
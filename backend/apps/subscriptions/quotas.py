@@ -0,0 +1,267 @@
+"""
+Monthly plan quotas.
+
+Usage is counted per user, metric (``generation``/``send``) and calendar
+month in the shared Django cache (``SUBSCRIPTION_QUOTA_CACHE``, Redis in
+production) with atomic ``incr``, so every gunicorn worker sees the same
+counters and a check costs one cache round trip. A counter missing from
+the cache (first use in a month, eviction, a cache restart) is seeded from
+``UsageRecord`` with ``add`` so concurrent workers agree on a single seed.
+
+Plan quotas are kept in a short-lived per-process cache. Changed counters
+are marked in a ``BufferedWriter`` that copies their values to
+``UsageRecord`` every ``SUBSCRIPTION_USAGE_FLUSH_INTERVAL`` seconds with one
+upsert per batch. The copies are absolute, so a late or repeated flush is
+harmless; ``reconcile_usage`` does the same for every user to catch
+counters whose worker died before flushing.
+"""
+import calendar
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.utils import timezone
+from rest_framework.exceptions import Throttled
+
+from core.buffers import BufferedWriter
+
+from .models import Plan, Subscription, UsageRecord
+
+COUNTER_KEY = 'quota:{}:{}:{:%Y%m}'
+METRICS = ('generation', 'send')
+
+_local_lock = threading.Lock()
+_local_quotas = {}
+_buffer_lock = threading.Lock()
+_buffer = None
+
+
+class QuotaExceeded(Throttled):
+    default_detail = 'Monthly quota exceeded.'
+    default_code = 'quota_exceeded'
+
+    def __init__(self, metric, limit, wait=None):
+        self.metric = metric
+        self.limit = limit
+        super().__init__(
+            wait=wait,
+            detail=f'Monthly {metric} quota of {limit} exceeded.'
+        )
+
+
+def get_quota_cache():
+    return caches[settings.SUBSCRIPTION_QUOTA_CACHE]
+
+
+def current_period(now=None):
+    now = now or timezone.now()
+    return date(now.year, now.month, 1)
+
+
+def period_end(period):
+    days = calendar.monthrange(period.year, period.month)[1]
+    end = datetime(period.year, period.month, 1) + timedelta(days=days)
+    return timezone.make_aware(end, dt_timezone.utc)
+
+
+def seconds_until_reset(period):
+    return max(1, int((period_end(period) - timezone.now()).total_seconds()))
+
+
+def counter_key(user_id, metric, period):
+    return COUNTER_KEY.format(metric, user_id, period)
+
+
+def load_quotas(user_id):
+    """
+    Quotas of the user's active subscription, of the default plan when
+    there is none, and unlimited when no default plan is configured.
+    """
+    subscription = Subscription.objects.select_related('plan').filter(
+        user_id=user_id,
+        status='active'
+    ).first()
+    if subscription is not None and (subscription.ends_at is None or subscription.ends_at > timezone.now()):
+        return subscription.plan.quotas()
+    plan = Plan.objects.filter(is_default=True).order_by('pk').first()
+    if plan is not None:
+        return plan.quotas()
+    return dict.fromkeys(METRICS)
+
+
+def get_quotas(user_id):
+    with _local_lock:
+        entry = _local_quotas.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+    quotas = load_quotas(user_id)
+    with _local_lock:
+        if len(_local_quotas) >= settings.SUBSCRIPTION_QUOTA_LOCAL_CACHE_SIZE:
+            _local_quotas.clear()
+        _local_quotas[user_id] = (time.monotonic() + settings.SUBSCRIPTION_QUOTA_LOCAL_CACHE_TTL, quotas)
+    return quotas
+
+
+def invalidate_quotas(user_id=None):
+    with _local_lock:
+        if user_id is None:
+            _local_quotas.clear()
+        else:
+            _local_quotas.pop(user_id, None)
+
+
+def stored_usage(user_id, metric, period):
+    return UsageRecord.objects.filter(
+        user_id=user_id,
+        metric=metric,
+        period=period
+    ).values_list('count', flat=True).first() or 0
+
+
+def _increment(user_id, metric, period, amount):
+    quota_cache = get_quota_cache()
+    key = counter_key(user_id, metric, period)
+    try:
+        return quota_cache.incr(key, amount)
+    except ValueError:
+        # Counters expire a day after their month so a seed is only taken
+        # once per user and month unless the cache loses the key.
+        timeout = seconds_until_reset(period) + 86400
+        quota_cache.add(key, stored_usage(user_id, metric, period), timeout=timeout)
+        return quota_cache.incr(key, amount)
+
+
+def consume(user_id, metric, amount=1, period=None):
+    """
+    Count ``amount`` units of ``metric`` against the user's quota for
+    ``period`` (the current month by default). Raises ``QuotaExceeded`` (a
+    429) without counting anything when the quota would be exceeded; returns
+    the usage so far otherwise.
+    """
+    if amount <= 0:
+        return 0
+    period = period or current_period()
+    limit = get_quotas(user_id).get(metric)
+    used = _increment(user_id, metric, period, amount)
+    if limit is not None and used > limit:
+        get_quota_cache().decr(counter_key(user_id, metric, period), amount)
+        raise QuotaExceeded(metric, limit, wait=seconds_until_reset(period))
+    get_usage_buffer().add((user_id, metric, period))
+    return used
+
+
+def release(user_id, metric, amount=1, period=None):
+    """
+    Give back units consumed for work that did not happen (a failed
+    generation or delivery). Pass the ``period`` they were consumed in, so
+    work that fails after a month boundary is refunded to the right month.
+    """
+    if amount <= 0:
+        return
+    period = period or current_period()
+    try:
+        get_quota_cache().decr(counter_key(user_id, metric, period), amount)
+    except ValueError:
+        return
+    get_usage_buffer().add((user_id, metric, period))
+
+
+def usage(user_id, period=None):
+    """
+    ``{metric: {'used': n, 'limit': n}}`` for the user's period (the
+    current month by default), read from the shared counters.
+    """
+    period = period or current_period()
+    quotas = get_quotas(user_id)
+    keys = {counter_key(user_id, metric, period): metric for metric in METRICS}
+    counters = get_quota_cache().get_many(list(keys))
+    result = {}
+    for key, metric in keys.items():
+        used = counters.get(key)
+        if used is None:
+            used = stored_usage(user_id, metric, period)
+        result[metric] = {'used': used, 'limit': quotas.get(metric)}
+    return result
+
+
+def store_counters(counters):
+    """
+    Upsert ``{(user_id, metric, period): count}`` into ``UsageRecord``.
+    """
+    UsageRecord.objects.bulk_create(
+        [
+            UsageRecord(user_id=user_id, metric=metric, period=period, count=max(count, 0))
+            for (user_id, metric, period), count in counters.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['user', 'metric', 'period'],
+        update_fields=['count', 'updated_at']
+    )
+
+
+def read_counters(usage_keys):
+    """
+    Current cache values of ``(user_id, metric, period)`` counters; counters
+    missing from the cache are left out.
+    """
+    keys = {counter_key(*usage_key): usage_key for usage_key in usage_keys}
+    values = get_quota_cache().get_many(list(keys))
+    return {keys[key]: value for key, value in values.items()}
+
+
+def flush_usage(items):
+    close_old_connections()
+    counters = read_counters(set(items))
+    if counters:
+        store_counters(counters)
+
+
+def get_usage_buffer():
+    global _buffer
+    if _buffer is not None:
+        return _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = BufferedWriter(
+                flush_usage,
+                flush_interval=settings.SUBSCRIPTION_USAGE_FLUSH_INTERVAL,
+                flush_size=1000,
+                max_size=settings.SUBSCRIPTION_USAGE_MAX_BUFFER,
+                name='usage'
+            )
+    return _buffer
+
+
+def reconcile(user_ids, period=None):
+    """
+    Copy the shared counters of ``user_ids`` for ``period`` (the current
+    month by default) to ``UsageRecord`` where they differ. Returns the
+    number of records written.
+    """
+    period = period or current_period()
+    user_ids = list(user_ids)
+    counters = read_counters(
+        (user_id, metric, period) for user_id in user_ids for metric in METRICS
+    )
+    if not counters:
+        return 0
+
+    stored = {
+        (user_id, metric, period): count
+        for user_id, metric, count in UsageRecord.objects.filter(
+            user_id__in=user_ids,
+            period=period
+        ).values_list('user_id', 'metric', 'count')
+    }
+    changed = {
+        usage_key: count
+        for usage_key, count in counters.items()
+        if stored.get(usage_key) != count
+    }
+    if changed:
+        store_counters(changed)
+    return len(changed)
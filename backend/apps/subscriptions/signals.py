@@ -0,0 +1,9 @@
+from .quotas import invalidate_quotas
+
+
+def invalidate_plan_quotas(sender, instance, **kwargs):
+    invalidate_quotas()
+
+
+def invalidate_subscription_quotas(sender, instance, **kwargs):
+    invalidate_quotas(instance.user_id)
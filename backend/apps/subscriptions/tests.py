@@ -1,3 +1,86 @@
-from django.test import TestCase
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from apps.authentication.models import User
+
+from . import quotas
+from .checks import check_quota_cache
+from .models import Plan, Subscription, UsageRecord
+from .quotas import QuotaExceeded, consume, current_period, invalidate_quotas, release, usage
+
+
+class QuotaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner', email='owner@example.com')
+        cls.plan = Plan.objects.create(name='Small', slug='small', monthly_generation_quota=3,
+                                       monthly_send_quota=None)
+        Subscription.objects.create(user=cls.user, plan=cls.plan)
+
+    def setUp(self):
+        caches[settings.SUBSCRIPTION_QUOTA_CACHE].clear()
+        invalidate_quotas()
+
+    def test_consume_counts_usage(self):
+        self.assertEqual(consume(self.user.pk, 'generation', 2), 2)
+        self.assertEqual(usage(self.user.pk)['generation'], {'used': 2, 'limit': 3})
+
+    def test_exceeding_the_quota_counts_nothing(self):
+        consume(self.user.pk, 'generation', 2)
+        with self.assertRaises(QuotaExceeded) as raised:
+            consume(self.user.pk, 'generation', 2)
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertGreater(raised.exception.wait, 0)
+        self.assertEqual(usage(self.user.pk)['generation']['used'], 2)
+
+    def test_unlimited_metric(self):
+        self.assertEqual(consume(self.user.pk, 'send', 10000), 10000)
+
+    def test_release(self):
+        consume(self.user.pk, 'generation', 3)
+        release(self.user.pk, 'generation', 2)
+        self.assertEqual(usage(self.user.pk)['generation']['used'], 1)
+
+    def test_release_refunds_the_period_it_was_consumed_in(self):
+        january, february = date(2030, 1, 1), date(2030, 2, 1)
+        consume(self.user.pk, 'generation', 2, period=january)
+        with mock.patch.object(quotas, 'current_period', return_value=february):
+            consume(self.user.pk, 'generation', 1)
+            release(self.user.pk, 'generation', 2, period=january)
+        self.assertEqual(usage(self.user.pk, january)['generation']['used'], 0)
+        self.assertEqual(usage(self.user.pk, february)['generation']['used'], 1)
+
+    def test_counter_is_seeded_from_stored_usage(self):
+        UsageRecord.objects.create(user=self.user, metric='generation', period=current_period(), count=3)
+        with self.assertRaises(QuotaExceeded):
+            consume(self.user.pk, 'generation')
+
+    def test_flush_stores_counters(self):
+        consume(self.user.pk, 'generation', 2)
+        quotas.get_usage_buffer().flush()
+        self.assertEqual(
+            UsageRecord.objects.get(user=self.user, metric='generation', period=current_period()).count, 2
+        )
+
+    def test_default_plan_applies_without_subscription(self):
+        user = User.objects.create(username='free', email='free@example.com')
+        self.assertEqual(usage(user.pk)['generation']['limit'], 100)
+
+
+class QuotaCacheCheckTests(TestCase):
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_cache_fails_outside_debug(self):
+        errors = check_quota_cache(None)
+        self.assertEqual([error.id for error in errors], ['subscriptions.E001'])
+
+    @override_settings(DEBUG=True, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_allowed_in_debug(self):
+        self.assertEqual(check_quota_cache(None), [])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}})
+    def test_shared_cache(self):
+        self.assertEqual(check_quota_cache(None), [])
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import current_usage
+
+app_name = 'subscriptions'
+
+urlpatterns = [
+    path('usage/', current_usage, name='current_usage'),
+]
@@ -1,3 +1,16 @@
-from django.shortcuts import render
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
 
-# Create your views here.
+from .quotas import current_period, usage
+
+
+@api_view(['GET'])
+def current_usage(request):
+    """
+    Usage and limits of the current month for the authenticated user
+    """
+    period = current_period()
+    return Response({
+        'period': period,
+        'usage': usage(request.user.pk, period)
+    })
@@ -2,6 +2,9 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Streaming endpoints (e.g. the SSE ``generate_email/stream/`` view) should be
+served through this entry point, e.g. ``gunicorn -k uvicorn.workers.UvicornWorker``,
+so long generations do not hold a sync worker.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
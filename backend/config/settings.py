@@ -1,4 +1,4 @@
-from decouple import config
+from decouple import Csv, config
 from pathlib import Path
 import os
 
@@ -27,15 +27,18 @@ INSTALLED_APPS = [
     'apps.analytics',
     'apps.recruiter_database',
     'apps.subscriptions',
+    'core',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,14 +63,95 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Stops the in-memory write buffers before the test databases are dropped.
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE selects PostgreSQL ('postgresql') or SQLite ('sqlite3', the
+# default). Connections are kept open for DB_CONN_MAX_AGE seconds and
+# checked before reuse; set DB_CONN_MAX_AGE=0 when serving through ASGI.
+# Behind a transaction-pooling PgBouncer, set
+# DB_DISABLE_SERVER_SIDE_CURSORS so large .iterator() exports fall back
+# to client-side cursors.
+
+DB_ENGINE = config('DB_ENGINE', default='sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='recruitment'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', cast=int, default=60),
+            'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', cast=bool, default=True),
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_DISABLE_SERVER_SIDE_CURSORS', cast=bool, default=False),
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', cast=int, default=5),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', cast=int, default=60),
+            'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', cast=bool, default=True),
+            'OPTIONS': {
+                # Seconds a write waits for the database lock.
+                'timeout': config('SQLITE_TIMEOUT', cast=int, default=20),
+            },
+        }
+    }
+
+# Read replicas, as comma-separated hosts (PostgreSQL) or database files
+# (SQLite) that otherwise share the primary's settings. List and detail
+# reads of the email and analytics endpoints are served from them (see
+# core.routers); users stay on the primary for REPLICA_PIN_SECONDS after
+# writing, which needs a shared CACHE_BACKEND. Migrations only run on the
+# primary; SQLite replicas are copies of its file (copy it after migrating).
+DATABASE_REPLICAS = []
+for index, replica in enumerate(config('DB_REPLICAS', cast=Csv(), default='')):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST' if DB_ENGINE == 'postgresql' else 'NAME': replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', cast=int, default=10)
+
+# Applied to every new SQLite connection (see core.db.configure_sqlite).
+# WAL lets readers run alongside the single writer, which is what several
+# gunicorn workers on one file need.
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', cast=int, default=20000),
+    'mmap_size': config('SQLITE_MMAP_SIZE', cast=int, default=268435456),
+    'cache_size': config('SQLITE_CACHE_SIZE', cast=int, default=-20000),
+    'temp_store': 'MEMORY',
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The local-memory default is per process; point CACHE_BACKEND at
+# django.core.cache.backends.redis.RedisCache (CACHE_LOCATION=redis://...)
+# when running several workers so quota counters are shared.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+        'TIMEOUT': config('CACHE_TIMEOUT', cast=int, default=300),
     }
 }
 
@@ -136,6 +220,16 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Refresh token revocation; see apps.authentication.revocation
+TOKEN_REVOCATION_BLOOM_CAPACITY = config('TOKEN_REVOCATION_BLOOM_CAPACITY', cast=int, default=1000000)
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = config('TOKEN_REVOCATION_BLOOM_ERROR_RATE', cast=float, default=0.001)
+TOKEN_REVOCATION_SYNC_INTERVAL = config('TOKEN_REVOCATION_SYNC_INTERVAL', cast=int, default=10)
+
+# Authenticated user cache (seconds); see apps.authentication.authentication
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', cast=int, default=300)
+AUTH_USER_LOCAL_CACHE_TTL = config('AUTH_USER_LOCAL_CACHE_TTL', cast=int, default=5)
+AUTH_USER_LOCAL_CACHE_SIZE = config('AUTH_USER_LOCAL_CACHE_SIZE', cast=int, default=10000)
+
 # Google OAuth2 settings
 GOOGLE_CLIENT_ID = config('GOOGLE_CLIENT_ID', default='')
 GOOGLE_CLIENT_SECRET = config('GOOGLE_CLIENT_SECRET', default='')
@@ -147,14 +241,125 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.CreatedAtCursorPagination',
+    'DEFAULT_FILTER_BACKENDS': (
+        'core.filters.QueryParamFilterBackend',
+    ),
 }
 
+# Email generation settings
+EMAIL_GENERATION_CONCURRENCY = config('EMAIL_GENERATION_CONCURRENCY', cast=int, default=8)
+EMAIL_GENERATION_MAX_JOBS = config('EMAIL_GENERATION_MAX_JOBS', cast=int, default=2)
+EMAIL_GENERATION_BATCH_SIZE = config('EMAIL_GENERATION_BATCH_SIZE', cast=int, default=100)
+EMAIL_GENERATION_MAX_RECIPIENTS = config('EMAIL_GENERATION_MAX_RECIPIENTS', cast=int, default=5000)
+# Queued or running jobs without progress for this long are failed by
+# recover_generation_jobs (and every dispatch pass) and their quota refunded.
+EMAIL_GENERATION_JOB_TIMEOUT = config('EMAIL_GENERATION_JOB_TIMEOUT', cast=int, default=1800)
+EMAIL_GENERATION_CACHE = {
+    'BACKEND': config('EMAIL_GENERATION_CACHE_BACKEND',
+                      default='apps.email_management.cache.LRUGenerationCache'),
+    'TTL': config('EMAIL_GENERATION_CACHE_TTL', cast=int, default=86400),
+    'MAX_ENTRIES': config('EMAIL_GENERATION_CACHE_MAX_ENTRIES', cast=int, default=10000),
+    'OPTIONS': {},
+}
+# LLM provider used for generation
+LLM_PROVIDER = {
+    'BACKEND': config('LLM_PROVIDER_BACKEND', default='apps.email_management.llm.OpenAIProvider'),
+    'OPTIONS': {
+        'api_key': config('OPENAI_API_KEY', default=''),
+        'base_url': config('LLM_BASE_URL', default='https://api.openai.com/v1'),
+        'pool_size': config('LLM_POOL_SIZE', cast=int, default=16),
+        'connect_timeout': config('LLM_CONNECT_TIMEOUT', cast=float, default=5.0),
+        'read_timeout': config('LLM_READ_TIMEOUT', cast=float, default=60.0),
+    },
+}
+LLM_MODEL = config('LLM_MODEL', default='gpt-3.5-turbo')
+LLM_MAX_TOKENS = config('LLM_MAX_TOKENS', cast=int, default=500)
+LLM_TEMPERATURE = config('LLM_TEMPERATURE', cast=float, default=0.7)
+LLM_PROMPT_TOKEN_BUDGET = config('LLM_PROMPT_TOKEN_BUDGET', cast=int, default=2000)
+LLM_MAX_CONCURRENCY = config('LLM_MAX_CONCURRENCY', cast=int, default=EMAIL_GENERATION_CONCURRENCY)
+LLM_MAX_RETRIES = config('LLM_MAX_RETRIES', cast=int, default=4)
+LLM_BACKOFF_BASE = config('LLM_BACKOFF_BASE', cast=float, default=0.5)
+LLM_BACKOFF_MAX = config('LLM_BACKOFF_MAX', cast=float, default=30.0)
+
+EMAIL_IMPORT_BATCH_SIZE = config('EMAIL_IMPORT_BATCH_SIZE', cast=int, default=1000)
+EMAIL_IMPORT_MAX_BATCH_SIZE = config('EMAIL_IMPORT_MAX_BATCH_SIZE', cast=int, default=5000)
+EMAIL_IMPORT_MAX_ERRORS = config('EMAIL_IMPORT_MAX_ERRORS', cast=int, default=1000)
+
+# Outgoing email
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', cast=int, default=25)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool, default=False)
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', cast=int, default=30)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='webmaster@localhost')
+EMAIL_CONNECTION_POOL_SIZE = config('EMAIL_CONNECTION_POOL_SIZE', cast=int, default=4)
+EMAIL_CONNECTION_MAX_MESSAGES = config('EMAIL_CONNECTION_MAX_MESSAGES', cast=int, default=500)
+EMAIL_DOMAIN_RATE_LIMIT = config('EMAIL_DOMAIN_RATE_LIMIT', cast=float, default=5.0)
+EMAIL_DOMAIN_BURST = config('EMAIL_DOMAIN_BURST', cast=int, default=20)
+
+# Scheduled campaign dispatcher
+EMAIL_DISPATCH_WORKERS = config('EMAIL_DISPATCH_WORKERS', cast=int, default=4)
+EMAIL_DISPATCH_BATCH_SIZE = config('EMAIL_DISPATCH_BATCH_SIZE', cast=int, default=100)
+EMAIL_DISPATCH_CAMPAIGN_LIMIT = config('EMAIL_DISPATCH_CAMPAIGN_LIMIT', cast=int, default=20)
+EMAIL_DISPATCH_CLAIM_TIMEOUT = config('EMAIL_DISPATCH_CLAIM_TIMEOUT', cast=int, default=900)
+EMAIL_DISPATCH_INTERVAL = config('EMAIL_DISPATCH_INTERVAL', cast=int, default=30)
+
+# Open/click tracking (disabled unless a public base URL is set)
+EMAIL_TRACKING_BASE_URL = config('EMAIL_TRACKING_BASE_URL', default='')
+EMAIL_TRACKING_FLUSH_INTERVAL = config('EMAIL_TRACKING_FLUSH_INTERVAL', cast=float, default=2.0)
+EMAIL_TRACKING_FLUSH_SIZE = config('EMAIL_TRACKING_FLUSH_SIZE', cast=int, default=1000)
+EMAIL_TRACKING_MAX_BUFFER = config('EMAIL_TRACKING_MAX_BUFFER', cast=int, default=100000)
+
+# Draft status rollups are written from a per-process buffer, outside the
+# transactions that change drafts
+ANALYTICS_ROLLUP_FLUSH_INTERVAL = config('ANALYTICS_ROLLUP_FLUSH_INTERVAL', cast=float, default=2.0)
+ANALYTICS_ROLLUP_MAX_BUFFER = config('ANALYTICS_ROLLUP_MAX_BUFFER', cast=int, default=100000)
+
+# Recruiter database
+RECRUITER_AUDIENCE_BATCH_SIZE = config('RECRUITER_AUDIENCE_BATCH_SIZE', cast=int, default=1000)
+RECRUITER_IMPORT_BATCH_SIZE = config('RECRUITER_IMPORT_BATCH_SIZE', cast=int, default=1000)
+RECRUITER_IMPORT_MAX_BATCH_SIZE = config('RECRUITER_IMPORT_MAX_BATCH_SIZE', cast=int, default=5000)
+RECRUITER_IMPORT_MAX_ERRORS = config('RECRUITER_IMPORT_MAX_ERRORS', cast=int, default=1000)
+
+# Subscription quotas. Counters live in SUBSCRIPTION_QUOTA_CACHE, which
+# has to be shared between workers (Redis/Memcached) in production;
+# ``check --deploy`` fails on a per-process cache unless DEBUG is on.
+SUBSCRIPTION_QUOTA_CACHE = config('SUBSCRIPTION_QUOTA_CACHE', default='default')
+SUBSCRIPTION_QUOTA_LOCAL_CACHE_TTL = config('SUBSCRIPTION_QUOTA_LOCAL_CACHE_TTL', cast=int, default=60)
+SUBSCRIPTION_QUOTA_LOCAL_CACHE_SIZE = config('SUBSCRIPTION_QUOTA_LOCAL_CACHE_SIZE', cast=int, default=10000)
+SUBSCRIPTION_USAGE_FLUSH_INTERVAL = config('SUBSCRIPTION_USAGE_FLUSH_INTERVAL', cast=float, default=5.0)
+SUBSCRIPTION_USAGE_MAX_BUFFER = config('SUBSCRIPTION_USAGE_MAX_BUFFER', cast=int, default=100000)
+
+# Performance Instrumentation
+# Request instrumentation (core.middleware.PerformanceMiddleware). Metrics
+# are served at /metrics to DEBUG sessions or with the METRICS_TOKEN bearer
+# token. Profiling is off unless a sample rate is set; sampled requests
+# slower than PERFORMANCE_SLOW_REQUEST_SECONDS are dumped as .prof files.
+PERFORMANCE_METRICS_ENABLED = config('PERFORMANCE_METRICS_ENABLED', cast=bool, default=True)
+PERFORMANCE_SLOW_REQUEST_SECONDS = config('PERFORMANCE_SLOW_REQUEST_SECONDS', cast=float, default=1.0)
+PERFORMANCE_PROFILE_SAMPLE_RATE = config('PERFORMANCE_PROFILE_SAMPLE_RATE', cast=float, default=0.0)
+PERFORMANCE_PROFILE_DIR = config('PERFORMANCE_PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # Logging Configuration
+# Logging goes through a queue to a background writer (core.logging) unless
+# LOG_ASYNC is off. LOG_LEVEL applies to the project's own loggers and is
+# DEBUG only in development; payloads logged with core.logging.Payload are
+# redacted and cut to LOG_PAYLOAD_MAX_CHARS.
+LOG_LEVEL = config('LOG_LEVEL', default='DEBUG' if DEBUG else 'INFO')
+DJANGO_LOG_LEVEL = config('DJANGO_LOG_LEVEL', default='INFO')
+LOG_ASYNC = config('LOG_ASYNC', cast=bool, default=True)
+LOG_QUEUE_SIZE = config('LOG_QUEUE_SIZE', cast=int, default=10000)
+LOG_PAYLOAD_MAX_CHARS = config('LOG_PAYLOAD_MAX_CHARS', cast=int, default=1000)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -170,15 +375,27 @@ LOGGING = {
             'formatter': 'verbose',
         },
     },
+    'root': {
+        'handlers': ['console'],
+        'level': 'WARNING',
+    },
     'loggers': {
         'django': {
-            'handlers': ['console'],
-            'level': 'INFO',
+            'level': DJANGO_LOG_LEVEL,
+        },
+        'apps': {
+            'level': LOG_LEVEL,
         },
-        'apps.email_management': {
-            'handlers': ['console'],
-            'level': 'DEBUG',
-            'propagate': True,
+        'core': {
+            'level': LOG_LEVEL,
         },
     },
-}
\ No newline at end of file
+}
+
+if LOG_ASYNC:
+    LOGGING['handlers']['queue'] = {
+        'class': 'core.logging.QueueLogHandler',
+        'formatter': 'verbose',
+        'max_size': LOG_QUEUE_SIZE,
+    }
+    LOGGING['root']['handlers'] = ['queue']
\ No newline at end of file
@@ -18,8 +18,14 @@ from django.contrib import admin
 from django.urls import include, path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from core.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('apps.authentication.urls')),
     path('api/email-management/', include('apps.email_management.urls')),
+    path('api/recruiter-database/', include('apps.recruiter_database.urls')),
+    path('api/analytics/', include('apps.analytics.urls')),
+    path('api/subscriptions/', include('apps.subscriptions.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from .checks import check_replica_pin_cache
+        from .db import configure_sqlite
+        from .logging import collect
+        from .metrics import registry
+
+        connection_created.connect(configure_sqlite, dispatch_uid='core_configure_sqlite')
+        registry.register_collector(collect)
+        checks.register(check_replica_pin_cache, checks.Tags.caches, checks.Tags.database, deploy=True)
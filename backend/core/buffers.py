@@ -0,0 +1,120 @@
+import atexit
+import logging
+import os
+import threading
+import weakref
+
+from core.utils import chunked
+
+logger = logging.getLogger(__name__)
+
+_writers = weakref.WeakSet()
+
+
+class BufferedWriter:
+    """
+    Collects items in memory and hands them to ``flush_func`` in batches of
+    up to ``flush_size`` from a background thread, every ``flush_interval``
+    seconds or as soon as a batch is full. ``add`` only appends to a list,
+    so callers never wait on the database. Past ``max_size`` pending items
+    new ones are dropped (and counted) rather than letting memory grow.
+    """
+
+    def __init__(self, flush_func, flush_interval=2.0, flush_size=1000, max_size=100000, name='buffer'):
+        self.flush_func = flush_func
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_size = max_size
+        self.name = name
+        self.dropped = 0
+        self._items = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = None
+        self._pid = None
+        _writers.add(self)
+
+    def add(self, item):
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                self.dropped += 1
+                return False
+            self._items.append(item)
+            full = len(self._items) >= self.flush_size
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+        return True
+
+    def __len__(self):
+        return len(self._items)
+
+    def flush(self):
+        """
+        Write out everything buffered so far. Returns the number of items
+        handed to ``flush_func``.
+        """
+        with self._flush_lock:
+            with self._lock:
+                items, self._items = self._items, []
+            for batch in chunked(items, self.flush_size):
+                try:
+                    self.flush_func(batch)
+                except Exception:
+                    logger.exception("Dropping %s items from %s after a failed flush", len(batch), self.name)
+            return len(items)
+
+    def close(self, flush=True):
+        """
+        Stop the background thread and write out what is left (or drop it,
+        with ``flush=False``) instead of leaving it to the exit handler,
+        which may run after the database is gone. Returns the number of
+        items written or dropped. A later ``add`` starts over.
+        """
+        with self._lock:
+            thread, stopping = self._thread, self._stopping
+            self._thread = self._stopping = None
+        if stopping is not None:
+            stopping.set()
+            self._wake.set()
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join()
+        if self._pid is not None:
+            atexit.unregister(self.flush)
+            self._pid = None
+        if flush:
+            return self.flush()
+        with self._lock:
+            items, self._items = self._items, []
+        return len(items)
+
+    def _ensure_thread(self):
+        # Checked on every add so that a forked worker starts its own thread.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is None:
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._stopping,), name=f'{self.name}-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, stopping):
+        while not stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not stopping.is_set():
+                self.flush()
+
+
+def close_all(flush=True):
+    """Close every ``BufferedWriter`` of this process."""
+    for writer in list(_writers):
+        writer.close(flush=flush)
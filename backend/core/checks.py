@@ -0,0 +1,37 @@
+"""
+System checks, and helpers for those of the apps.
+"""
+from django.conf import settings
+from django.core.checks import Error
+
+# Backends that keep their data per process (or, for files, update counters
+# without atomic increments), so workers cannot share state through them.
+NON_SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+
+
+def is_shared_cache(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') not in NON_SHARED_CACHE_BACKENDS
+
+
+def check_replica_pin_cache(app_configs, **kwargs):
+    """
+    Pins to the primary (see ``core.routers``) only hold across workers
+    when they are kept in a cache every worker reads.
+    """
+    if not settings.DATABASE_REPLICAS or settings.DEBUG or is_shared_cache('default'):
+        return []
+    return [
+        Error(
+            'DB_REPLICAS is set but the default cache is not shared between workers.',
+            hint=(
+                'Use a Redis or Memcached cache. With a per-process cache a user who '
+                'just wrote is only pinned to the primary in the worker that served '
+                'the write, and may read stale data from a replica in the others.'
+            ),
+            id='core.E001',
+        )
+    ]
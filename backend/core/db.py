@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.db.migrations.operations import AddConstraint, AddIndex
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver applying ``SQLITE_PRAGMAS`` to new
+    SQLite connections.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class AddIndexConcurrently(AddIndex):
+    """
+    ``AddIndex`` that builds the index with ``CREATE INDEX CONCURRENTLY`` on
+    PostgreSQL, so large tables stay writable while it runs. Other backends
+    get a regular ``CREATE INDEX``. Migrations using it must set
+    ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+    def describe(self):
+        return 'Concurrently create index %s on field(s) %s of model %s' % (
+            self.index.name,
+            ', '.join(self.index.fields),
+            self.model_name,
+        )
+
+
+class AddUniqueConstraintConcurrently(AddConstraint):
+    """
+    ``AddConstraint`` for a ``UniqueConstraint`` that, on PostgreSQL, builds
+    the unique index with ``CREATE UNIQUE INDEX CONCURRENTLY`` and then
+    attaches it with ``ADD CONSTRAINT ... UNIQUE USING INDEX``, so writes are
+    only blocked for the final, instant step. Partial (``condition``)
+    constraints are plain unique indexes and stop after the first step.
+    Other backends get a regular ``AddConstraint``. Migrations using it must
+    set ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        quote = schema_editor.quote_name
+        name = quote(self.constraint.name)
+        table = quote(model._meta.db_table)
+        columns = ', '.join(quote(model._meta.get_field(field).column) for field in self.constraint.fields)
+        condition = self.constraint._get_condition_sql(model, schema_editor)
+        schema_editor.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY {name} ON {table} ({columns})'
+            + (f' WHERE {condition}' if condition else ''),
+            params=None
+        )
+        if condition is None:
+            schema_editor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}', params=None)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql' or self.constraint.condition is None:
+            # Dropping the constraint drops the index it owns.
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute(
+                f'DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(self.constraint.name)}', params=None
+            )
+
+    def describe(self):
+        return 'Concurrently create constraint %s on model %s' % (self.constraint.name, self.model_name)
@@ -0,0 +1,64 @@
+from datetime import datetime, time
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+
+class QueryParamFilterBackend(BaseFilterBackend):
+    """
+    Server-side filtering driven by two optional view attributes:
+
+    ``filter_lookups`` maps a query parameter to an ORM lookup, e.g.
+    ``{'status': 'status', 'campaign': 'campaign_id'}``.
+
+    ``filter_date_field`` names the field that ``created_after`` and
+    ``created_before`` (ISO dates or datetimes) are applied to.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        filters = {}
+        errors = {}
+
+        for param, lookup in getattr(view, 'filter_lookups', {}).items():
+            value = params.get(param)
+            if value not in (None, ''):
+                filters[lookup] = value
+
+        date_field = getattr(view, 'filter_date_field', None)
+        if date_field:
+            for param, lookup in (('created_after', 'gte'), ('created_before', 'lt')):
+                value = params.get(param)
+                if not value:
+                    continue
+                parsed = self.parse_moment(value)
+                if parsed is None:
+                    errors[param] = 'Enter a valid ISO 8601 date or datetime.'
+                else:
+                    filters[f'{date_field}__{lookup}'] = parsed
+
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        try:
+            return queryset.filter(**filters)
+        except (ValueError, DjangoValidationError) as e:
+            raise serializers.ValidationError({'detail': str(e)})
+
+    @staticmethod
+    def parse_moment(value):
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                day = parse_date(value)
+                if day is None:
+                    return None
+                parsed = datetime.combine(day, time.min)
+        except ValueError:
+            return None
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
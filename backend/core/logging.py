@@ -0,0 +1,166 @@
+"""
+Logging helpers.
+
+``Payload`` wraps request data or validated data passed as a lazy logging
+argument: it is only rendered when a record is actually emitted, and then
+with credentials masked and the output capped at ``LOG_PAYLOAD_MAX_CHARS``.
+
+``QueueLogHandler`` hands records to a ``QueueListener`` thread so request
+threads never format tracebacks or write to the stream themselves. The
+queue is bounded (``LOG_QUEUE_SIZE``); when the writer falls behind, new
+records are dropped and counted instead of blocking requests.
+"""
+import logging
+import os
+import queue
+import threading
+from collections.abc import Mapping
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+REDACTED = '[redacted]'
+SENSITIVE_KEYS = ('password', 'secret', 'token', 'authorization', 'api_key', 'credential', 'cookie')
+MAX_DEPTH = 3
+MAX_ITEMS = 20
+MAX_STRING = 200
+
+_handlers_lock = threading.Lock()
+_handlers = []
+
+
+def is_sensitive(key):
+    key = str(key).lower()
+    return any(name in key for name in SENSITIVE_KEYS)
+
+
+def redact(value, depth=0):
+    """
+    A copy of ``value`` safe to log: sensitive keys are masked, strings
+    shortened and containers cut to ``MAX_ITEMS`` entries.
+    """
+    if isinstance(value, str):
+        if len(value) <= MAX_STRING:
+            return value
+        return f'{value[:MAX_STRING]}... ({len(value)} chars)'
+    if isinstance(value, Mapping):
+        if depth >= MAX_DEPTH:
+            return f'{{... {len(value)} keys}}'
+        items = list(value.items())
+        result = {
+            key: REDACTED if is_sensitive(key) else redact(item, depth + 1)
+            for key, item in items[:MAX_ITEMS]
+        }
+        if len(items) > MAX_ITEMS:
+            result['...'] = f'{len(items) - MAX_ITEMS} more keys'
+        return result
+    if isinstance(value, (list, tuple, set)):
+        if depth >= MAX_DEPTH:
+            return f'[... {len(value)} items]'
+        items = [redact(item, depth + 1) for item in list(value)[:MAX_ITEMS]]
+        if len(value) > MAX_ITEMS:
+            items.append(f'... {len(value) - MAX_ITEMS} more')
+        return items
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return redact(str(value), depth)
+
+
+class Payload:
+    """
+    Lazy, redacted and size-capped rendering of a payload for ``%s``
+    logging arguments.
+    """
+
+    def __init__(self, value, max_chars=None):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self):
+        max_chars = self.max_chars or settings.LOG_PAYLOAD_MAX_CHARS
+        text = repr(redact(self.value))
+        if len(text) > max_chars:
+            return f'{text[:max_chars]}... ({len(text)} chars)'
+        return text
+
+    __repr__ = __str__
+
+
+class BlockingSentinelListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room so stopping a listener with a full queue still
+        # flushes it.
+        self.queue.put(self._sentinel)
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Writes records to ``stream`` (stderr by default) from a listener
+    thread. The handler's formatter is used by the writer.
+    """
+
+    def __init__(self, stream=None, max_size=10000):
+        self.max_size = max_size
+        self.dropped = 0
+        self.closed = False
+        self.target = logging.StreamHandler(stream)
+        super().__init__(queue.Queue(max_size))
+        self._start()
+        with _handlers_lock:
+            _handlers.append(self)
+        if hasattr(os, 'register_at_fork'):
+            # Threads do not survive a fork (gunicorn --preload), so workers
+            # start their own listener.
+            os.register_at_fork(after_in_child=self._restart)
+
+    def _start(self):
+        self.listener = BlockingSentinelListener(self.queue, self.target)
+        self.listener.start()
+
+    def _restart(self):
+        if self.closed:
+            return
+        self.queue = queue.Queue(self.max_size)
+        self.dropped = 0
+        self._start()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Only interpolate the message here, so mutable arguments are
+        # captured as they are now; formatting the record and its traceback
+        # is left to the listener thread.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            with _handlers_lock:
+                _handlers.remove(self)
+            if self.listener._thread is not None:
+                self.listener.stop()
+            self.target.close()
+        super().close()
+
+
+def dropped_records():
+    with _handlers_lock:
+        return sum(handler.dropped for handler in _handlers)
+
+
+def collect():
+    return [
+        ('log_records_dropped_total', 'counter', 'Log records dropped because the log queue was full',
+         [({}, dropped_records())]),
+    ]
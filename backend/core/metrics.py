@@ -0,0 +1,223 @@
+"""
+Per-request performance metrics.
+
+``PerformanceMiddleware`` opens a ``RequestMetrics`` for every request and
+makes it current through a context variable. Database queries are timed
+with connection execute wrappers, and application code adds LLM calls
+(``record_llm``) and serializer time (``TimedSerializerMixin``) to it. At
+the end of the request the totals go into a ``Server-Timing`` header and
+into the process-wide ``registry``, which ``/metrics`` renders in the
+Prometheus text format. The registry is per process; scrape every worker
+(or run one per container) to see all of them.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from rest_framework.serializers import ListSerializer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.llm_calls = 0
+        self.llm_time = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.serializer_time = 0.0
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def server_timing(self):
+        entries = [
+            f'app;dur={self.duration * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+        ]
+        if self.llm_calls:
+            entries.append(
+                f'llm;dur={self.llm_time * 1000:.1f};'
+                f'desc="{self.llm_calls} calls, {self.prompt_tokens}+{self.completion_tokens} tokens"'
+            )
+        if self.serializer_time:
+            entries.append(f'ser;dur={self.serializer_time * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def current_metrics():
+    return _current.get()
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_llm(seconds, prompt_tokens=None, completion_tokens=None):
+    metrics = _current.get()
+    if metrics is None:
+        return
+    metrics.llm_calls += 1
+    metrics.llm_time += seconds
+    metrics.prompt_tokens += prompt_tokens or 0
+    metrics.completion_tokens += completion_tokens or 0
+
+
+def record_serializer(seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.serializer_time += seconds
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent representing top-level instances (including nested
+    serializers and the queries they trigger) to the current request.
+    """
+
+    def to_representation(self, instance):
+        parent = self.parent
+        if parent is not None and not (isinstance(parent, ListSerializer) and parent.parent is None):
+            return super().to_representation(instance)
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            record_serializer(time.perf_counter() - started)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._durations = {}
+        self._queries = {}
+        self._sums = defaultdict(int)
+        self._collectors = []
+
+    def register_collector(self, collector):
+        """
+        ``collector()`` returns ``[(name, type, help, [(labels, value)])]``
+        to be rendered alongside the request metrics.
+        """
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def observe(self, route, method, status_code, metrics):
+        key = (route, method)
+        with self._lock:
+            self._requests[(route, method, str(status_code))] += 1
+            if key not in self._durations:
+                self._durations[key] = Histogram(DURATION_BUCKETS)
+                self._queries[key] = Histogram(QUERY_BUCKETS)
+            self._durations[key].observe(metrics.duration)
+            self._queries[key].observe(metrics.db_queries)
+            self._sums[('db_query_seconds_total', key)] += metrics.db_time
+            self._sums[('llm_calls_total', key)] += metrics.llm_calls
+            self._sums[('llm_seconds_total', key)] += metrics.llm_time
+            self._sums[('llm_prompt_tokens_total', key)] += metrics.prompt_tokens
+            self._sums[('llm_completion_tokens_total', key)] += metrics.completion_tokens
+            self._sums[('serializer_seconds_total', key)] += metrics.serializer_time
+
+    def render(self):
+        with self._lock:
+            requests = dict(self._requests)
+            histograms = [
+                ('http_request_duration_seconds', 'Request wall time', self._durations),
+                ('http_request_db_queries', 'Database queries per request', self._queries),
+            ]
+            histogram_lines = [
+                _render_histogram(name, help_text, series) for name, help_text, series in histograms
+            ]
+            sums = dict(self._sums)
+            collectors = list(self._collectors)
+
+        lines = [
+            '# HELP http_requests_total Requests by route, method and status',
+            '# TYPE http_requests_total counter',
+        ]
+        for (route, method, status_code), value in sorted(requests.items()):
+            lines.append(f'http_requests_total{_labels(route=route, method=method, status=status_code)} {value}')
+        for histogram in histogram_lines:
+            lines.extend(histogram)
+
+        by_name = defaultdict(list)
+        for (name, (route, method)), value in sums.items():
+            by_name[name].append((route, method, value))
+        for name, samples in sorted(by_name.items()):
+            lines.append(f'# TYPE {name} counter')
+            for route, method, value in sorted(samples):
+                lines.append(f'{name}{_labels(route=route, method=method)} {_number(value)}')
+
+        for collector in collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(**labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render_histogram(name, help_text, series):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for (route, method), histogram in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(route=route, method=method, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(route=route, method=method)} {_number(histogram.total)}')
+        lines.append(f'{name}_count{_labels(route=route, method=method)} {histogram.count}')
+    return lines
+
+
+registry = MetricsRegistry()
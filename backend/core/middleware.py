@@ -0,0 +1,126 @@
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from . import metrics
+from .routers import pin_primary, replicas_enabled
+
+logger = logging.getLogger(__name__)
+
+_profile_lock = threading.Lock()
+
+
+class PerformanceMiddleware:
+    """
+    Time every request: wall time, database queries (through execute
+    wrappers on every connection), LLM calls and serializer time. The
+    totals are sent back in a ``Server-Timing`` header and recorded per
+    route in ``core.metrics.registry``.
+
+    With ``PERFORMANCE_PROFILE_SAMPLE_RATE`` above zero a sample of
+    requests runs under cProfile (one at a time per process), and the
+    profile of a sampled request slower than
+    ``PERFORMANCE_SLOW_REQUEST_SECONDS`` is written to
+    ``PERFORMANCE_PROFILE_DIR``. Placed first, so it covers the other
+    middleware too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PERFORMANCE_METRICS_ENABLED:
+            return self.get_response(request)
+
+        request_metrics, token = metrics.start_request()
+        profiler = self._start_profiler()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(request_metrics.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _profile_lock.release()
+            request_metrics.finish()
+            metrics.end_request(token)
+
+        route = self._route(request)
+        metrics.registry.observe(route, request.method, response.status_code, request_metrics)
+        response['Server-Timing'] = request_metrics.server_timing()
+
+        if request_metrics.duration >= settings.PERFORMANCE_SLOW_REQUEST_SECONDS:
+            logger.warning(
+                'Slow request %s %s (%s): %.0fms, %d queries in %.0fms, %d LLM calls in %.0fms',
+                request.method, request.path, route, request_metrics.duration * 1000,
+                request_metrics.db_queries, request_metrics.db_time * 1000,
+                request_metrics.llm_calls, request_metrics.llm_time * 1000
+            )
+            if profiler is not None:
+                self._dump_profile(profiler, route)
+        return response
+
+    def _start_profiler(self):
+        rate = settings.PERFORMANCE_PROFILE_SAMPLE_RATE
+        if rate <= 0 or random.random() >= rate:
+            return None
+        # cProfile cannot run twice in one thread, and profiling concurrent
+        # requests would skew each other; skip the sample instead of waiting.
+        if not _profile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            _profile_lock.release()
+            return None
+        return profiler
+
+    def _route(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        return match.view_name or match._func_path
+
+    def _dump_profile(self, profiler, route):
+        directory = settings.PERFORMANCE_PROFILE_DIR
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(
+                directory,
+                '{}-{}-{}.prof'.format(route.replace(':', '.').replace('/', '_'), int(time.time() * 1000), os.getpid())
+            )
+            profiler.dump_stats(path)
+        except OSError:
+            logger.exception('Could not write the request profile to %s', directory)
+        else:
+            logger.warning('Request profile written to %s', path)
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin users to the primary database for a few seconds after a successful
+    write request, so their next reads do not hit a lagging replica.
+    Placed after the authentication middleware; DRF views set the
+    authenticated user on the underlying request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if replicas_enabled() and request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_primary(user.pk)
+        return response
@@ -0,0 +1,97 @@
+"""
+Read-replica routing.
+
+Writes and ordinary reads go to ``default``. Views opt read-only actions
+into the replicas listed in ``settings.DATABASE_REPLICAS`` with
+``ReplicaReadMixin``, which flags the request through a context variable
+for the duration of the action. A user who has just written something is
+pinned to the primary for ``REPLICA_PIN_SECONDS`` (see
+``PrimaryPinMiddleware``), so replication lag never hides their own
+changes from them. The pin is kept in the default cache, which has to be
+shared between workers for it to hold across them (``core.E001``).
+
+Migrations only run on the primary: replicas get their schema through
+replication. A SQLite "replica" is a copy of the primary's file, so copy
+it again after migrating.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_KEY = 'db-pin:{}'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replicas_enabled():
+    return bool(settings.DATABASE_REPLICAS)
+
+
+def pin_primary(user_id):
+    if replicas_enabled() and user_id is not None:
+        cache.set(PIN_KEY.format(user_id), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return user_id is None or bool(cache.get(PIN_KEY.format(user_id)))
+
+
+@contextmanager
+def replica_reads():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so that instances loaded from a replica are still saved
+        # to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are read-only copies of the primary, schema included.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin serving ``replica_actions`` from a replica unless the
+    user is pinned to the primary.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            replicas_enabled()
+            and self.action in self.replica_actions
+            and not is_pinned(getattr(request.user, 'pk', None))
+        ):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,16 @@
+from django.test.runner import DiscoverRunner
+
+from core.buffers import close_all
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Stops the per-process write buffers (usage counters, rollups, tracking
+    events) before the test databases are dropped. What they still hold
+    refers to rows of rolled back test transactions, so it is discarded
+    rather than flushed.
+    """
+
+    def teardown_databases(self, old_config, **kwargs):
+        close_all(flush=False)
+        super().teardown_databases(old_config, **kwargs)
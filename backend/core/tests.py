@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase, override_settings
+
+from .buffers import BufferedWriter
+from .checks import check_replica_pin_cache
+from .utils import normalize_domain, normalize_email
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+
+
+class ReplicaPinCacheCheckTests(SimpleTestCase):
+    @override_settings(DATABASE_REPLICAS=['replica_0'], CACHES=LOCMEM)
+    def test_per_process_cache_fails_with_replicas(self):
+        self.assertEqual([error.id for error in check_replica_pin_cache(None)], ['core.E001'])
+
+    @override_settings(DATABASE_REPLICAS=[], CACHES=LOCMEM)
+    def test_no_replicas(self):
+        self.assertEqual(check_replica_pin_cache(None), [])
+
+    @override_settings(DATABASE_REPLICAS=['replica_0'], CACHES=REDIS)
+    def test_shared_cache(self):
+        self.assertEqual(check_replica_pin_cache(None), [])
+
+
+class NormalizeEmailTests(SimpleTestCase):
+    def test_case_and_whitespace(self):
+        self.assertEqual(normalize_email('  Jane.Doe@Example.COM '), 'jane.doe@example.com')
+
+    def test_gmail_dots_and_tags(self):
+        self.assertEqual(normalize_email('Jane.Doe+jobs@googlemail.com'), 'janedoe@gmail.com')
+        self.assertEqual(normalize_email('jane.doe+jobs@example.com'), 'jane.doe+jobs@example.com')
+
+    def test_idna_domain(self):
+        self.assertEqual(normalize_email('jane@Bücher.example.'), 'jane@xn--bcher-kva.example')
+
+    def test_values_without_a_mailbox(self):
+        self.assertEqual(normalize_email('Not An Email'), 'not an email')
+        self.assertEqual(normalize_email('@example.com'), '@example.com')
+        self.assertEqual(normalize_email(None), '')
+
+    def test_domain(self):
+        self.assertEqual(normalize_domain('https://www.Example.com/jobs'), 'example.com')
+        self.assertEqual(normalize_domain('jane@Example.com'), 'example.com')
+
+
+class BufferedWriterTests(SimpleTestCase):
+    def test_close_flushes_and_stops_the_thread(self):
+        flushed = []
+        writer = BufferedWriter(flushed.extend, flush_interval=60)
+        writer.add(1)
+        thread = writer._thread
+        self.assertEqual(writer.close(), 1)
+        self.assertEqual(flushed, [1])
+        self.assertFalse(thread.is_alive())
+
+        writer.add(2)
+        self.assertTrue(writer._thread.is_alive())
+        self.assertEqual(writer.close(flush=False), 1)
+        self.assertEqual(flushed, [1])
+        self.assertEqual(len(writer), 0)
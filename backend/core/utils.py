@@ -0,0 +1,143 @@
+import csv
+import json
+from itertools import islice
+from urllib.parse import urlsplit
+
+
+def chunked(iterable, size):
+    """
+    Yield lists of up to ``size`` items from ``iterable`` without
+    materialising it.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalize_text(value):
+    """
+    Case-fold and collapse whitespace so that labels such as company names,
+    titles and locations compare and group consistently.
+    """
+    return ' '.join((value or '').casefold().split())
+
+
+def normalize_domain(value):
+    """
+    Reduce a domain, URL or email address to its bare lowercase host name,
+    e.g. ``https://www.Example.com/jobs`` -> ``example.com``.
+    """
+    value = (value or '').strip().lower()
+    if not value:
+        return ''
+    if '@' in value and '/' not in value:
+        value = value.rpartition('@')[2]
+    if '//' not in value:
+        value = '//' + value
+    host = (urlsplit(value).hostname or '').rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+
+GMAIL_DOMAINS = ('gmail.com', 'googlemail.com')
+
+
+def normalize_email(email):
+    """
+    Canonical form of an email address used for deduplication: lowercased,
+    the domain IDNA-encoded, and for Gmail addresses dots and ``+tag``
+    suffixes dropped from the local part (``googlemail.com`` becomes
+    ``gmail.com``). Values without an ``@`` are only lowercased.
+    """
+    email = (email or '').strip().lower()
+    local, at, domain = email.rpartition('@')
+    if not at or not local:
+        return email
+
+    domain = domain.rstrip('.')
+    try:
+        domain = domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    if domain in GMAIL_DOMAINS:
+        local = local.partition('+')[0].replace('.', '')
+        domain = 'gmail.com'
+    return f'{local}@{domain}'
+
+
+def detect_upload_format(upload, file_format=None):
+    if file_format:
+        return file_format.lower()
+    name = (upload.name or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+def _decoded_lines(upload, errors):
+    # Lines that are not UTF-8 become blank lines (which both formats skip)
+    # and their numbers are added to ``errors``, so one bad line does not
+    # end the import.
+    for line_number, line in enumerate(upload, start=1):
+        try:
+            yield line.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            errors.append(line_number)
+            yield '\n'
+
+
+def iter_uploaded_rows(upload, file_format=None):
+    """
+    Stream records from an uploaded CSV (with a header row) or JSONL file.
+
+    Yields ``(line_number, row, error)`` tuples where ``row`` is a dict, or
+    ``None`` together with an ``error`` message when the line cannot be
+    parsed (including lines that are not valid UTF-8). The file is read line
+    by line, so memory use does not depend on its size.
+    """
+    file_format = detect_upload_format(upload, file_format)
+    if file_format not in ('csv', 'jsonl'):
+        raise ValueError(f'Unsupported file format: {file_format}')
+    upload.seek(0)
+    undecodable = []
+    lines = _decoded_lines(upload, undecodable)
+
+    def decode_errors():
+        while undecodable:
+            yield undecodable.pop(0), None, 'Line is not valid UTF-8'
+
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            except csv.Error as e:
+                yield from decode_errors()
+                yield reader.line_num, None, f'Invalid CSV: {e}'
+                continue
+            yield from decode_errors()
+            if None in row:
+                yield reader.line_num, None, 'Row has more values than the header'
+                continue
+            yield reader.line_num, row, None
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            yield from decode_errors()
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Each line must be a JSON object'
+                continue
+            yield line_number, row, None
+    yield from decode_errors()
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from .metrics import registry
+
+
+@require_GET
+def metrics(request):
+    """
+    Request metrics in the Prometheus text format. Open in DEBUG;
+    otherwise only served to ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    if not settings.DEBUG:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        token = header[len('Bearer '):] if header.startswith('Bearer ') else ''
+        if not settings.METRICS_TOKEN or not constant_time_compare(token, settings.METRICS_TOKEN):
+            raise Http404
+    response = HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response['Cache-Control'] = 'no-store'
+    return response